@@ -117,3 +117,11 @@ def notify_events(sender, instance, **kwargs):
 
 
 signals.post_save.connect(notify_events)
+
+
+def search_rule_changed(sender, instance, **kwargs):
+    from ietf.community.utils import invalidate_search_rule_index
+    invalidate_search_rule_index()
+
+signals.post_save.connect(search_rule_changed, sender=SearchRule)
+signals.post_delete.connect(search_rule_changed, sender=SearchRule)
@@ -4,10 +4,16 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import six
+
 from pyquery import PyQuery
 
+from django.conf import settings
 from django.urls import reverse as urlreverse
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 
 from django_webtest import WebTest
 
@@ -16,12 +22,15 @@ import debug                            # pyflakes:ignore
 from ietf.community.models import CommunityList, SearchRule, EmailSubscription
 from ietf.community.utils import docs_matching_community_list_rule, community_list_rules_matching_doc
 from ietf.community.utils import reset_name_contains_index_for_rule
+from ietf.community.utils import community_lists_tracking_doc, docs_tracked_by_community_list
+from ietf.community.utils import update_name_contains_indexes_with_new_doc
 import ietf.community.views
 from ietf.group.models import Group
 from ietf.group.utils import setup_default_community_list_for_group
-from ietf.doc.models import State
+from ietf.doc.models import Document, State
 from ietf.doc.utils import add_state_change_event
 from ietf.person.models import Person, Email
+from ietf.person.utils import merge_persons
 from ietf.utils.test_utils import login_testing_unauthorized
 from ietf.utils.mail import outbox
 from ietf.doc.factories import WgDraftFactory
@@ -78,6 +87,84 @@ class CommunityListTests(WebTest):
         self.assertTrue(draft in list(docs_matching_community_list_rule(rule_shepherd)))
         self.assertTrue(draft in list(docs_matching_community_list_rule(rule_name_contains)))
 
+    # the index is kept between calls as long as the rule generation in
+    # the shared cache stays the same, which needs a cache which keeps it
+    @override_settings(CACHES=dict(settings.CACHES, default={ 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rule-index-tests', }))
+    def test_rule_index(self):
+        draft = WgDraftFactory(states=[('draft','active')])
+        other = WgDraftFactory(states=[('draft','active')])
+        active = State.objects.get(type="draft", slug="active")
+
+        lists = []
+        for i in range(10):
+            clist = CommunityList.objects.create(group=GroupFactory())
+            lists.append(clist)
+            for d in [draft, other]:
+                SearchRule.objects.create(rule_type="group", group=d.group, state=active, community_list=clist)
+                SearchRule.objects.create(rule_type="ad", person=PersonFactory(), state=active, community_list=clist)
+        rule = SearchRule.objects.create(rule_type="state_ietf", state=State.objects.get(type="draft-stream-ietf", slug="wg-doc"), community_list=lists[0])
+
+        self.assertEqual(set(community_lists_tracking_doc(draft)), set(lists))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(set(docs_tracked_by_community_list(lists[0])), set([draft, other]))
+        self.assertEqual(len(queries), 2)
+
+        # the index follows changes to the rules
+        rule.state = State.objects.get(type="draft", slug="active")
+        rule.save()
+        doc = WgDraftFactory(states=[('draft','active')])
+        self.assertEqual(list(community_lists_tracking_doc(doc)), [lists[0]])
+        rule.delete()
+        self.assertEqual(list(community_lists_tracking_doc(doc)), [])
+        lists[1].delete()
+        self.assertEqual(set(community_lists_tracking_doc(draft)), set(lists[2:] + lists[:1]))
+
+    @override_settings(CACHES=dict(settings.CACHES, default={ 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rule-index-tests', }))
+    def test_rule_index_changed_without_signals(self):
+        source = PersonFactory()
+        target = PersonFactory()
+        active = State.objects.get(type="draft", slug="active")
+        clist = CommunityList.objects.create(group=GroupFactory())
+        SearchRule.objects.create(rule_type="ad", person=source, state=active, community_list=clist)
+        doc = WgDraftFactory(ad=target, states=[('draft','active')])
+        self.assertEqual(list(community_lists_tracking_doc(doc)), [])
+
+        # merging persons moves their rules with a bulk update
+        merge_persons(source, target, file=six.StringIO())
+        self.assertEqual(list(community_lists_tracking_doc(doc)), [clist])
+
+        # other changes without signals are picked up when the index expires
+        SearchRule.objects.filter(community_list=clist).update(person=PersonFactory())
+        self.assertEqual(list(community_lists_tracking_doc(doc)), [clist])
+        with override_settings(SEARCH_RULE_INDEX_TIME=-1):
+            self.assertEqual(list(community_lists_tracking_doc(doc)), [])
+
+    def test_name_contains_index(self):
+        clist = CommunityList.objects.create(user=PersonFactory().user)
+        active = State.objects.get(type="draft", slug="active")
+        rule_foo = SearchRule.objects.create(rule_type="name_contains", state=active, text="-foo-", community_list=clist)
+        rule_repeat = SearchRule.objects.create(rule_type="name_contains", state=active, text=r"-(\w+)-\1$", community_list=clist)
+        rule_invalid = SearchRule.objects.create(rule_type="name_contains", state=active, text="-(foo-", community_list=clist)
+
+        foo = WgDraftFactory(name="draft-ietf-foo-bar")
+        bar = WgDraftFactory(name="draft-ietf-bar-bar")
+        WgDraftFactory(name="draft-ietf-baz")
+        for d in Document.objects.all():
+            update_name_contains_indexes_with_new_doc(d)
+        update_name_contains_indexes_with_new_doc(foo)
+        self.assertEqual(list(rule_foo.name_contains_index.all()), [foo])
+        self.assertEqual(list(rule_repeat.name_contains_index.all()), [bar])
+        self.assertEqual(list(rule_invalid.name_contains_index.all()), [])
+
+        # the rebuild in one pass gives the same result
+        rule_foo.name_contains_index.set([bar])
+        out = six.StringIO()
+        call_command('update_community_list_index', stdout=out)
+        self.assertIn("1 index entries added, 1 removed", out.getvalue())
+        self.assertEqual(list(rule_foo.name_contains_index.all()), [foo])
+        self.assertEqual(list(rule_repeat.name_contains_index.all()), [bar])
+        self.assertEqual(list(rule_invalid.name_contains_index.all()), [])
+
     def test_view_list(self):
         PersonFactory(user__username='plain')
         draft = WgDraftFactory()
@@ -5,20 +5,27 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import re
+import threading
+import time
+
+from collections import defaultdict
 
 from django.db.models import Q
 from django.conf import settings
+from django.core.cache import cache
 
 import debug                            # pyflakes:ignore
 
 from ietf.community.models import CommunityList, EmailSubscription, SearchRule
-from ietf.doc.models import Document, State
+from ietf.doc.models import Document, DocAlias, DocumentAuthor, State
 from ietf.group.models import Role, Group
-from ietf.person.models import Person
+from ietf.person.models import Email
 from ietf.ietfauth.utils import has_role
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
 
+from ietf.utils.cache import get_generation, new_generation
+from ietf.utils.log import log
 from ietf.utils.mail import send_mail
 
 def states_of_significant_change():
@@ -78,79 +85,249 @@ def reset_name_contains_index_for_rule(rule):
 
     rule.name_contains_index.set(Document.objects.filter(docalias__name__regex=rule.text))
 
+_name_contains_regexes = {}
+
+def name_contains_regex(text):
+    """Return the compiled regexp for the text of a name_contains rule, or
+    None if it isn't a valid regexp.  Compiled regexps are kept for the
+    life of the process."""
+    if not text in _name_contains_regexes:
+        try:
+            _name_contains_regexes[text] = re.compile(text)
+        except re.error:
+            _name_contains_regexes[text] = None
+    return _name_contains_regexes[text]
+
 def update_name_contains_indexes_with_new_doc(doc):
-    for r in SearchRule.objects.filter(rule_type="name_contains"):
-        # in theory we could use the database to do this query, but
-        # Django doesn't support a reversed regex operator, and regexp
-        # support needs backend-specific code so custom SQL is a bit
-        # cumbersome too
-        if re.search(r.text, doc.name) and not doc in r.name_contains_index.all():
-            r.name_contains_index.add(doc)
+    # in theory we could use the database to do this query, but
+    # Django doesn't support a reversed regex operator, and regexp
+    # support needs backend-specific code so custom SQL is a bit
+    # cumbersome too
+    names = set(DocAlias.objects.filter(docs=doc).values_list("name", flat=True))
+    names.add(doc.name)
+
+    matching = set()
+    for rule in get_search_rule_index().rules_of_type("name_contains"):
+        regex = name_contains_regex(rule.text)
+        if regex and any(regex.search(n) for n in names):
+            matching.add(rule.pk)
+
+    if matching:
+        through = SearchRule.name_contains_index.through
+        matching -= set(through.objects.filter(document=doc, searchrule__in=matching).values_list("searchrule", flat=True))
+        through.objects.bulk_create([ through(searchrule_id=pk, document_id=doc.pk) for pk in matching ])
+
+def rebuild_name_contains_indexes(rules=None, dry_run=False):
+    """Rebuild the materialized indexes of the given name_contains rules
+    (default all of them) in one pass over all document aliases.  Returns
+    a dictionary with the old and new index sizes by rule, and timing
+    metrics for the rebuild."""
+    start = time.time()
+    if rules is None:
+        rules = SearchRule.objects.filter(rule_type="name_contains")
+    rules = [ r for r in rules if r.rule_type == "name_contains" ]
+
+    regexes = [ (r.pk, name_contains_regex(r.text)) for r in rules ]
+    regexes = [ (pk, regex) for pk, regex in regexes if regex ]
+
+    # Most names match no rule at all, so first check the name against an
+    # alternation of all the rules, and only then against each rule.
+    # Patterns with back-references would refer to the wrong groups in the
+    # alternation, so those are always checked separately.
+    combinable = [ regex for pk, regex in regexes if not re.search(r'\\[1-9]|\(\?P=', regex.pattern) ]
+    always = [ (pk, regex) for pk, regex in regexes if not regex in combinable ]
+    try:
+        combined = re.compile("|".join("(?:%s)" % regex.pattern for regex in combinable)) if combinable else None
+    except re.error:
+        combined, always = None, regexes
+
+    new = set()
+    alias_count = 0
+    through = DocAlias.docs.through
+    for name, doc_id in through.objects.values_list("docalias__name", "document").iterator():
+        alias_count += 1
+        if combined and combined.search(name):
+            candidates = regexes
+        else:
+            candidates = always
+        for pk, regex in candidates:
+            if regex.search(name):
+                new.add((pk, doc_id))
+    match_time = time.time() - start
+
+    index_through = SearchRule.name_contains_index.through
+    rule_ids = [ r.pk for r in rules ]
+    old = set(index_through.objects.filter(searchrule__in=rule_ids).values_list("searchrule", "document"))
+
+    if not dry_run:
+        removed = defaultdict(list)
+        for pk, doc_id in old - new:
+            removed[pk].append(doc_id)
+        for pk, docs in removed.items():
+            index_through.objects.filter(searchrule=pk, document__in=docs).delete()
+        index_through.objects.bulk_create([ index_through(searchrule_id=pk, document_id=doc_id) for pk, doc_id in new - old ])
+
+    metrics = {
+        "rules": len(rules),
+        "aliases": alias_count,
+        "added": len(new - old),
+        "removed": len(old - new),
+        "match_time": match_time,
+        "total_time": time.time() - start,
+        "sizes": dict( (pk, [0, 0]) for pk in rule_ids ),
+    }
+    for pk, doc_id in old:
+        metrics["sizes"][pk][0] += 1
+    for pk, doc_id in new:
+        metrics["sizes"][pk][1] += 1
+
+    if not dry_run:
+        log("Rebuilt the name_contains indexes of %(rules)s rules against %(aliases)s aliases: "
+            "%(added)s entries added, %(removed)s removed, in %(total_time).2f s (%(match_time).2f s matching)" % metrics)
+
+    return metrics
 
 def docs_matching_community_list_rule(rule):
     docs = Document.objects.all()
     if rule.rule_type in ['group', 'area', 'group_rfc', 'area_rfc']:
-        return docs.filter(Q(group=rule.group_id) | Q(group__parent=rule.group_id), states=rule.state)
+        return docs.filter(Q(group=rule.group_id) | Q(group__parent=rule.group_id), states=rule.state_id)
     elif rule.rule_type.startswith("state_"):
-        return docs.filter(states=rule.state)
+        return docs.filter(states=rule.state_id)
     elif rule.rule_type in ["author", "author_rfc"]:
-        return docs.filter(states=rule.state, documentauthor__person=rule.person)
+        return docs.filter(states=rule.state_id, documentauthor__person=rule.person_id)
     elif rule.rule_type == "ad":
-        return docs.filter(states=rule.state, ad=rule.person)
+        return docs.filter(states=rule.state_id, ad=rule.person_id)
     elif rule.rule_type == "shepherd":
-        return docs.filter(states=rule.state, shepherd__person=rule.person)
+        return docs.filter(states=rule.state_id, shepherd__person=rule.person_id)
     elif rule.rule_type == "name_contains":
-        return docs.filter(states=rule.state, searchrule=rule)
+        return docs.filter(states=rule.state_id, searchrule=rule)
 
     raise NotImplementedError
 
-def community_list_rules_matching_doc(doc):
-    states = list(doc.states.values_list("pk", flat=True))
-
-    rules = SearchRule.objects.none()
-
-    if doc.group_id:
-        groups = [doc.group_id]
-        if doc.group.parent_id:
-            groups.append(doc.group.parent_id)
-        rules |= SearchRule.objects.filter(
-            rule_type__in=['group', 'area', 'group_rfc', 'area_rfc'],
-            state__in=states,
-            group__in=groups
-        )
-
-    rules |= SearchRule.objects.filter(
-        rule_type__in=['state_iab', 'state_iana', 'state_iesg', 'state_irtf', 'state_ise', 'state_rfceditor', 'state_ietf'],
-        state__in=states,
-    )
-
-    rules |= SearchRule.objects.filter(
-        rule_type__in=["author", "author_rfc"],
-        state__in=states,
-        person__in=list(Person.objects.filter(documentauthor__document=doc)),
-    )
 
-    if doc.ad_id:
-        rules |= SearchRule.objects.filter(
-            rule_type="ad",
-            state__in=states,
-            person=doc.ad_id,
-        )
-
-    if doc.shepherd_id:
-        rules |= SearchRule.objects.filter(
-            rule_type="shepherd",
-            state__in=states,
-            person__email=doc.shepherd_id,
-        )
-
-    rules |= SearchRule.objects.filter(
-        rule_type="name_contains",
-        state__in=states,
-        name_contains_index=doc, # search our materialized index to avoid full scan
-    )
+class SearchRuleIndex(object):
+    """Inverted index over all search rules, from what a rule looks for
+    in a document (a state, plus a group or person for most rule types)
+    to the rules looking for it, so that finding the rules matching a
+    document is a few dictionary lookups instead of a query over the
+    rule table.  Also keeps the rules of each community list, for
+    building the query for the documents tracked by the list."""
+
+    fields = ("id", "community_list_id", "rule_type", "state_id", "group_id", "person_id", "text")
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.built = time.time()
+        self.index = defaultdict(set)
+        self.list_of_rule = {}
+        self.rules_of_list = defaultdict(list)
+        self.rule_types = set()
+
+        for values in SearchRule.objects.values_list(*self.fields):
+            rule = SearchRule(**dict(list(zip(self.fields, values))))
+            self.list_of_rule[rule.pk] = rule.community_list_id
+            self.rules_of_list[rule.community_list_id].append(rule)
+            self.rule_types.add(rule.rule_type)
+            self.index[self.rule_key(rule)].add(rule.pk)
+
+    @staticmethod
+    def rule_key(rule):
+        if rule.rule_type in ['group', 'area', 'group_rfc', 'area_rfc']:
+            return ("group", rule.state_id, rule.group_id)
+        elif rule.rule_type.startswith("state_"):
+            return ("state", rule.state_id)
+        elif rule.rule_type in ["author", "author_rfc"]:
+            return ("author", rule.state_id, rule.person_id)
+        elif rule.rule_type in ["ad", "shepherd"]:
+            return (rule.rule_type, rule.state_id, rule.person_id)
+        elif rule.rule_type == "name_contains":
+            return ("name_contains", rule.state_id)
+        # unknown rule types never match
+        return (None, )
+
+    def rules_matching_doc(self, doc):
+        states = list(doc.states.values_list("pk", flat=True))
+
+        keys = []
+        if doc.group_id:
+            groups = [doc.group_id]
+            if doc.group.parent_id:
+                groups.append(doc.group.parent_id)
+            keys.extend(("group", s, g) for s in states for g in groups)
+
+        keys.extend(("state", s) for s in states)
+
+        if self.rule_types & set(["author", "author_rfc"]):
+            authors = list(DocumentAuthor.objects.filter(document=doc).values_list("person", flat=True))
+            keys.extend(("author", s, p) for s in states for p in authors)
+
+        if doc.ad_id:
+            keys.extend(("ad", s, doc.ad_id) for s in states)
+
+        if doc.shepherd_id and "shepherd" in self.rule_types:
+            shepherd = Email.objects.filter(pk=doc.shepherd_id).values_list("person", flat=True).first()
+            if shepherd:
+                keys.extend(("shepherd", s, shepherd) for s in states)
+
+        rule_ids = set()
+        for key in keys:
+            rule_ids.update(self.index.get(key, ()))
+
+        if "name_contains" in self.rule_types:
+            # the documents matching the name_contains rules are in their
+            # materialized index, so look the doc up there
+            candidates = set()
+            for s in states:
+                candidates.update(self.index.get(("name_contains", s), ()))
+            if candidates:
+                rule_ids.update(SearchRule.name_contains_index.through.objects.filter(
+                    document=doc, searchrule__in=candidates).values_list("searchrule", flat=True))
+
+        return rule_ids
+
+    def rules_of_type(self, rule_type):
+        return [ r for rules in self.rules_of_list.values() for r in rules if r.rule_type == rule_type ]
+
+    def lists_matching_doc(self, doc):
+        return set(self.list_of_rule[pk] for pk in self.rules_matching_doc(doc))
+
+_search_rule_index = None
+_search_rule_index_lock = threading.Lock()
+
+SEARCH_RULE_INDEX_GENERATION_KEY = "community:search_rule_index_generation"
+
+def search_rule_index_outdated(index, generation):
+    return (index is None or index.generation != generation
+            or time.time() - index.built > settings.SEARCH_RULE_INDEX_TIME)
+
+def get_search_rule_index():
+    """Return the index over all search rules, rebuilding it if the rules
+    have changed since it was built, in this or any other process, or if
+    it's older than SEARCH_RULE_INDEX_TIME."""
+    global _search_rule_index
+    generation = get_generation(cache, SEARCH_RULE_INDEX_GENERATION_KEY)
+    index = _search_rule_index
+    if search_rule_index_outdated(index, generation):
+        with _search_rule_index_lock:
+            index = _search_rule_index
+            if search_rule_index_outdated(index, generation):
+                index = _search_rule_index = SearchRuleIndex(generation)
+    return index
+
+def clear_search_rule_index():
+    """Drop the index of this process, it's rebuilt when it's next used."""
+    global _search_rule_index
+    _search_rule_index = None
+
+def invalidate_search_rule_index():
+    """Called whenever a SearchRule is saved or deleted, or changed
+    behind the back of the signals, as by merge_persons()."""
+    clear_search_rule_index()
+    # let the other processes know too
+    new_generation(cache, SEARCH_RULE_INDEX_GENERATION_KEY)
 
-    return rules
+def community_list_rules_matching_doc(doc):
+    return SearchRule.objects.filter(pk__in=get_search_rule_index().rules_matching_doc(doc))
 
 
 def docs_tracked_by_community_list(clist):
@@ -159,15 +336,23 @@ def docs_tracked_by_community_list(clist):
 
     # in theory, we could use an OR query, but databases seem to have
     # trouble with OR queries and complicated joins so do the OR'ing
-    # manually
-    doc_ids = set(clist.added_docs.values_list("pk", flat=True))
-    for rule in clist.searchrule_set.all():
-        doc_ids = doc_ids | set(docs_matching_community_list_rule(rule).values_list("pk", flat=True))
+    # with a UNION of the simple queries for each rule instead
+    queries = [ Document.objects.filter(communitylist=clist) ]
+    queries.extend(docs_matching_community_list_rule(rule) for rule in get_search_rule_index().rules_of_list[clist.pk])
+    queries = [ q.order_by().values_list("pk", flat=True) for q in queries ]
+
+    doc_ids = set()
+    # stay well below the limit on the number of terms in a compound
+    # select in SQLite
+    chunk_size = 100
+    for i in range(0, len(queries), chunk_size):
+        chunk = queries[i:i + chunk_size]
+        doc_ids.update(chunk[0].union(*chunk[1:]))
 
     return Document.objects.filter(pk__in=doc_ids)
 
 def community_lists_tracking_doc(doc):
-    return CommunityList.objects.filter(Q(added_docs=doc) | Q(searchrule__in=community_list_rules_matching_doc(doc)))
+    return CommunityList.objects.filter(Q(added_docs=doc) | Q(pk__in=get_search_rule_index().lists_matching_doc(doc)))
 
 
 def notify_event_to_subscribers(event):
@@ -12,7 +12,7 @@ from .models import (StateType, State, RelatedDocument, DocumentAuthor, Document
     StateDocEvent, ConsensusDocEvent, BallotType, BallotDocEvent, WriteupDocEvent, LastCallDocEvent,
     TelechatDocEvent, BallotPositionDocEvent, ReviewRequestDocEvent, InitialReviewDocEvent,
     AddedMessageEvent, SubmissionDocEvent, DeletedEvent, EditedAuthorsDocEvent, DocumentURL,
-    ReviewAssignmentDocEvent, IanaExpertDocEvent )
+    ReviewAssignmentDocEvent, IanaExpertDocEvent, DocumentSearchIndex )
 
 
 class StateTypeAdmin(admin.ModelAdmin):
@@ -99,6 +99,12 @@ class DocAliasAdmin(admin.ModelAdmin):
     raw_id_fields = ['docs']
 admin.site.register(DocAlias, DocAliasAdmin)
 
+class DocumentSearchIndexAdmin(admin.ModelAdmin):
+    list_display = ['document', 'group', 'area', 'ad', 'stream', 'state_slugs']
+    search_fields = ['document__name']
+    raw_id_fields = ['document', 'group', 'area', 'ad']
+admin.site.register(DocumentSearchIndex, DocumentSearchIndexAdmin)
+
 class DocReminderAdmin(admin.ModelAdmin):
     list_display = ['id', 'event', 'type', 'due', 'active']
     list_filter = ['type', 'due', 'active']
@@ -39,7 +39,7 @@ def expirable_drafts(queryset=None):
 
     # the general rule is that each active draft is expirable, unless
     # it's in a state where we shouldn't touch it
-    if not queryset:
+    if queryset is None:
         queryset = Document.objects.all()
 
     # Populate this first time through (but after django has been set up)
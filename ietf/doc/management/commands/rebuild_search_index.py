@@ -0,0 +1,33 @@
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from django.core.management.base import BaseCommand
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import Document
+from ietf.doc.utils_search import update_search_index
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the document search index (DocumentSearchIndex) in bulk.  The index is kept '
+            'up to date as documents change, so this is only needed after it has been created, '
+            'or if it has been changed behind the back of the signal hooks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+            help="Number of documents to index per batch (default 1000)")
+
+    def handle(self, *args, **options):
+        verbosity = int(options['verbosity'])
+        batch_size = options['batch_size']
+
+        doc_ids = list(Document.objects.order_by("pk").values_list("pk", flat=True))
+
+        for i in range(0, len(doc_ids), batch_size):
+            update_search_index(doc_ids[i:i + batch_size], create=True)
+            if verbosity > 1:
+                self.stdout.write("Indexed %s of %s documents" % (min(i + batch_size, len(doc_ids)), len(doc_ids)))
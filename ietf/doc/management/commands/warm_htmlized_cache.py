@@ -0,0 +1,82 @@
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import datetime
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import ( Document, DocAlias, DocEvent, htmlize_text,
+    get_htmlized_cache_entry, set_htmlized_cache_entry )
+
+
+def htmlize(item):
+    # Runs in the worker processes, so no database access in here
+    cache_key, text = item
+    return cache_key, htmlize_text(text)
+
+class Command(BaseCommand):
+    help = ('Render the htmlized versions of documents with new revisions or newly published '
+            'RFCs ahead of time, so that the first request for them does not have to.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*',
+            help="Additional documents to htmlize, by name or alias (e.g. rfc8200)")
+        parser.add_argument('--hours', type=int, default=2,
+            help="Htmlize documents with a new revision or RFC publication in the last HOURS hours (default 2)")
+        parser.add_argument('--jobs', type=int, default=multiprocessing.cpu_count(),
+            help="Number of processes to render documents in (default: number of CPUs)")
+        parser.add_argument('--force', action='store_true', default=False,
+            help="Render documents even when the cached copy is still fresh")
+
+    def handle(self, *args, **options):
+        verbosity = int(options['verbosity'])
+
+        since = datetime.datetime.now() - datetime.timedelta(hours=options['hours'])
+        recent = DocEvent.objects.filter(type__in=["new_revision", "published_rfc"], time__gte=since).values("doc")
+        named = DocAlias.objects.filter(name__in=options['names']).values("docs")
+        docs = Document.objects.filter(Q(pk__in=recent) | Q(pk__in=named))
+
+        items = []
+        for doc in docs:
+            name = doc.get_base_name()
+            if not name.endswith('.txt'):
+                continue
+            cache_key = name.split('.')[0]
+            if not options['force']:
+                html, fresh = get_htmlized_cache_entry(cache_key)
+                if html and fresh:
+                    continue
+            text = doc.text()
+            if text:
+                items.append((cache_key, text))
+
+        if verbosity > 1:
+            self.stdout.write("Rendering %s documents using %s process(es)" % (len(items), options['jobs']))
+
+        if options['jobs'] > 1 and len(items) > 1:
+            # don't let the forked workers inherit the database connections
+            connections.close_all()
+            pool = multiprocessing.Pool(options['jobs'])
+            results = pool.imap_unordered(htmlize, items)
+        else:
+            pool = None
+            results = (htmlize(item) for item in items)
+
+        try:
+            for cache_key, html in results:
+                if html:
+                    set_htmlized_cache_entry(cache_key, html)
+                    if verbosity > 1:
+                        self.stdout.write(cache_key)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
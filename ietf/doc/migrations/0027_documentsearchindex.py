@@ -0,0 +1,38 @@
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import ietf.utils.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('name', '0007_fix_m2m_slug_id_length'),
+        ('person', '0009_auto_20190118_0725'),
+        ('group', '0019_rename_field_document2'),
+        ('doc', '0026_add_draft_rfceditor_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSearchIndex',
+            fields=[
+                ('document', ietf.utils.models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_index', serialize=False, to='doc.Document')),
+                ('names', models.TextField(blank=True, help_text='Lowercased title and alias names of the document, one per line')),
+                ('authors', models.TextField(blank=True, help_text='Lowercased name aliases and email addresses of the document authors, one per line')),
+                ('state_slugs', models.CharField(blank=True, help_text='Slugs of the document states, each surrounded by spaces', max_length=255)),
+                ('ad', ietf.utils.models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='person.Person')),
+                ('area', ietf.utils.models.ForeignKey(help_text='The parent of the group, for working group documents', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='search_index_area_set', to='group.Group')),
+                ('group', ietf.utils.models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_index_group_set', to='group.Group')),
+                ('stream', ietf.utils.models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='name.StreamName')),
+            ],
+            options={
+                'verbose_name_plural': 'document search index',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+from tqdm import tqdm
+
+from django.db import migrations
+
+
+def forward(apps, schema_editor):
+    # The entries are built by the same code which keeps the index up to
+    # date, rather than with the historical models, so that they can't
+    # drift apart.
+    from ietf.doc.utils_search import update_search_index
+
+    Document = apps.get_model('doc', 'Document')
+    doc_ids = list(Document.objects.order_by('pk').values_list('pk', flat=True))
+    batch_size = 1000
+    for i in tqdm(range(0, len(doc_ids), batch_size)):
+        update_search_index(doc_ids[i:i + batch_size], create=True)
+
+def reverse(apps, schema_editor):
+    DocumentSearchIndex = apps.get_model('doc', 'DocumentSearchIndex')
+    DocumentSearchIndex.objects.all().delete()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doc', '0027_documentsearchindex'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, reverse),
+    ]
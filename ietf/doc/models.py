@@ -3,11 +3,14 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import datetime
+import errno
 import logging
-import io
 import os
 import rfc2html
 import six
+import time
+
+from contextlib import contextmanager
 
 from django.db import models
 from django.core import checks
@@ -16,6 +19,7 @@ from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator, RegexValidator
 from django.urls import reverse as urlreverse
 from django.contrib.contenttypes.models import ContentType
+from django.dispatch import receiver
 from django.conf import settings
 from django.utils.encoding import python_2_unicode_compatible, force_text
 from django.utils.html import mark_safe
@@ -26,14 +30,15 @@ from ietf.group.models import Group
 from ietf.name.models import ( DocTypeName, DocTagName, StreamName, IntendedStdLevelName, StdLevelName,
     DocRelationshipName, DocReminderTypeName, BallotPositionName, ReviewRequestStateName, ReviewAssignmentStateName, FormalLanguageName,
     DocUrlTagName)
-from ietf.person.models import Email, Person
+from ietf.person.models import Alias, Email, Person
 from ietf.person.utils import get_active_ads
 from ietf.utils import log
 from ietf.utils.admin import admin_link
 from ietf.utils.decorators import memoize
 from ietf.utils.validators import validate_no_control_chars
 from ietf.utils.mail import formataddr
-from ietf.utils.models import ForeignKey
+from ietf.utils.models import ForeignKey, OneToOneField
+from ietf.utils.textfile import read_text
 
 logger = logging.getLogger('django')
 
@@ -79,6 +84,94 @@ class State(models.Model):
 IESG_BALLOT_ACTIVE_STATES = ("lc", "writeupw", "goaheadw", "iesg-eva", "defer")
 IESG_SUBSTATE_TAGS = ('point', 'ad-f-up', 'need-rev', 'extpty')
 
+def htmlize_text(text):
+    # The path here has to match the urlpattern for htmlized
+    # documents in order to produce correct intra-document links
+    return rfc2html.markup(text, path=settings.HTMLIZER_URL_PREFIX)
+
+def get_htmlized_cache_entry(cache_key):
+    """Return (html, fresh) for the given htmlized cache key.  Entries are
+    kept around for HTMLIZER_STALE_TIME after they stop being fresh, so
+    that there's something to serve while they're being re-rendered."""
+    try:
+        entry = caches['htmlized'].get(cache_key)
+    except EOFError:
+        entry = None
+    if not entry:
+        return None, False
+    if isinstance(entry, six.string_types):
+        # entry cached before stale copies were kept
+        return entry, True
+    fresh_until, html = entry
+    return html, time.time() < fresh_until
+
+def set_htmlized_cache_entry(cache_key, html):
+    entry = (time.time() + settings.HTMLIZER_CACHE_TIME, html)
+    caches['htmlized'].set(cache_key, entry, settings.HTMLIZER_CACHE_TIME + settings.HTMLIZER_STALE_TIME)
+
+def htmlized_lock_path(cache_key):
+    """Return the path of the lock file for rendering the given htmlized
+    cache entry, in the directory of the htmlized cache, or None if that
+    cache isn't file based (as in tests and development)."""
+    config = settings.CACHES.get('htmlized', {})
+    if not config.get('BACKEND', '').endswith('.FileBasedCache'):
+        return None
+    return os.path.join(config['LOCATION'], cache_key + '.lock')
+
+@contextmanager
+def htmlized_render_lock(cache_key):
+    """Try to get the right to render the given htmlized cache entry, so
+    that only one process renders it at a time, and give whether we got
+    it.  The lock is a file created with O_EXCL, which is atomic, unlike
+    cache.add() on a file based cache.  A lock file older than
+    HTMLIZER_LOCK_TIME is taken to be left behind by a process which died
+    while rendering, and is replaced."""
+    path = htmlized_lock_path(cache_key)
+    if path is None:
+        yield True
+        return
+
+    try:
+        if time.time() - os.path.getmtime(path) > settings.HTMLIZER_LOCK_TIME:
+            os.unlink(path)
+    except OSError:
+        pass
+
+    locked = False
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        locked = True
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            log.log("Could not create htmlizer lock %s: %s" % (path, e))
+
+    try:
+        yield locked
+    finally:
+        if locked:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+def wait_for_htmlized_cache_entry(cache_key):
+    """Wait for the process which holds the render lock of the given
+    htmlized cache entry to store it, polling every
+    HTMLIZER_LOCK_POLL_INTERVAL for at most HTMLIZER_LOCK_TIME, and return
+    the entry, or None if it doesn't turn up."""
+    path = htmlized_lock_path(cache_key)
+    deadline = time.time() + settings.HTMLIZER_LOCK_TIME
+    while time.time() < deadline:
+        time.sleep(settings.HTMLIZER_LOCK_POLL_INTERVAL)
+        html, fresh = get_htmlized_cache_entry(cache_key)
+        if html and fresh:
+            return html
+        if path is None or not os.path.exists(path):
+            break                       # the other process is done, without storing it
+    return None
+
 class DocumentInfo(models.Model):
     """Any kind of document.  Draft, RFC, Charter, IPR Statement, Liaison Statement"""
     time = models.DateTimeField(default=datetime.datetime.now) # should probably have auto_now=True
@@ -424,6 +517,11 @@ class DocumentInfo(models.Model):
             raise TypeError("Expected method called on Document or DocHistory")
 
     def all_relations_that(self, relationship, related=None):
+        """Return the related-document objects that describe a given relationship
+        targeting self, directly or through the sources of other such relations."""
+        if isinstance(self, Document) and not related:
+            from ietf.doc.utils import relation_closure # Imported locally to avoid circular imports
+            return relation_closure(self, relationship, reverse=True)
         if not related:
             related = tuple([])
         rels = self.relations_that(relationship)
@@ -447,6 +545,12 @@ class DocumentInfo(models.Model):
             raise TypeError("Expected method called on Document or DocHistory")
 
     def all_relations_that_doc(self, relationship, related=None):
+        """Return the related-document objects that describe a given relationship
+        from self to other documents, directly or through the targets of other
+        such relations."""
+        if isinstance(self, Document) and not related:
+            from ietf.doc.utils import relation_closure # Imported locally to avoid circular imports
+            return relation_closure(self, relationship)
         if not related:
             related = tuple([])
         rels = self.relations_that_doc(relationship)
@@ -486,17 +590,7 @@ class DocumentInfo(models.Model):
         txtpath = root+'.txt'
         if ext != '.txt' and os.path.exists(txtpath):
             path = txtpath
-        try:
-            with io.open(path, 'rb') as file:
-                raw = file.read()
-        except IOError:
-            return None
-        try:
-            text = raw.decode('utf-8')
-        except UnicodeDecodeError:
-            text = raw.decode('latin-1')
-        #
-        return text
+        return read_text(path)
 
     def text_or_error(self):
         return self.text() or "Error; cannot read '%s'"%self.get_base_name()
@@ -510,18 +604,21 @@ class DocumentInfo(models.Model):
             return None
         html = ""
         if text:
-            cache = caches['htmlized']
             cache_key = name.split('.')[0]
-            try:
-                html = cache.get(cache_key)
-            except EOFError:
-                html = None
-            if not html:
-                # The path here has to match the urlpattern for htmlized
-                # documents in order to produce correct intra-document links
-                html = rfc2html.markup(text, path=settings.HTMLIZER_URL_PREFIX)
-                if html:
-                    cache.set(cache_key, html, settings.HTMLIZER_CACHE_TIME)
+            html, fresh = get_htmlized_cache_entry(cache_key)
+            if html and fresh:
+                return html
+            # Only one process renders a given document into the cache at
+            # a time.  The others serve the stale copy if there is one, or
+            # wait for the first one to store the document if there isn't,
+            # and only render it themselves if that takes too long.
+            with htmlized_render_lock(cache_key) as locked:
+                if locked:
+                    html = htmlize_text(text)
+                    if html:
+                        set_htmlized_cache_entry(cache_key, html)
+                elif not html:
+                    html = wait_for_htmlized_cache_entry(cache_key) or htmlize_text(text)
         return html
 
     class Meta:
@@ -936,6 +1033,28 @@ class DocAlias(models.Model):
         verbose_name = "document alias"
         verbose_name_plural = "document aliases"
 
+@python_2_unicode_compatible
+class DocumentSearchIndex(models.Model):
+    """The data document searches match, denormalized into one row per
+    document, so that a search doesn't have to join the alias, state and
+    author tables and make the result distinct.  Kept up to date by the
+    signal hooks at the end of this file, and rebuilt in bulk by the
+    rebuild_search_index management command."""
+    document = OneToOneField(Document, primary_key=True, related_name="search_index")
+    names = models.TextField(blank=True, help_text="Lowercased title and alias names of the document, one per line")
+    authors = models.TextField(blank=True, help_text="Lowercased name aliases and email addresses of the document authors, one per line")
+    state_slugs = models.CharField(max_length=255, blank=True, help_text="Slugs of the document states, each surrounded by spaces")
+    group = ForeignKey(Group, null=True, related_name="search_index_group_set")
+    area = ForeignKey(Group, null=True, on_delete=models.SET_NULL, related_name="search_index_area_set", help_text="The parent of the group, for working group documents")
+    ad = ForeignKey(Person, null=True)
+    stream = ForeignKey(StreamName, null=True)
+
+    def __str__(self):
+        return "Search index of %s" % self.document_id
+
+    class Meta:
+        verbose_name_plural = "document search index"
+
 class DocReminder(models.Model):
     event = ForeignKey('DocEvent')
     type = ForeignKey(DocReminderTypeName)
@@ -1212,3 +1331,62 @@ class EditedAuthorsDocEvent(DocEvent):
         Example 'basis' values might be from ['manually adjusted','recomputed by parsing document', etc.]
     """
     basis = models.CharField(help_text="What is the source or reasoning for the changes to the author list",max_length=255)
+
+
+# --- Signal hooks for doc models ---
+
+@receiver(models.signals.post_save, sender=RelatedDocument)
+@receiver(models.signals.post_delete, sender=RelatedDocument)
+@receiver(models.signals.m2m_changed, sender=DocAlias.docs.through)
+def invalidate_relation_closures(sender, instance=None, **kwargs):
+    from ietf.doc.utils import invalidate_relation_closures
+    invalidate_relation_closures()
+
+@receiver(models.signals.post_save, sender=Document)
+def create_search_index_entry(sender, instance=None, raw=False, **kwargs):
+    if not raw:
+        from ietf.doc.utils_search import update_search_index
+        update_search_index([instance.pk], create=True)
+
+@receiver(models.signals.post_save, sender=DocumentAuthor)
+@receiver(models.signals.post_delete, sender=DocumentAuthor)
+def update_search_index_for_author(sender, instance=None, raw=False, **kwargs):
+    if not raw:
+        from ietf.doc.utils_search import update_search_index
+        update_search_index([instance.document_id])
+
+@receiver(models.signals.post_save, sender=DocAlias)
+def update_search_index_for_alias(sender, instance=None, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        from ietf.doc.utils_search import update_search_index
+        update_search_index(instance.docs.values_list("pk", flat=True))
+
+@receiver(models.signals.m2m_changed, sender=DocAlias.docs.through)
+@receiver(models.signals.m2m_changed, sender=Document.states.through)
+def update_search_index_for_relation(sender, instance=None, action=None, pk_set=None, **kwargs):
+    from ietf.doc.utils_search import update_search_index
+    if isinstance(instance, Document):
+        if action in ("post_add", "post_remove", "post_clear"):
+            update_search_index([instance.pk])
+    elif action == "pre_clear":
+        # the documents are gone after the clear, so remember them
+        instance._search_index_doc_ids = list(instance.docs.values_list("pk", flat=True) if isinstance(instance, DocAlias)
+                                              else instance.document_set.values_list("pk", flat=True))
+    elif action == "post_clear":
+        update_search_index(getattr(instance, "_search_index_doc_ids", []))
+    elif action in ("post_add", "post_remove"):
+        update_search_index(pk_set)
+
+@receiver(models.signals.post_save, sender=Alias)
+@receiver(models.signals.post_delete, sender=Alias)
+@receiver(models.signals.post_save, sender=Email)
+@receiver(models.signals.post_delete, sender=Email)
+def update_search_index_for_person(sender, instance=None, raw=False, **kwargs):
+    if not raw and instance.person_id:
+        from ietf.doc.utils_search import update_search_index
+        update_search_index(DocumentAuthor.objects.filter(person=instance.person_id).values_list("document", flat=True))
+
+@receiver(models.signals.post_save, sender=Group)
+def update_search_index_for_group(sender, instance=None, raw=False, **kwargs):
+    if not raw:
+        DocumentSearchIndex.objects.filter(group=instance).update(area=instance.parent_id if instance.type_id == "wg" else None)
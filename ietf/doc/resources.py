@@ -17,7 +17,7 @@ from ietf.doc.models import (BallotType, DeletedEvent, StateType, State, Documen
     InitialReviewDocEvent, DocHistoryAuthor, BallotDocEvent, RelatedDocument,
     RelatedDocHistory, BallotPositionDocEvent, AddedMessageEvent, SubmissionDocEvent,
     ReviewRequestDocEvent, ReviewAssignmentDocEvent, EditedAuthorsDocEvent, DocumentURL,
-    IanaExpertDocEvent )
+    IanaExpertDocEvent, DocumentSearchIndex )
 
 from ietf.name.resources import BallotPositionNameResource, DocTypeNameResource
 class BallotTypeResource(ModelResource):
@@ -738,3 +738,31 @@ class IanaExpertDocEventResource(ModelResource):
             "docevent_ptr": ALL_WITH_RELATIONS,
         }
 api.doc.register(IanaExpertDocEventResource())
+
+
+from ietf.person.resources import PersonResource
+from ietf.group.resources import GroupResource
+from ietf.name.resources import StreamNameResource
+class DocumentSearchIndexResource(ModelResource):
+    document         = ToOneField(DocumentResource, 'document')
+    group            = ToOneField(GroupResource, 'group', null=True)
+    area             = ToOneField(GroupResource, 'area', null=True)
+    ad               = ToOneField(PersonResource, 'ad', null=True)
+    stream           = ToOneField(StreamNameResource, 'stream', null=True)
+    class Meta:
+        queryset = DocumentSearchIndex.objects.all()
+        serializer = api.Serializer()
+        cache = SimpleCache()
+        #resource_name = 'documentsearchindex'
+        ordering = ['document', ]
+        filtering = { 
+            "names": ALL,
+            "authors": ALL,
+            "state_slugs": ALL,
+            "document": ALL_WITH_RELATIONS,
+            "group": ALL_WITH_RELATIONS,
+            "area": ALL_WITH_RELATIONS,
+            "ad": ALL_WITH_RELATIONS,
+            "stream": ALL_WITH_RELATIONS,
+        }
+api.doc.register(DocumentSearchIndexResource())
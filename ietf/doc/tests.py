@@ -9,6 +9,7 @@ import shutil
 import datetime
 import io
 import sys
+import time
 import bibtexparser
 
 if sys.version_info[0] == 2 and sys.version_info[1] < 7:
@@ -16,6 +17,7 @@ if sys.version_info[0] == 2 and sys.version_info[1] < 7:
 else:
     import unittest
 
+from mock import patch
 from six.moves.http_cookies import SimpleCookie
 from pyquery import PyQuery
 from six.moves.urllib.parse import urlparse, parse_qs
@@ -23,23 +25,30 @@ from tempfile import NamedTemporaryFile
 
 from django.urls import reverse as urlreverse
 from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 
 from tastypie.test import ResourceTestCaseMixin
 
 import debug                            # pyflakes:ignore
 
 from ietf.doc.models import ( Document, DocAlias, DocRelationshipName, RelatedDocument, State,
-    DocEvent, BallotPositionDocEvent, LastCallDocEvent, WriteupDocEvent, NewRevisionDocEvent )
+    DocEvent, BallotPositionDocEvent, LastCallDocEvent, WriteupDocEvent, NewRevisionDocEvent,
+    DocumentAuthor, DocumentSearchIndex, get_htmlized_cache_entry, set_htmlized_cache_entry )
 from ietf.doc.factories import DocumentFactory, DocEventFactory, CharterFactory, ConflictReviewFactory, WgDraftFactory, IndividualDraftFactory, WgRfcFactory, IndividualRfcFactory, StateDocEventFactory
 from ietf.doc.utils import create_ballot_if_not_open
+from ietf.doc.utils_search import fill_in_document_table_attributes
 from ietf.group.models import Group
-from ietf.group.factories import GroupFactory
+from ietf.group.factories import GroupFactory, ReviewTeamFactory
 from ietf.ipr.factories import HolderIprDisclosureFactory
 from ietf.meeting.models import Meeting, Session, SessionPresentation
 from ietf.meeting.factories import MeetingFactory, SessionFactory
 from ietf.name.models import SessionStatusName
 from ietf.person.models import Person
-from ietf.person.factories import PersonFactory
+from ietf.person.factories import PersonFactory, EmailFactory
+from ietf.review.factories import ReviewRequestFactory
 from ietf.utils.mail import outbox
 from ietf.utils.test_utils import login_testing_unauthorized, unicontent
 from ietf.utils.test_utils import TestCase
@@ -103,6 +112,10 @@ class SearchTests(TestCase):
         self.assertEqual(r.status_code, 200)
         self.assertContains(r, draft.title)
 
+        r = self.client.get(base_url + "?activedrafts=on&by=author&author=%s" % draft.documentauthor_set.first().person.email().address)
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, draft.title)
+
         # find by group
         r = self.client.get(base_url + "?activedrafts=on&by=group&group=%s" % draft.group.acronym)
         self.assertEqual(r.status_code, 200)
@@ -128,6 +141,89 @@ class SearchTests(TestCase):
         self.assertEqual(r.status_code, 200)
         self.assertContains(r, draft.title)
 
+    def test_search_index(self):
+        draft = WgDraftFactory(name='draft-ietf-mars-index-test')
+        base_url = urlreverse('ietf.doc.views_search.search')
+
+        def found(query):
+            r = self.client.get(base_url + "?activedrafts=on&" + query)
+            self.assertEqual(r.status_code, 200)
+            return "No documents match" not in unicontent(r)
+
+        # aliases
+        self.assertFalse(found("name=rfc9999"))
+        DocAlias.objects.create(name="rfc9999").docs.add(draft)
+        self.assertTrue(found("name=RFC9999"))
+
+        # authors, and their email addresses
+        person = PersonFactory()
+        self.assertFalse(found("by=author&author=%s" % person.email().address))
+        DocumentAuthor.objects.create(document=draft, person=person, email=person.email(), order=2)
+        self.assertTrue(found("by=author&author=%s" % person.email().address))
+        EmailFactory(person=person, address="martian-author@example.org")
+        self.assertTrue(found("by=author&author=Martian-Author@"))
+
+        # areas
+        area = GroupFactory(type_id='area')
+        self.assertFalse(found("by=area&area=%s" % area.pk))
+        draft.group.parent = area
+        draft.group.save()
+        self.assertTrue(found("by=area&area=%s" % area.pk))
+
+        # states
+        draft.set_state(State.objects.get(type="draft", slug="expired"))
+        self.assertFalse(found("name=%s" % draft.name))
+
+        # without a complete index, the search falls back to subqueries
+        draft.set_state(State.objects.get(type="draft", slug="active"))
+        DocumentSearchIndex.objects.all().delete()
+        self.assertTrue(found("name=%s" % draft.name))
+        self.assertTrue(found("by=author&author=Martian-Author@"))
+        self.assertTrue(found("by=area&area=%s" % area.pk))
+
+        # bulk rebuild
+        call_command('rebuild_search_index')
+        self.assertTrue(found("name=%s" % draft.name))
+        self.assertEqual(DocumentSearchIndex.objects.count(), Document.objects.count())
+
+    def test_fill_in_document_table_attributes_query_count(self):
+        group = GroupFactory(type_id="wg")
+        team = ReviewTeamFactory()
+
+        def make_docs(n):
+            docs = []
+            for i in range(n):
+                draft = WgDraftFactory(group=group)
+                group.groupmilestone_set.create(state_id="active", desc="Milestone %s" % i, due=datetime.date.today()).docs.add(draft)
+                ReviewRequestFactory(doc=draft, team=team, state_id="assigned")
+                docs.append(draft)
+                docs.append(WgRfcFactory(group=group))
+            return docs
+
+        def count_queries(docs):
+            docs = list(Document.objects.filter(pk__in=[d.pk for d in docs]))
+            with CaptureQueriesContext(connection) as context:
+                fill_in_document_table_attributes(docs)
+                for d in docs:
+                    d.rfc_number()
+                    d.get_state_slug()
+            return len(context.captured_queries), docs
+
+        few, few_docs = count_queries(make_docs(2))
+        many, many_docs = count_queries(make_docs(10))
+        self.assertEqual(few, many)
+
+        drafts = [ d for d in many_docs if d.get_state_slug() == "active" ]
+        self.assertEqual(len(drafts), 10)
+        for d in drafts:
+            self.assertEqual(len(d.milestones), 1)
+            self.assertEqual(len(d.reviewed_by_teams), 1)
+            self.assertTrue(d.expirable)
+        for d in many_docs:
+            if d.get_state_slug() == "rfc":
+                self.assertEqual(d.search_heading, "RFC")
+                self.assertTrue(d.rfc_number())
+
     def test_search_for_name(self):
         draft = WgDraftFactory(name='draft-ietf-mars-test',group=GroupFactory(acronym='mars',parent=Group.objects.get(acronym='farfut')),authors=[PersonFactory()],ad=PersonFactory())
         draft.set_state(State.objects.get(used=True, type="draft-iesg", slug="pub-req"))
@@ -670,6 +766,59 @@ Man                    Expires September 22, 2015               [Page 3]
             self.assertEqual(r.status_code, 200)
             self.assertContains(r, "%s-00"%docname)
 
+    def test_htmlized_cache(self):
+        draft = WgDraftFactory(name='draft-ietf-mars-test',rev='01')
+        cache_key = 'draft-ietf-mars-test-01'
+        cache_dir = self.tempdir('htmlized')
+        lock_file = os.path.join(cache_dir, cache_key + '.lock')
+
+        with override_settings(CACHES={
+                'default': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+                'htmlized': { 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir, },
+                'ipr': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+            }):
+            cache = caches['htmlized']
+
+            # the new revision gets rendered ahead of the first request
+            call_command('warm_htmlized_cache', jobs=1)
+            html, fresh = get_htmlized_cache_entry(cache_key)
+            self.assertTrue(fresh)
+            self.assertIn("Deimos street", html)
+            self.assertEqual(draft.htmlized(), html)
+
+            # a stale copy is served while another process re-renders it
+            cache.set(cache_key, (time.time() - 1, "stale html"), 60)
+            io.open(lock_file, 'w').close()
+            self.assertEqual(draft.htmlized(), "stale html")
+
+            # without a stale copy, the copy stored by the other process is
+            # waited for
+            cache.delete(cache_key)
+            def other_process_stores_it(seconds):
+                set_htmlized_cache_entry(cache_key, "html from the other process")
+            with patch('ietf.doc.models.time.sleep', side_effect=other_process_stores_it) as sleep:
+                self.assertEqual(draft.htmlized(), "html from the other process")
+            self.assertEqual(sleep.call_count, 1)
+
+            # or if it doesn't turn up in time, the document is rendered,
+            # but left for the other process to store
+            cache.delete(cache_key)
+            os.utime(lock_file, None)
+            with override_settings(HTMLIZER_LOCK_TIME=0.5, HTMLIZER_LOCK_POLL_INTERVAL=0.1):
+                start = time.time()
+                self.assertEqual(draft.htmlized(), html)
+                self.assertGreaterEqual(time.time() - start, 0.5)
+            self.assertEqual(get_htmlized_cache_entry(cache_key), (None, False))
+
+            # a lock left behind by a process which died is replaced
+            cache.set(cache_key, (time.time() - 1, "stale html"), 60)
+            os.utime(lock_file, (time.time() - 3600, time.time() - 3600))
+            self.assertEqual(draft.htmlized(), html)
+            self.assertEqual(get_htmlized_cache_entry(cache_key), (html, True))
+            self.assertFalse(os.path.exists(lock_file))
+
+        shutil.rmtree(cache_dir)
+
 class DocTestCase(TestCase):
     def test_document_charter(self):
         CharterFactory(name='charter-ietf-mars')
@@ -1022,6 +1171,35 @@ class ReferencesTest(TestCase):
         self.assertContains(r, doc1.name)
        
 
+class RelationClosureTests(TestCase):
+    @override_settings(CACHES={
+        'default': { 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', },
+        'ipr': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+    })
+    def test_all_relations(self):
+        a, b, c, d = [ IndividualDraftFactory() for i in range(4) ]
+        a_b = a.relateddocument_set.create(relationship_id='replaces', target=b.docalias.first())
+        b_c = b.relateddocument_set.create(relationship_id='replaces', target=c.docalias.first())
+        c_a = c.relateddocument_set.create(relationship_id='replaces', target=a.docalias.first())
+        c_d = c.relateddocument_set.create(relationship_id='obs', target=d.docalias.first())
+
+        self.assertEqual(set(a.all_relations_that_doc('replaces')), set([a_b, b_c, c_a]))
+        self.assertEqual(set(a.all_relations_that_doc(('replaces', 'obs'))), set([a_b, b_c, c_a, c_d]))
+        self.assertEqual(set(d.all_relations_that('obs')), set([c_d]))
+        self.assertEqual(set(d.all_relations_that(('replaces', 'obs'))), set([a_b, b_c, c_a, c_d]))
+        self.assertEqual(set(a.all_related_that_doc('obs')), set())
+        self.assertEqual(set(b.all_related_that_doc(('replaces', 'obs'))), set(x.docalias.first() for x in (a, b, c, d)))
+
+        # the closure is cached, until a relation changes
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(set(a.all_relations_that_doc(('replaces', 'obs'))), set([a_b, b_c, c_a, c_d]))
+        self.assertEqual(len(queries), 1)
+        e = IndividualDraftFactory()
+        d_e = d.relateddocument_set.create(relationship_id='replaces', target=e.docalias.first())
+        self.assertEqual(set(a.all_relations_that_doc(('replaces', 'obs'))), set([a_b, b_c, c_a, c_d, d_e]))
+        c_d.delete()
+        self.assertEqual(set(a.all_relations_that_doc(('replaces', 'obs'))), set([a_b, b_c, c_a]))
+
 class EmailAliasesTests(TestCase):
 
     def setUp(self):
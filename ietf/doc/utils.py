@@ -18,6 +18,8 @@ from six.moves.urllib.parse import quote
 
 from django.conf import settings
 from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import F
 from django.forms import ValidationError
 from django.utils.html import escape
 from django.urls import reverse as urlreverse
@@ -31,7 +33,9 @@ from ietf.doc.models import TelechatDocEvent
 from ietf.name.models import DocReminderTypeName, DocRelationshipName
 from ietf.group.models import Role
 from ietf.ietfauth.utils import has_role
-from ietf.utils import draft, text
+from ietf.utils import text
+from ietf.utils.cache import get_generation, new_generation
+from ietf.utils.draft_cache import CachedDraft
 from ietf.utils.mail import send_mail
 from ietf.mailtrigger.utils import gather_address_lists
 from ietf.utils import log
@@ -548,7 +552,7 @@ def rebuild_reference_relations(doc,filename=None):
 
     try:
         with io.open(filename, 'rb') as file:
-            refs = draft.Draft(file.read().decode('utf8'), filename).get_refs()
+            refs = CachedDraft(file.read().decode('utf8'), filename).get_refs()
     except IOError as e:
         return { 'errors': ["%s :%s" %  (e.strerror, filename)] }
 
@@ -710,6 +714,63 @@ def extract_complete_replaces_ancestor_mapping_for_docs(names):
     return replaces
 
 
+RELATION_CLOSURE_GENERATION_KEY = "doc:relation_closure_generation"
+
+def walk_relations(doc_ids, relationship, reverse=False):
+    """Return a dict with the RelatedDocument objects, by id, with one of
+    the given relationships that can be reached from any of the documents
+    with doc_ids by following relations from their source to their target
+    documents, or, with reverse=True, from their target to their source
+    documents.  The relation graph is walked breadth first, with one
+    query per step for the whole frontier."""
+    if isinstance(relationship, six.string_types):
+        relationship = ( relationship, )
+
+    rels = {}
+    checked = set()
+    front = set(doc_ids)
+    while front:
+        checked.update(front)
+        if reverse:
+            relations = RelatedDocument.objects.filter(target__docs__in=front, relationship__in=relationship)
+            relations = relations.annotate(next_doc_id=F("source"))
+        else:
+            relations = RelatedDocument.objects.filter(source__in=front, relationship__in=relationship)
+            # one row for each document of the target alias
+            relations = relations.annotate(next_doc_id=F("target__docs"))
+        reached = set()
+        for r in relations.select_related("source", "target", "relationship"):
+            rels.setdefault(r.pk, r)
+            if r.next_doc_id is not None:
+                reached.add(r.next_doc_id)
+        front = reached - checked
+    return rels
+
+def relation_closure(doc, relationship, reverse=False):
+    """Return the RelatedDocument objects with one of the given
+    relationships that can be reached from doc, see walk_relations().
+
+    The ids of the result are cached until a RelatedDocument or the
+    documents of a DocAlias change, see invalidate_relation_closures()."""
+    if isinstance(relationship, six.string_types):
+        relationship = ( relationship, )
+
+    generation = get_generation(cache, RELATION_CLOSURE_GENERATION_KEY)
+    cache_key = "doc:relation_closure:%s:%s:%s:%s" % (generation, "reverse" if reverse else "forward",
+                                                      doc.pk, ",".join(sorted(relationship)))
+    rel_ids = cache.get(cache_key)
+    if rel_ids is not None:
+        return tuple(RelatedDocument.objects.filter(pk__in=rel_ids).select_related("source", "target", "relationship").order_by("pk"))
+
+    rels = walk_relations([doc.pk], relationship, reverse)
+    cache.set(cache_key, sorted(rels), settings.RELATION_CLOSURE_CACHE_TIME)
+    return tuple(rels[pk] for pk in sorted(rels))
+
+def invalidate_relation_closures():
+    """Called whenever a RelatedDocument or the documents of a DocAlias change."""
+    new_generation(cache, RELATION_CLOSURE_GENERATION_KEY)
+
+
 def make_rev_history(doc):
     # return document history data for inclusion in doc.json (used by timeline)
 
@@ -7,10 +7,77 @@ from __future__ import absolute_import, print_function, unicode_literals
 import datetime
 import debug                            # pyflakes:ignore
 
+from collections import defaultdict
+
+from django.db import transaction
+
 from ietf.community.utils import augment_docs_with_tracking_info
-from ietf.doc.models import Document, DocAlias, RelatedDocument, DocEvent, TelechatDocEvent, BallotDocEvent
-from ietf.doc.expire import expirable_draft
+from ietf.doc.models import ( Document, DocAlias, DocumentAuthor, DocumentSearchIndex, RelatedDocument,
+    DocEvent, TelechatDocEvent, BallotDocEvent )
+from ietf.doc.expire import expirable_drafts
+from ietf.group.models import GroupMilestone
 from ietf.meeting.models import SessionPresentation, Meeting, Session
+from ietf.person.models import Alias, Email
+from ietf.review.models import ReviewRequest
+
+def search_index_entries(doc_ids):
+    """Return unsaved DocumentSearchIndex objects for the documents with
+    doc_ids, built with a constant number of queries."""
+    doc_ids = list(doc_ids)
+
+    names = defaultdict(list)
+    for doc_id, name in DocAlias.docs.through.objects.filter(document__in=doc_ids).values_list("document", "docalias__name"):
+        names[doc_id].append(name)
+
+    state_slugs = defaultdict(set)
+    for doc_id, slug in Document.states.through.objects.filter(document__in=doc_ids).values_list("document", "state__slug"):
+        state_slugs[doc_id].add(slug)
+
+    author_person_ids = defaultdict(list)
+    for doc_id, person_id in DocumentAuthor.objects.filter(document__in=doc_ids).values_list("document", "person"):
+        author_person_ids[doc_id].append(person_id)
+
+    person_ids = set(p for l in author_person_ids.values() for p in l)
+    person_strings = defaultdict(list)
+    for person_id, name in Alias.objects.filter(person__in=person_ids).values_list("person", "name"):
+        person_strings[person_id].append(name)
+    for person_id, address in Email.objects.filter(person__in=person_ids).values_list("person", "address"):
+        person_strings[person_id].append(address)
+
+    entries = []
+    for pk, title, group_id, group_type_id, group_parent_id, ad_id, stream_id in Document.objects.filter(pk__in=doc_ids).values_list(
+            "pk", "title", "group", "group__type", "group__parent", "ad", "stream"):
+        entries.append(DocumentSearchIndex(
+            document_id=pk,
+            names="\n".join([title] + sorted(names[pk])).lower(),
+            authors="\n".join(s for p in author_person_ids[pk] for s in person_strings[p]).lower(),
+            state_slugs="".join(" %s " % slug for slug in sorted(state_slugs[pk])),
+            group_id=group_id,
+            area_id=group_parent_id if group_type_id == "wg" else None,
+            ad_id=ad_id,
+            stream_id=stream_id,
+        ))
+    return entries
+
+def update_search_index(doc_ids, create=False):
+    """Rebuild the search index entries of the documents with doc_ids.
+    Unless create is True, only the documents which already have an
+    entry are updated, so updates triggered while a document is being
+    deleted don't bring its entry back."""
+    doc_ids = set(doc_ids)
+    if not create:
+        doc_ids = set(DocumentSearchIndex.objects.filter(document__in=doc_ids).values_list("document", flat=True))
+    if not doc_ids:
+        return
+    entries = search_index_entries(doc_ids)
+    with transaction.atomic():
+        DocumentSearchIndex.objects.filter(document__in=doc_ids).delete()
+        DocumentSearchIndex.objects.bulk_create(entries)
+
+def search_index_complete():
+    """Return whether every document has a search index entry, so that
+    searches can be answered from the index alone."""
+    return not Document.objects.filter(search_index__isnull=True).exists()
 
 def wrap_value(v):
     return lambda: v
@@ -50,10 +117,23 @@ def fill_in_document_table_attributes(docs, have_telechat_date=False):
     # some hairy template code and avoid repeated SQL queries
     # TODO - this function evolved from something that assumed it was handling only drafts. It still has places where it assumes all docs are drafts where that is not a correct assumption
 
+    # everything below is looked up for the whole set of documents at
+    # once, so the number of queries doesn't grow with len(docs)
+
     doc_dict = dict((d.pk, d) for d in docs)
     doc_ids = list(doc_dict.keys())
 
-    rfc_aliases = dict([ (a.document.id, a.name) for a in DocAlias.objects.filter(name__startswith="rfc", docs__id__in=doc_ids) ])
+    rfc_aliases = dict(DocAlias.docs.through.objects.filter(docalias__name__startswith="rfc", document__id__in=doc_ids).values_list("document_id", "docalias__name"))
+
+    # states, unless the caller already prefetched them
+    needs_states = [ d.pk for d in docs if 'states' not in getattr(d, '_prefetched_objects_cache', {}) ]
+    if needs_states:
+        for d in docs:
+            if d.pk in needs_states:
+                d.state_cache = {}
+                d._cached_state_slug = {}
+        for ds in Document.states.through.objects.filter(document__id__in=needs_states).select_related('state'):
+            doc_dict[ds.document_id].state_cache[ds.state.type_id] = ds.state
 
     # latest event cache
     event_types = ("published_rfc",
@@ -81,11 +161,27 @@ def fill_in_document_table_attributes(docs, have_telechat_date=False):
     # get meetings
     fill_in_document_sessions(docs, doc_dict, doc_ids)
 
+    # expirability
+    expirable_ids = set(expirable_drafts(Document.objects.filter(pk__in=doc_ids)).values_list("pk", flat=True))
+
+    # milestones
+    milestones = defaultdict(list)
+    for dm in GroupMilestone.docs.through.objects.filter(document__id__in=doc_ids, groupmilestone__state="active").select_related("groupmilestone__state", "groupmilestone__group"):
+        milestones[dm.document_id].append(dm.groupmilestone)
+
+    # review teams
+    reviewed_by_teams = defaultdict(set)
+    for doc_id, acronym in ReviewRequest.objects.filter(doc__id__in=doc_ids, state__in=["assigned","accepted","part-completed","completed"]).values_list("doc_id", "team__acronym").distinct():
+        reviewed_by_teams[doc_id].add(acronym)
+
     # misc
     for d in docs:
         # emulate canonical name which is used by a lot of the utils
         d.canonical_name = wrap_value(rfc_aliases[d.pk] if d.pk in rfc_aliases else d.name)
 
+        d._cached_is_rfc = d.type_id == "draft" and d.get_state_slug() == "rfc"
+        d._cached_rfc_number = rfc_aliases[d.pk][3:] if d._cached_is_rfc and d.pk in rfc_aliases else None
+
         if d.rfc_number() != None and d.latest_event_cache["published_rfc"]:
             d.latest_revision_date = d.latest_event_cache["published_rfc"].time
         elif d.latest_event_cache["new_revision"]:
@@ -104,7 +200,7 @@ def fill_in_document_table_attributes(docs, have_telechat_date=False):
             else:
                 d.search_heading = "%s Internet-Draft" % d.get_state()
                 if state_slug == "active":
-                    d.expirable = expirable_draft(d)
+                    d.expirable = d.pk in expirable_ids
                 else:
                     d.expirable = False
         else:
@@ -112,8 +208,8 @@ def fill_in_document_table_attributes(docs, have_telechat_date=False):
             d.expirable = False
 
         if d.get_state_slug() != "rfc":
-            d.milestones = [ m for (t, s, v, m) in sorted(((m.time, m.state.slug, m.desc, m) for m in d.groupmilestone_set.all() if m.state_id == "active")) ]
-            d.reviewed_by_teams = sorted(set(r.team.acronym for r in d.reviewrequest_set.filter(state__in=["assigned","accepted","part-completed","completed"]).distinct().select_related('team')))
+            d.milestones = [ m for (t, s, v, m) in sorted(((m.time, m.state.slug, m.desc, m) for m in milestones[d.pk])) ]
+            d.reviewed_by_teams = sorted(reviewed_by_teams[d.pk])
 
         e = d.latest_event_cache.get('started_iesg_process', None)
         d.balloting_started = e.time if e else datetime.datetime.min
@@ -121,9 +217,9 @@ def fill_in_document_table_attributes(docs, have_telechat_date=False):
     # RFCs
 
     # errata
-    erratas = set(Document.objects.filter(tags="errata", name__in=list(rfc_aliases.keys())).distinct().values_list("name", flat=True))
+    erratas = set(Document.objects.filter(tags="errata", pk__in=list(rfc_aliases.keys())).values_list("pk", flat=True))
     for d in docs:
-        d.has_errata = d.name in erratas
+        d.has_errata = d.pk in erratas
 
     # obsoleted/updated by
     for a in rfc_aliases:
@@ -131,11 +227,12 @@ def fill_in_document_table_attributes(docs, have_telechat_date=False):
         d.obsoleted_by_list = []
         d.updated_by_list = []
 
+    rfc_alias_docs = dict((name, doc_id) for doc_id, name in rfc_aliases.items())
     xed_by = RelatedDocument.objects.filter(target__name__in=list(rfc_aliases.values()),
                                             relationship__in=("obs", "updates")).select_related('target')
-    rel_rfc_aliases = dict([ (a.document.id, a.name) for a in DocAlias.objects.filter(name__startswith="rfc", docs__id__in=[rel.source_id for rel in xed_by]) ])
+    rel_rfc_aliases = dict(DocAlias.docs.through.objects.filter(docalias__name__startswith="rfc", document__id__in=[rel.source_id for rel in xed_by]).values_list("document_id", "docalias__name"))
     for rel in xed_by:
-        d = doc_dict[rel.target.document.id]
+        d = doc_dict[rfc_alias_docs[rel.target.name]]
         if rel.relationship_id == "obs":
             l = d.obsoleted_by_list
         elif rel.relationship_id == "updates":
@@ -157,8 +254,7 @@ def prepare_document_table(request, docs, query=None, max_results=200):
         # evaluate and fill in attribute results immediately to decrease
         # the number of queries
         docs = docs.select_related("ad", "std_level", "intended_std_level", "group", "stream", "shepherd", )
-        docs = docs.prefetch_related("states__type", "tags", "groupmilestone_set__group", "reviewrequest_set__team",
-                                     "submission_set__checks", "ad__email_set", "docalias__iprdocrel_set")
+        docs = docs.prefetch_related("states__type", "tags", "submission_set__checks", "ad__email_set", "docalias__iprdocrel_set")
         docs = list(docs)
 
     fill_in_document_table_attributes(docs)
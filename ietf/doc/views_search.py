@@ -51,7 +51,7 @@ from django.utils.cache import _generate_cache_key # type: ignore (FIXME: remove
 
 import debug                            # pyflakes:ignore
 
-from ietf.doc.models import ( Document, DocHistory, DocAlias, State,
+from ietf.doc.models import ( Document, DocHistory, DocAlias, DocumentAuthor, State,
     LastCallDocEvent, NewRevisionDocEvent, IESG_SUBSTATE_TAGS )
 from ietf.doc.fields import select2_id_doc_name_json
 from ietf.doc.utils import get_search_cache_key
@@ -61,7 +61,7 @@ from ietf.name.models import DocTagName, DocTypeName, StreamName
 from ietf.person.models import Person
 from ietf.person.utils import get_active_ads
 from ietf.utils.draft_search import normalize_draftname
-from ietf.doc.utils_search import prepare_document_table
+from ietf.doc.utils_search import prepare_document_table, search_index_complete
 
 
 class SearchForm(forms.Form):
@@ -159,10 +159,21 @@ def retrieve_search_results(form, all_types=False):
 
         docs = Document.objects.filter(type__in=types)
 
+    # The names, authors, states, group, area, AD and stream are matched
+    # against the denormalized DocumentSearchIndex row of each document,
+    # so the search doesn't join the alias, state and author tables and
+    # doesn't need a .distinct().  The index holds lowercased text.  If
+    # some documents have no entry, e.g. before the index has been built,
+    # the multi-valued relations are matched in pk__in subqueries instead.
+    use_index = search_index_complete()
+
     # name
     if query["name"]:
-        docs = docs.filter(Q(docalias__name__icontains=query["name"]) |
-                           Q(title__icontains=query["name"])).distinct()
+        if use_index:
+            docs = docs.filter(search_index__names__contains=query["name"].lower())
+        else:
+            docs = docs.filter(Q(pk__in=DocAlias.objects.filter(name__icontains=query["name"]).values("docs")) |
+                               Q(title__icontains=query["name"]))
 
     # rfc/active/old check buttons
     allowed_draft_states = []
@@ -173,21 +184,30 @@ def retrieve_search_results(form, all_types=False):
     if query["olddrafts"]:
         allowed_draft_states.extend(['repl', 'expired', 'auth-rm', 'ietf-rm'])
 
-    docs = docs.filter(Q(states__slug__in=allowed_draft_states) |
-                       ~Q(type__slug='draft')).distinct()
+    if use_index:
+        in_allowed_state = Q()
+        for slug in allowed_draft_states:
+            in_allowed_state |= Q(search_index__state_slugs__contains=" %s " % slug)
+    else:
+        in_allowed_state = Q(pk__in=Document.objects.filter(states__slug__in=allowed_draft_states).values("pk"))
+    docs = docs.filter(in_allowed_state | ~Q(type__slug='draft'))
 
     # radio choices
     by = query["by"]
     if by == "author":
-        docs = docs.filter(
-            Q(documentauthor__person__alias__name__icontains=query["author"]) |
-            Q(documentauthor__person__email__address__icontains=query["author"])
-        )
+        if use_index:
+            docs = docs.filter(search_index__authors__contains=query["author"].lower())
+        else:
+            authors = DocumentAuthor.objects.filter(
+                Q(person__alias__name__icontains=query["author"]) |
+                Q(person__email__address__icontains=query["author"])
+            )
+            docs = docs.filter(pk__in=authors.values("document"))
     elif by == "group":
         docs = docs.filter(group__acronym=query["group"])
     elif by == "area":
         docs = docs.filter(Q(group__type="wg", group__parent=query["area"]) |
-                           Q(group=query["area"])).distinct()
+                           Q(group=query["area"]))
     elif by == "ad":
         docs = docs.filter(ad=query["ad"])
     elif by == "state":
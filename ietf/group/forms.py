@@ -231,6 +231,8 @@ class ManageReviewRequestForm(forms.Form):
     add_skip = forms.BooleanField(required=False)
 
     def __init__(self, review_req, *args, **kwargs):
+        reviewer_snapshot = kwargs.pop("reviewer_snapshot", None)
+
         if not "prefix" in kwargs:
             if review_req.pk is None:
                 kwargs["prefix"] = "r{}-{}".format(review_req.type_id, review_req.doc.name)
@@ -253,7 +255,7 @@ class ManageReviewRequestForm(forms.Form):
 
         self.fields["close"].widget.attrs["class"] = "form-control input-sm"
 
-        setup_reviewer_field(self.fields["reviewer"], review_req)
+        setup_reviewer_field(self.fields["reviewer"], review_req, reviewer_snapshot)
         self.fields["reviewer"].widget.attrs["class"] = "form-control input-sm"
 
         if self.is_bound:
@@ -366,6 +366,14 @@ class RoleHistory(models.Model):
 
 # --- Signal hooks for group models ---
 
+@receiver(models.signals.post_save, sender=Role)
+@receiver(models.signals.post_delete, sender=Role)
+@receiver(models.signals.post_save, sender=Group)
+@receiver(models.signals.post_delete, sender=Group)
+def invalidate_role_snapshots(sender, instance=None, **kwargs):
+    from ietf.ietfauth.utils import invalidate_role_snapshots
+    invalidate_role_snapshots()
+
 @receiver(models.signals.pre_save, sender=Group)
 def notify_rfceditor_of_group_name_change(sender, instance=None, **kwargs):
     if instance:
@@ -17,7 +17,7 @@ import debug                             # pyflakes:ignore
 from ietf.doc.factories import DocumentFactory, WgDraftFactory
 from ietf.doc.models import DocEvent, RelatedDocument
 from ietf.group.models import Role, Group
-from ietf.group.utils import get_group_role_emails, get_child_group_role_emails, get_group_ad_emails
+from ietf.group.utils import get_group_role_emails, get_child_group_role_emails, get_group_ad_emails, GroupRoleEmails
 from ietf.group.factories import GroupFactory, RoleFactory
 from ietf.utils.test_runner import set_coverage_checking
 from ietf.person.factories import EmailFactory
@@ -156,3 +156,16 @@ class GroupRoleEmailTests(TestCase):
             for item in emails:
                 self.assertIn('@', item)
 
+    def test_preloaded_group_role_emails(self):
+        # an inactive role address gives the person's address instead
+        role = Role.objects.filter(group__type='wg', name='secr').first()
+        role.email.active = False
+        role.email.save()
+        EmailFactory(person=role.person, primary=True)
+
+        preloaded = GroupRoleEmails()
+        for group in Group.objects.all():
+            self.assertEqual(preloaded.role_emails(group.pk, ['chair', 'secr']), get_group_role_emails(group, ['chair', 'secr']))
+            self.assertEqual(preloaded.child_role_emails(group.pk, ['chair', 'secr']), get_child_group_role_emails(group, ['chair', 'secr']))
+            self.assertEqual(preloaded.ad_emails(group.pk), get_group_ad_emails(group))
+
@@ -10,26 +10,29 @@ import six
 
 from pyquery import PyQuery
 
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse as urlreverse
 
 from ietf.utils.test_utils import login_testing_unauthorized, TestCase, reload_db_objects
-from ietf.doc.models import TelechatDocEvent
+from ietf.doc.models import LastCallDocEvent, TelechatDocEvent
 from ietf.group.models import Role
 from ietf.iesg.models import TelechatDate
-from ietf.person.models import Person
+from ietf.person.models import Email, Person
 from ietf.review.models import ReviewerSettings, UnavailablePeriod, ReviewSecretarySettings
 from ietf.review.utils import (
-    suggested_review_requests_for_team,
+    suggested_review_requests_for_team, suggested_review_requests_for_teams,
     review_assignments_needing_reviewer_reminder, email_reviewer_reminder,
     review_assignments_needing_secretary_reminder, email_secretary_reminder,
-    reviewer_rotation_list,
+    reviewer_rotation_list, reviewer_snapshot, invalidate_reviewer_snapshots, make_assignment_choices,
     send_unavaibility_period_ending_reminder, send_reminder_all_open_reviews)
 from ietf.name.models import ReviewResultName, ReviewRequestStateName, ReviewAssignmentStateName
 import ietf.group.views
 from ietf.utils.mail import outbox, empty_outbox
 from ietf.dbtemplate.factories import DBTemplateFactory
 from ietf.person.factories import PersonFactory, EmailFactory
-from ietf.doc.factories import DocumentFactory
+from ietf.doc.factories import DocumentFactory, WgDraftFactory
 from ietf.group.factories import RoleFactory, ReviewTeamFactory
 from ietf.review.factories import ReviewRequestFactory, ReviewerSettingsFactory, ReviewAssignmentFactory
 
@@ -118,6 +121,31 @@ class ReviewTests(TestCase):
 
         self.assertEqual(len(suggested_review_requests_for_team(team)), 1)
 
+    def test_suggested_review_requests_for_teams(self):
+        teams = [ ReviewTeamFactory() for i in range(3) ]
+        teams[2].reviewteamsettings.review_types.remove("lc")
+        docs = [ WgDraftFactory(states=[('draft-iesg', 'lc')]) for i in range(4) ]
+        for doc in docs:
+            LastCallDocEvent.objects.create(doc=doc, rev=doc.rev, type="sent_last_call", by=Person.objects.get(name="(System)"),
+                                            expires=datetime.datetime.now() + datetime.timedelta(days=7))
+        ReviewRequestFactory(team=teams[0], doc=docs[0], state_id='no-review-document')
+
+        with CaptureQueriesContext(connection) as queries:
+            suggested_review_requests_for_teams(teams[:1])
+
+        # more teams and existing requests don't take more queries
+        for team, doc in zip(teams, docs[1:]):
+            ReviewAssignmentFactory(review_request=ReviewRequestFactory(team=team, doc=doc, state_id='assigned'), state_id='accepted')
+        with self.assertNumQueries(len(queries)):
+            suggestions = suggested_review_requests_for_teams(teams)
+
+        self.assertEqual([ r.doc for r in suggestions[teams[0].pk] ], sorted(docs[2:], key=lambda d: d.pk, reverse=True))
+        self.assertEqual([ r.doc for r in suggestions[teams[1].pk] ], sorted(docs[:2] + docs[3:], key=lambda d: d.pk, reverse=True))
+        self.assertEqual(suggestions[teams[2].pk], [])
+        for team in teams:
+            self.assertEqual([ (r.team, r.doc, r.deadline) for r in suggested_review_requests_for_team(team) ],
+                             [ (r.team, r.doc, r.deadline) for r in suggestions[team.pk] ])
+
     def test_reviewer_overview(self):
         team = ReviewTeamFactory()
         reviewer = RoleFactory(name_id='reviewer',group=team,person__user__username='reviewer').person
@@ -234,6 +262,47 @@ class ReviewTests(TestCase):
         self.assertEqual(settings.skip_next,1)
         self.assertEqual(review_req3.state_id, "assigned")
 
+    @override_settings(CACHES={
+        'default': { 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'reviewer-snapshot-tests', },
+        'ipr': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+    })
+    def test_reviewer_snapshot(self):
+        group = ReviewTeamFactory()
+        reviewers = [ RoleFactory(name_id='reviewer', group=group).person for i in range(4) ]
+        ReviewerSettingsFactory(team=group, person=reviewers[0], filter_re='^draft-ietf-', skip_next=1)
+        ReviewerSettingsFactory(team=group, person=reviewers[1], min_interval=30)
+        done = ReviewRequestFactory(team=group, state_id='completed')
+        ReviewAssignmentFactory(review_request=done, reviewer=reviewers[1].email(), state_id='completed', assigned_on=datetime.datetime.now())
+        UnavailablePeriod.objects.create(team=group, person=reviewers[2], start_date=datetime.date.today(), availability="unavailable")
+        review_reqs = [ ReviewRequestFactory(team=group, doc__name='draft-ietf-mars-test-%s' % i) for i in range(5) ]
+        emails = Email.objects.filter(role__name="reviewer", role__group=group)
+
+        snapshot = reviewer_snapshot(group)
+        for review_req in review_reqs:
+            invalidate_reviewer_snapshots()
+            with CaptureQueriesContext(connection) as without_snapshot:
+                choices = make_assignment_choices(emails, review_req, None)
+            with CaptureQueriesContext(connection) as with_snapshot:
+                self.assertEqual(make_assignment_choices(emails, review_req, snapshot), choices)
+            self.assertLess(len(with_snapshot), len(without_snapshot))
+        labels = dict(choices)
+        self.assertIn("skip next 1", labels[reviewers[0].email().pk])
+        self.assertIn("filter regexp matches", labels[reviewers[0].email().pk])
+        self.assertIn("max frequency exceeded", labels[reviewers[1].email().pk])
+        self.assertIn("1 fully completed", labels[reviewers[1].email().pk])
+        self.assertIn("unavailable indefinitely", labels[reviewers[2].email().pk])
+
+        # the snapshot is cached until the team's reviewer data changes
+        with self.assertNumQueries(0):
+            reviewer_snapshot(group)
+        ReviewerSettings.objects.filter(team=group, person=reviewers[0]).update(skip_next=2)
+        self.assertEqual(reviewer_snapshot(group).reviewer_settings(reviewers[0].pk)[1], 1)
+        settings = ReviewerSettings.objects.get(team=group, person=reviewers[0])
+        settings.save()
+        self.assertEqual(reviewer_snapshot(group).reviewer_settings(reviewers[0].pk)[1], 2)
+        UnavailablePeriod.objects.filter(person=reviewers[2]).delete()
+        self.assertNotIn(reviewers[2].pk, reviewer_snapshot(group).unavailable_periods)
+
     def test_email_open_review_assignments(self):
         review_req1 = ReviewRequestFactory()
         ReviewAssignmentFactory(review_request=review_req1,reviewer=EmailFactory(person__user__username='marschairman'))
@@ -7,6 +7,8 @@ from __future__ import absolute_import, print_function, unicode_literals
 import io
 import os
 
+from collections import defaultdict
+
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.utils.safestring import mark_safe
@@ -21,6 +23,7 @@ from ietf.group.models import Group, RoleHistory, Role
 from ietf.ietfauth.utils import has_role
 from ietf.name.models import GroupTypeName
 from ietf.person.models import Email
+from ietf.person.utils import get_email_addresses, email_address_of
 from ietf.review.utils import can_manage_review_requests_for_team
 from ietf.utils import log
 from ietf.utils.history import get_history_object_for, copy_many_to_many_for_history
@@ -93,6 +96,52 @@ def get_group_ad_emails(group):
             emails.add(wg_ad_email)
     return emails
 
+class GroupRoleEmails(object):
+    """Preloads all groups and their roles, so that the email addresses
+    get_group_role_emails(), get_child_group_role_emails() and
+    get_group_ad_emails() return can be found for any number of groups
+    (by id) with a handful of queries in total, for instance when
+    generating the email aliases."""
+
+    def __init__(self):
+        self.groups = dict( (g["pk"], g) for g in Group.objects.values("pk", "acronym", "parent", "type", "state") )
+        self.children = defaultdict(list)
+        for g in self.groups.values():
+            self.children[g["parent"]].append(g)
+
+        person_addresses = get_email_addresses(Role.objects.filter(email__active=False).values("person"))
+        self.roles = defaultdict(list)
+        for group_id, role_name, address, active, person_id in Role.objects.order_by("name", "pk").values_list("group", "name", "email", "email__active", "email__person"):
+            self.roles[group_id].append((role_name, address, email_address_of(address, active, person_id, person_addresses)))
+
+    def role_emails(self, group_id, roles):
+        g = self.groups.get(group_id)
+        if not g or not g["acronym"] or g["acronym"] == 'none':
+            return set()
+        return set( e for role_name, address, e in self.roles[group_id] if role_name in roles and e )
+
+    def child_role_emails(self, parent_id, roles, group_type='wg'):
+        emails = set()
+        for g in self.children[parent_id]:
+            if g["type"] == group_type and g["state"] == "active":
+                emails |= self.role_emails(g["pk"], roles)
+        return emails
+
+    def ad_emails(self, group_id):
+        g = self.groups[group_id]
+        if not g["acronym"] or g["acronym"] == 'none':
+            return set()
+        if g["type"] == 'area':
+            emails = self.role_emails(group_id, roles=('pre-ad', 'ad', 'chair'))
+        else:
+            emails = self.role_emails(g["parent"], roles=('pre-ad', 'ad', 'chair'))
+        # Make sure the assigned AD is included (in case that is not one of the area ADs)
+        if g["state"] == 'active':
+            wg_ad_email = next((address for role_name, address, e in self.roles[group_id] if role_name == 'ad'), None)
+            if wg_ad_email:
+                emails.add(wg_ad_email)
+        return emails
+
 def save_milestone_in_history(milestone):
     h = get_history_object_for(milestone)
     h.milestone = milestone
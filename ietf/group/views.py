@@ -108,6 +108,7 @@ from ietf.review.utils import (can_manage_review_requests_for_team,
                                augment_review_requests_with_events,
                                get_default_filter_re,
                                days_needed_to_fulfill_min_interval_for_reviewers,
+                               reviewer_snapshot,
                               )
 from ietf.doc.models import LastCallDocEvent
 
@@ -1454,8 +1455,11 @@ def manage_review_requests(request, acronym, group_type=None, assignment_status=
     # conflicts
     query_dict = request.POST.copy() if request.method == "POST" else None
 
+    # the team's reviewer data is the same for all the forms
+    snapshot = reviewer_snapshot(group)
+
     for req in review_requests:
-        req.form = ManageReviewRequestForm(req, query_dict)
+        req.form = ManageReviewRequestForm(req, query_dict, reviewer_snapshot=snapshot)
 
         # add previous requests
         l = []
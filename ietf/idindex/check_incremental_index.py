@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+# Compare the incremental output of the I-D index generators with a full
+# run.  Index files which differ are reported, and their saved entries
+# are cleared so that the next incremental run renders them from scratch.
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import sys
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ietf.settings")
+
+import django
+django.setup()
+
+from ietf.idindex.index import check_incremental_index
+
+differ = check_incremental_index()
+for name in differ:
+    print("Incremental output of %s differed from a full run, its saved entries have been cleared" % name)
+if differ:
+    sys.exit(1)
@@ -37,12 +37,22 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import argparse
+import io
 import os
-import six
+import sys
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ietf.settings")
 
+parser = argparse.ArgumentParser()
+parser.add_argument("--incremental", action="store_true",
+    help="only render the lines of drafts which have changed since the last incremental run")
+args = parser.parse_args()
+
 import django
 django.setup()
 
-from ietf.idindex.index import all_id2_txt
-six.print_(all_id2_txt().encode('utf-8'), end=' ')
+from ietf.idindex.index import all_id2_txt_lines
+
+with io.open(sys.stdout.fileno(), "w", encoding="utf-8", closefd=False) as out:
+    for line in all_id2_txt_lines(incremental=args.incremental):
+        out.write(line)
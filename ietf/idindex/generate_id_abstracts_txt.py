@@ -36,12 +36,18 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import argparse
 import os
 import six
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ietf.settings")
 
+parser = argparse.ArgumentParser()
+parser.add_argument("--incremental", action="store_true",
+    help="only render the entries of drafts which have changed since the last incremental run")
+args = parser.parse_args()
+
 import django
 django.setup()
 
 from ietf.idindex.index import id_index_txt
-six.print_(id_index_txt(with_abstracts=True).encode('utf-8'), end=' ')
+six.print_(id_index_txt(with_abstracts=True, incremental=args.incremental).encode('utf-8'), end=' ')
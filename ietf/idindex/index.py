@@ -8,12 +8,18 @@ from __future__ import absolute_import, print_function, unicode_literals
 # www.ietf.org in the same directory as the I-Ds
 
 import datetime
+import io
+import json
 import os
 import pytz
+import re
 import six
 
+from collections import OrderedDict, defaultdict
+
 from django.conf import settings
-from django.template.loader import render_to_string
+from django.db.models import Max
+from django.template.loader import get_template, render_to_string
 
 import debug    # pyflakes:ignore
 
@@ -25,31 +31,131 @@ from ietf.group.models import Group
 from ietf.person.models import Person, Email
 from ietf.utils import log
 
-def all_id_txt():
+# Incremental generation: the index files are made up of one entry per
+# draft.  An incremental run renders the entries of the drafts which have
+# changed since the last incremental run only, and takes the rest from the
+# entries saved by that run in settings.IDINDEX_CACHE_DIR.  A draft counts
+# as changed when its key from index_keys() changes.  Things which don't
+# add an event to the draft, such as a person changing their name, are
+# only picked up by a full run, so check_incremental_index() should be run
+# regularly to compare the two.
+
+def index_keys(docs):
+    """Return the keys of the given documents for cached_entries(), as an
+    ordered dict of document id -> key, in name order.  The key changes
+    when the name, revision, states or tags of a document change, or an
+    event is added to it."""
+    states = defaultdict(list)
+    for doc_id, state_id in Document.states.through.objects.filter(document__in=docs).values_list("document_id", "state_id"):
+        states[doc_id].append(state_id)
+
+    tags = defaultdict(list)
+    for doc_id, tag_id in Document.tags.through.objects.filter(document__in=docs).values_list("document_id", "doctagname_id"):
+        tags[doc_id].append(tag_id)
+
+    keys = OrderedDict()
+    for pk, name, rev, last_event_id in docs.order_by("name").annotate(last_event_id=Max("docevent__id")).values_list("pk", "name", "rev", "last_event_id"):
+        keys[pk] = [name, rev, sorted(states[pk]), sorted(tags[pk]), last_event_id]
+    return keys
+
+def cached_entries_path(name):
+    return os.path.join(settings.IDINDEX_CACHE_DIR, "%s.json" % name)
+
+def load_cached_entries(name):
+    """Return the entries saved by the last incremental run of index file
+    name, as a dict of document id -> [key, entry]."""
+    try:
+        with io.open(cached_entries_path(name), encoding="utf-8") as f:
+            return dict((int(pk), e) for pk, e in json.load(f).items())
+    except (IOError, OSError, ValueError) as e:
+        log.log("Could not load the saved entries of %s, rendering all: %s" % (name, e))
+        return {}
+
+def save_cached_entries(name, entries):
+    if not os.path.exists(settings.IDINDEX_CACHE_DIR):
+        os.makedirs(settings.IDINDEX_CACHE_DIR)
+    path = cached_entries_path(name)
+    with io.open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(six.text_type(json.dumps(dict((six.text_type(pk), e) for pk, e in entries.items()))))
+    os.rename(path + ".tmp", path)
+
+def clear_cached_entries(name):
+    if os.path.exists(cached_entries_path(name)):
+        os.unlink(cached_entries_path(name))
+
+def cached_entries(name, keys, render):
+    """Return the entries of index file name for the documents in keys,
+    as an ordered dict of document id -> entry, in the order of keys.
+    render(doc_ids) is called to render the entries of the documents
+    whose key differs from the saved one, or of all documents
+    (doc_ids=None) if most of them have changed.  The entries are then
+    saved for the next run."""
+    saved = load_cached_entries(name)
+    changed = set(pk for pk, key in keys.items() if pk not in saved or saved[pk][0] != key)
+
+    rendered = {}
+    if changed:
+        rendered = render(changed if len(changed) <= len(keys) // 2 else None)
+
+    entries = OrderedDict()
+    new_saved = {}
+    for pk, key in keys.items():
+        if pk in rendered:
+            entry = rendered[pk]
+        elif pk in changed:
+            # the document changed after the keys were read, so it wasn't
+            # rendered; leave it out, the next run renders it again
+            continue
+        else:
+            entry = saved[pk][1]
+        entries[pk] = entry
+        new_saved[pk] = [key, entry]
+    save_cached_entries(name, new_saved)
+
+    return entries
+
+def restricted(qs, field, doc_ids):
+    return qs if doc_ids is None else qs.filter(**{ field + "__in": doc_ids })
+
+def index_drafts():
+    return Document.objects.filter(type="draft").exclude(name__startswith="rfc")
+
+def rfc_aliases_for_drafts(doc_ids=None):
+    qs = DocAlias.objects.filter(name__startswith="rfc", docs__states=State.objects.get(type="draft", slug="rfc"))
+    return dict(restricted(qs, "docs", doc_ids).values_list("docs__name", "name"))
+
+def replacements_for_drafts(doc_ids=None):
+    qs = RelatedDocument.objects.filter(target__docs__states=State.objects.get(type="draft", slug="repl"), relationship="replaces")
+    return dict(restricted(qs, "target__docs", doc_ids).values_list("target__name", "source__name"))
+
+def revision_times_for_drafts(doc_ids=None, event_model=NewRevisionDocEvent):
+    qs = event_model.objects.filter(type="new_revision", doc__name__startswith="draft-").order_by('time')
+    return dict(restricted(qs, "doc", doc_ids).values_list("doc__name", "time"))
+
+def all_id_entries(doc_ids=None):
+    """Generate (document id, section, line) for the lines of all_id.txt,
+    in the order they appear in the file, for all drafts or the drafts in
+    doc_ids.  The section is "" for drafts in the IESG process, otherwise
+    the slug of the draft state."""
     # this returns a lot of data so try to be efficient
 
     # precalculations
-    revision_time = dict(NewRevisionDocEvent.objects.filter(type="new_revision", doc__name__startswith="draft-").order_by('time').values_list("doc__name", "time"))
+    revision_time = revision_times_for_drafts(doc_ids)
 
     def formatted_rev_date(name):
         t = revision_time.get(name)
         return t.strftime("%Y-%m-%d") if t else ""
 
-    rfc_aliases = dict(DocAlias.objects.filter(name__startswith="rfc",
-                                               docs__states=State.objects.get(type="draft", slug="rfc")).values_list("docs__name", "name"))
-
-    replacements = dict(RelatedDocument.objects.filter(target__docs__states=State.objects.get(type="draft", slug="repl"),
-                                                       relationship="replaces").values_list("target__name", "source__name"))
+    rfc_aliases = rfc_aliases_for_drafts(doc_ids)
 
+    replacements = replacements_for_drafts(doc_ids)
 
     # we need a distinct to prevent the queries below from multiplying the result
-    all_ids = Document.objects.filter(type="draft").order_by('name').exclude(name__startswith="rfc").distinct()
+    all_ids = restricted(index_drafts(), "pk", doc_ids).order_by('name').distinct()
 
-    res = ["\nInternet-Drafts Status Summary\n"]
-
-    def add_line(f1, f2, f3, f4):
+    def format_line(f1, f2, f3, f4):
         # each line must have exactly 4 tab-separated fields
-        res.append(f1 + "\t" + f2 + "\t" + f3 + "\t" + f4)
+        return f1 + "\t" + f2 + "\t" + f3 + "\t" + f4 + "\n"
 
 
     inactive_states = ["idexists", "pub", "watching", "dead"]
@@ -57,18 +163,19 @@ def all_id_txt():
     excludes = list(State.objects.filter(type="draft", slug__in=["rfc","repl"]))
     includes = list(State.objects.filter(type="draft-iesg").exclude(slug__in=inactive_states))
     in_iesg_process = all_ids.exclude(states__in=excludes).filter(states__in=includes).only("name", "rev")
+    in_iesg_process = in_iesg_process.prefetch_related("states", "tags")
 
     # handle those actively in the IESG process
     for d in in_iesg_process:
         state = d.get_state("draft-iesg").name
-        tags = d.tags.filter(slug__in=IESG_SUBSTATE_TAGS).values_list("name", flat=True)
+        tags = [t.name for t in d.tags.all() if t.slug in IESG_SUBSTATE_TAGS]
         if tags:
             state += "::" + "::".join(tags)
-        add_line(d.name + "-" + d.rev,
-                 formatted_rev_date(d.name),
-                 "In IESG processing - ID Tracker state <" + state + ">",
-                 "",
-                 )
+        yield d.pk, "", format_line(d.name + "-" + d.rev,
+                                    formatted_rev_date(d.name),
+                                    "In IESG processing - ID Tracker state <" + state + ">",
+                                    "",
+                                    )
 
 
     # handle the rest
@@ -76,7 +183,7 @@ def all_id_txt():
     not_in_process = all_ids.exclude(pk__in=[d.pk for d in in_iesg_process])
 
     for s in State.objects.filter(type="draft").order_by("order"):
-        for name, rev in not_in_process.filter(states=s).values_list("name", "rev"):
+        for pk, name, rev in not_in_process.filter(states=s).values_list("pk", "name", "rev").iterator():
             state = s.name
             last_field = ""
 
@@ -87,13 +194,44 @@ def all_id_txt():
             elif s.slug == "repl":
                 state += " replaced by " + replacements.get(name, "0")
 
-            add_line(name + "-" + rev,
-                     formatted_rev_date(name),
-                     state,
-                     last_field,
-                    )
-
-    return "\n".join(res) + "\n"
+            yield pk, s.slug, format_line(name + "-" + rev,
+                                          formatted_rev_date(name),
+                                          state,
+                                          last_field,
+                                          )
+
+def all_id_txt(incremental=False):
+    return "".join(all_id_txt_lines(incremental))
+
+def all_id_txt_lines(incremental=False):
+    """Generate the lines of all_id.txt, so callers can write them out
+    as they come instead of holding the whole file in memory.  If
+    incremental is set, only the lines of drafts which have changed since
+    the last incremental run are rendered, see cached_entries()."""
+    yield "\nInternet-Drafts Status Summary\n\n"
+
+    if not incremental:
+        for __, __, line in all_id_entries():
+            yield line
+        return
+
+    def render(doc_ids):
+        return dict((pk, [section, line]) for pk, section, line in all_id_entries(doc_ids))
+
+    keys = index_keys(index_drafts())
+    entries = cached_entries("all_id", keys, render)
+
+    # splice the lines together in the order all_id_entries() generates them
+    sections = OrderedDict([ ("", []) ])
+    for slug in State.objects.filter(type="draft").order_by("order").values_list("slug", flat=True):
+        sections[slug] = []
+    for entry in entries.values():
+        if entry and entry[0] in sections:
+            sections[entry[0]].append(entry[1])
+
+    for lines in sections.values():
+        for line in lines:
+            yield line
 
 def file_types_for_drafts():
     """Look in the draft directory and return file types found as dict (name + rev -> [t1, t2, ...])."""
@@ -109,40 +247,43 @@ def file_types_for_drafts():
 
     return file_types
 
-def all_id2_txt():
+def all_id2_entries(doc_ids=None, file_types=None):
+    """Generate (document id, line) for the draft lines of all_id2.txt,
+    in name order, for all drafts or the drafts in doc_ids."""
     # this returns a lot of data so try to be efficient
 
-    drafts = Document.objects.filter(type="draft").exclude(name__startswith="rfc").order_by('name')
+    drafts = restricted(index_drafts(), "pk", doc_ids).order_by('name')
     drafts = drafts.select_related('group', 'group__parent', 'ad', 'intended_std_level', 'shepherd', )
-    drafts = drafts.prefetch_related("states")
+    drafts = drafts.prefetch_related("states", "tags")
+
+    rfc_aliases = rfc_aliases_for_drafts(doc_ids)
 
-    rfc_aliases = dict(DocAlias.objects.filter(name__startswith="rfc",
-                                               docs__states=State.objects.get(type="draft", slug="rfc")).values_list("docs__name", "name"))
+    replacements = replacements_for_drafts(doc_ids)
 
-    replacements = dict(RelatedDocument.objects.filter(target__docs__states=State.objects.get(type="draft", slug="repl"),
-                                                       relationship="replaces").values_list("target__name", "source__name"))
+    revision_time = revision_times_for_drafts(doc_ids, DocEvent)
 
-    revision_time = dict(DocEvent.objects.filter(type="new_revision", doc__name__startswith="draft-").order_by('time').values_list("doc__name", "time"))
+    lc_expires = LastCallDocEvent.objects.filter(type="sent_last_call", doc__states__type="draft-iesg", doc__states__slug="lc").order_by("time", "id")
+    lc_expires = dict(restricted(lc_expires, "doc", doc_ids).values_list("doc_id", "expires"))
 
-    file_types = file_types_for_drafts()
+    if file_types is None:
+        file_types = file_types_for_drafts()
 
     authors = {}
-    for a in DocumentAuthor.objects.filter(document__name__startswith="draft-").order_by("order").select_related("email", "person").iterator():
-        if a.document.name not in authors:
-            l = authors[a.document.name] = []
+    for a in restricted(DocumentAuthor.objects.filter(document__name__startswith="draft-"), "document", doc_ids).order_by("order").select_related("email", "person").iterator():
+        if a.document_id not in authors:
+            l = authors[a.document_id] = []
         else:
-            l = authors[a.document.name]
+            l = authors[a.document_id]
         if a.email:
             l.append('%s <%s>' % (a.person.plain_name().replace("@", ""), a.email.address.replace(",", "")))
         else:
             l.append(a.person.plain_name())
 
     shepherds = dict((e.pk, e.formatted_ascii_email().replace('"', ''))
-                     for e in Email.objects.filter(shepherd_document_set__type="draft").select_related("person").distinct())
+                     for e in restricted(Email.objects.filter(shepherd_document_set__type="draft"), "shepherd_document_set", doc_ids).select_related("person").distinct())
     ads = dict((p.pk, p.formatted_ascii_email().replace('"', ''))
-               for p in Person.objects.filter(ad_document_set__type="draft").distinct())
+               for p in restricted(Person.objects.filter(ad_document_set__type="draft"), "ad_document_set", doc_ids).distinct())
 
-    res = []
     for d in drafts:
         state = d.get_state_slug()
         iesg_state = d.get_state("draft-iesg")
@@ -157,10 +298,12 @@ def all_id2_txt():
         # 3
         if state == "active":
             s = "I-D Exists"
-            log.assertion('iesg_state')
+            if not iesg_state:
+                # log.assertion() inspects the stack, only call it when it fails
+                log.assertion('iesg_state')
             if iesg_state:
                 s = iesg_state.name
-                tags = d.tags.filter(slug__in=IESG_SUBSTATE_TAGS).values_list("name", flat=True)
+                tags = [t.name for t in d.tags.all() if t.slug in IESG_SUBSTATE_TAGS]
                 if tags:
                     s += "::" + "::".join(tags)
             fields.append(s)
@@ -199,33 +342,65 @@ def all_id2_txt():
         # 10
         fields.append(d.intended_std_level.name if d.intended_std_level else "")
         # 11
-        lc_expires = ""
+        expires = ""
         if iesg_state and iesg_state.slug == "lc":
-            e = d.latest_event(LastCallDocEvent, type="sent_last_call")
+            e = lc_expires.get(d.pk)
             if e:
-                lc_expires = e.expires.strftime("%Y-%m-%d")
-        fields.append(lc_expires)
+                expires = e.strftime("%Y-%m-%d")
+        fields.append(expires)
         # 12
-        doc_file_types = file_types.get(d.name + "-" + d.rev, [])
-        doc_file_types.sort()           # make the order consistent (and the result testable)
+        doc_file_types = sorted(file_types.get(d.name + "-" + d.rev, [])) # make the order consistent (and the result testable)
         fields.append(",".join(doc_file_types) if state == "active" else "")
         # 13
         fields.append(clean_whitespace(d.title)) # FIXME: we should make sure this is okay in the database and in submit
         # 14
-        fields.append(", ".join(authors.get(d.name, [])))
+        fields.append(", ".join(authors.get(d.pk, [])))
         # 15
         fields.append(shepherds.get(d.shepherd_id, ""))
         # 16 Responsible AD name and email
         fields.append(ads.get(d.ad_id, ""))
 
         #
-        res.append("\t".join(fields))
-
-    return render_to_string("idindex/all_id2.txt", {'data': "\n".join(res) })
-
-def active_drafts_index_by_group(extra_values=()):
-    """Return active drafts grouped into their corresponding
-    associated group, for spitting out draft index."""
+        yield d.pk, "\t".join(fields) + "\n"
+
+def all_id2_txt(incremental=False):
+    return "".join(all_id2_txt_lines(incremental))
+
+def all_id2_txt_lines(incremental=False):
+    """Generate the lines of all_id2.txt, so callers can write them out
+    as they come instead of holding the whole file in memory.  If
+    incremental is set, only the lines of drafts which have changed since
+    the last incremental run are rendered, see cached_entries()."""
+    yield render_to_string("idindex/all_id2.txt")
+
+    if incremental:
+        file_types = file_types_for_drafts()
+
+        def render(doc_ids):
+            return dict(all_id2_entries(doc_ids, file_types))
+
+        keys = index_keys(index_drafts())
+        for key in keys.values():
+            # field 12 comes from the draft directory, not the database
+            key.append(sorted(file_types.get(key[0] + "-" + key[1], [])))
+        entries = cached_entries("all_id2", keys, render)
+        lines = iter(entries.values())
+    else:
+        lines = (line for __, line in all_id2_entries())
+
+    empty = True
+    for line in lines:
+        yield line
+        empty = False
+
+    if empty:
+        yield "\n"
+    yield "# end\n"
+
+def active_drafts_index(extra_values=(), doc_ids=None):
+    """Return the active drafts, or the active drafts in doc_ids, as
+    dicts keyed by document id, with the group they are listed under in
+    the draft index."""
 
     # this returns a lot of data so try to be efficient
 
@@ -234,19 +409,21 @@ def active_drafts_index_by_group(extra_values=()):
     wg_adopt = State.objects.get(type="draft-stream-ietf", slug="c-adopt")
     individual = Group.objects.get(acronym='none')
 
-    groups_dict = dict((g.id, g) for g in Group.objects.all())
+    active_drafts = restricted(Document.objects.filter(states=active_state), "pk", doc_ids)
 
     extracted_values = ("name", "rev", "title", "group_id") + extra_values
 
-    docs_dict = dict((d["name"], d)
-                     for d in Document.objects.filter(states=active_state).values(*extracted_values))
+    docs_dict = {}
+    docs_by_id = {}
+    for d in active_drafts.values("pk", *extracted_values):
+        docs_dict[d["name"]] = docs_by_id[d.pop("pk")] = d
 
     # Special case for drafts with group set, but in state wg_cand:
-    for d in Document.objects.filter(states=active_state).filter(states__in=[wg_cand, wg_adopt]):
-        docs_dict[d.name]['group_id'] = individual.id
+    for name in active_drafts.filter(states__in=[wg_cand, wg_adopt]).values_list("name", flat=True):
+        docs_dict[name]['group_id'] = individual.id
 
     # add initial and latest revision time
-    for time, doc_name in NewRevisionDocEvent.objects.filter(type="new_revision", doc__states=active_state).order_by('-time').values_list("time", "doc__name"):
+    for time, doc_name in restricted(NewRevisionDocEvent.objects.filter(type="new_revision", doc__states=active_state), "doc", doc_ids).order_by('-time').values_list("time", "doc__name"):
         d = docs_dict.get(doc_name)
         if d:
             if "rev_time" not in d:
@@ -254,15 +431,23 @@ def active_drafts_index_by_group(extra_values=()):
             d["initial_rev_time"] = time
 
     # add authors
-    for a in DocumentAuthor.objects.filter(document__states=active_state).order_by("order").select_related("person"):
-        d = docs_dict.get(a.document.name)
+    for a in restricted(DocumentAuthor.objects.filter(document__states=active_state), "document", doc_ids).order_by("order").select_related("person"):
+        d = docs_by_id.get(a.document_id)
         if d:
             if "authors" not in d:
                 d["authors"] = []
             d["authors"].append(a.person.plain_ascii()) # This should probably change to .plain_name() when non-ascii names are permitted
 
+    return docs_by_id
+
+def active_drafts_index_by_group(extra_values=()):
+    """Return active drafts grouped into their corresponding
+    associated group, for spitting out draft index."""
+
+    groups_dict = dict((g.id, g) for g in Group.objects.all())
+
     # put docs into groups
-    for d in docs_dict.values():
+    for d in active_drafts_index(extra_values).values():
         group = groups_dict.get(d["group_id"])
         if not group:
             continue
@@ -280,27 +465,98 @@ def active_drafts_index_by_group(extra_values=()):
         g.active_drafts.sort(key=lambda d: d.get("initial_rev_time", fallback_time))
 
     return groups
-    
-def id_index_txt(with_abstracts=False):
+
+def id_index_entries(with_abstracts=False, doc_ids=None, file_types=None):
+    """Return the entries of id_index.txt for all active drafts or the
+    active drafts in doc_ids, as a dict of document id -> [group id,
+    initial revision time, name, rendered entry]."""
     extra_values = ()
     if with_abstracts:
         extra_values = ("abstract",)
-    groups = active_drafts_index_by_group(extra_values)
 
-    file_types = file_types_for_drafts()
+    if file_types is None:
+        file_types = file_types_for_drafts()
+
+    template = get_template("idindex/id_index_entry.txt")
+
+    entries = {}
+    for pk, d in active_drafts_index(extra_values, doc_ids).items():
+        # we need to output a multiple extension thing
+        types = file_types.get(d["name"] + "-" + d["rev"], "")
+        exts = ".txt"
+        if ".ps" in types:
+            exts += ",.ps"
+        if ".pdf" in types:
+            exts += ",.pdf"
+        d["exts"] = exts
+
+        initial_rev_time = d.get("initial_rev_time", datetime.datetime(1950, 1, 1))
+        entries[pk] = [d["group_id"], initial_rev_time.strftime("%Y-%m-%d %H:%M:%S.%f"), d["name"],
+                       template.render({ 'd': d, 'with_abstracts': with_abstracts })]
+
+    return entries
+
+def id_index_txt(with_abstracts=False, incremental=False):
+    """Return id_index.txt, or the abstracts version of it.  If
+    incremental is set, only the entries of drafts which have changed
+    since the last incremental run are rendered, see cached_entries()."""
+    if incremental:
+        file_types = file_types_for_drafts()
+
+        def render(doc_ids):
+            return id_index_entries(with_abstracts, doc_ids, file_types)
+
+        active_state = State.objects.get(type="draft", slug="active")
+        keys = index_keys(Document.objects.filter(states=active_state))
+        for key in keys.values():
+            # the extensions come from the draft directory, not the database
+            key.append(sorted(file_types.get(key[0] + "-" + key[1], [])))
+        entries = cached_entries("id_abstracts" if with_abstracts else "id_index", keys, render)
+    else:
+        entries = id_index_entries(with_abstracts)
+
+    groups_dict = dict((g.id, g) for g in Group.objects.all())
+
+    for group_id, initial_rev_time, name, entry in entries.values():
+        group = groups_dict.get(group_id)
+        if not group:
+            continue
+
+        if not hasattr(group, "active_drafts"):
+            group.active_drafts = []
+
+        group.active_drafts.append((initial_rev_time, name, entry))
+
+    groups = [g for g in groups_dict.values() if hasattr(g, "active_drafts")]
+    groups.sort(key=lambda g: g.acronym)
+
     for g in groups:
-        for d in g.active_drafts:
-            # we need to output a multiple extension thing
-            types = file_types.get(d["name"] + "-" + d["rev"], "")
-            exts = ".txt"
-            if ".ps" in types:
-                exts += ",.ps"
-            if ".pdf" in types:
-                exts += ",.pdf"
-            d["exts"] = exts
+        g.active_drafts = [entry for __, __, entry in sorted(g.active_drafts)]
 
     return render_to_string("idindex/id_index.txt", {
             'groups': groups,
             'time': datetime.datetime.now(pytz.UTC).strftime("%Y-%m-%d %H:%M:%S %Z"),
             'with_abstracts': with_abstracts,
             })
+
+def check_incremental_index():
+    """Compare the output of an incremental run of each index file with
+    a full run, ignoring the generation time.  Return the names of the
+    files which differ, after clearing their saved entries so that the
+    next incremental run renders them from scratch."""
+    def without_time(text):
+        return re.sub(r"[Gg]enerated:? \d{4}-\d\d-\d\d \d\d:\d\d:\d\d \S+", "", text)
+
+    index_files = [
+        ("all_id", lambda incremental: all_id_txt(incremental)),
+        ("all_id2", lambda incremental: all_id2_txt(incremental)),
+        ("id_index", lambda incremental: id_index_txt(incremental=incremental)),
+        ("id_abstracts", lambda incremental: id_index_txt(with_abstracts=True, incremental=incremental)),
+    ]
+
+    differ = []
+    for name, generate in index_files:
+        if without_time(generate(True)) != without_time(generate(False)):
+            differ.append(name)
+            clear_cached_entries(name)
+    return differ
@@ -10,15 +10,18 @@ import os
 import shutil
 import six
 
+from collections import OrderedDict
+
 from django.conf import settings
+from django.test import override_settings
 
 import debug    # pyflakes:ignore
 
 from ietf.doc.factories import WgDraftFactory
-from ietf.doc.models import Document, DocAlias, RelatedDocument, State, LastCallDocEvent, NewRevisionDocEvent
+from ietf.doc.models import Document, DocAlias, DocEvent, RelatedDocument, State, LastCallDocEvent, NewRevisionDocEvent
 from ietf.group.factories import GroupFactory
 from ietf.name.models import DocRelationshipName
-from ietf.idindex.index import all_id_txt, all_id2_txt, id_index_txt
+from ietf.idindex.index import all_id_txt, all_id2_txt, id_index_txt, check_incremental_index, cached_entries
 from ietf.person.factories import PersonFactory, EmailFactory
 from ietf.utils.test_utils import TestCase
 
@@ -27,10 +30,12 @@ class IndexTests(TestCase):
         self.id_dir = self.tempdir('id')
         self.saved_internet_draft_path = settings.INTERNET_DRAFT_PATH
         settings.INTERNET_DRAFT_PATH = self.id_dir
+        self.cache_dir = self.tempdir('idindex-cache')
 
     def tearDown(self):
         settings.INTERNET_DRAFT_PATH = self.saved_internet_draft_path
         shutil.rmtree(self.id_dir)
+        shutil.rmtree(self.cache_dir)
         
     def write_draft_file(self, name, size):
         with io.open(os.path.join(self.id_dir, name), 'w') as f:
@@ -92,7 +97,11 @@ class IndexTests(TestCase):
         self.write_draft_file("%s-%s.txt" % (draft.name, draft.rev), 5000)
         self.write_draft_file("%s-%s.pdf" % (draft.name, draft.rev), 5000)
 
-        t = get_fields(all_id2_txt())
+        txt = all_id2_txt()
+        self.assertTrue(txt.endswith("\n# end\n"))
+        self.assertEqual(txt.count("\n%s-%s\t" % (draft.name, draft.rev)), 1)
+
+        t = get_fields(txt)
         self.assertEqual(t[0], draft.name + "-" + draft.rev)
         self.assertEqual(t[1], "-1")
         self.assertEqual(t[2], "Active")
@@ -152,3 +161,44 @@ class IndexTests(TestCase):
         txt = id_index_txt(with_abstracts=True)
 
         self.assertTrue(draft.abstract[:20] in txt)
+
+    def test_incremental_index(self):
+        draft = WgDraftFactory(states=[('draft','active'),('draft-iesg','lc')],abstract='a'*20,authors=[PersonFactory()])
+        other = WgDraftFactory(states=[('draft','active')])
+        self.write_draft_file("%s-%s.txt" % (draft.name, draft.rev), 5000)
+
+        with override_settings(IDINDEX_CACHE_DIR=self.cache_dir):
+            self.assertEqual(all_id_txt(incremental=True), all_id_txt())
+            self.assertIn(draft.name, all_id2_txt(incremental=True))
+            self.assertTrue(os.path.exists(os.path.join(self.cache_dir, "all_id2.json")))
+            self.assertEqual(check_incremental_index(), [])
+
+            # changes which add an event are picked up
+            draft.set_state(State.objects.get(type="draft-iesg", slug="iesg-eva"))
+            self.assertIn("IESG Evaluation", all_id_txt(incremental=True))
+            draft.title = "A changed title"
+            draft.save_with_history([DocEvent.objects.create(doc=draft, rev=draft.rev, type="changed_document", by=PersonFactory(), desc="Changed title")])
+            self.assertIn("A changed title", all_id2_txt(incremental=True))
+            self.assertIn("A changed title", id_index_txt(incremental=True))
+            self.assertEqual(check_incremental_index(), [])
+
+            # other changes are caught by the consistency check
+            Document.objects.filter(pk=other.pk).update(title="Changed behind our back")
+            self.assertNotIn("Changed behind our back", all_id2_txt(incremental=True))
+            self.assertEqual(set(check_incremental_index()), set(["all_id2", "id_index", "id_abstracts"]))
+            self.assertIn("Changed behind our back", all_id2_txt(incremental=True))
+            self.assertEqual(check_incremental_index(), [])
+
+            # drafts which disappear from the index are dropped
+            other.set_state(State.objects.get(type="draft", slug="expired"))
+            self.assertNotIn(other.name, id_index_txt(incremental=True))
+
+    def test_cached_entries_of_unrendered_documents(self):
+        # a document which changes between reading the keys and rendering
+        # is left out, and rendered by the next run
+        with override_settings(IDINDEX_CACHE_DIR=self.cache_dir):
+            keys = OrderedDict([ (1, ["a"]), (2, ["b"]) ])
+            entries = cached_entries("test", keys, lambda doc_ids: { 1: "entry a" })
+            self.assertEqual(list(entries.items()), [ (1, "entry a") ])
+            entries = cached_entries("test", keys, lambda doc_ids: { 2: "entry b" })
+            self.assertEqual(list(entries.items()), [ (1, "entry a"), (2, "entry b") ])
@@ -14,6 +14,8 @@ import django.contrib.auth.views
 from django.urls import reverse as urlreverse
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 
 import debug                            # pyflakes:ignore
 
@@ -22,11 +24,12 @@ from ietf.utils.mail import outbox, empty_outbox
 from ietf.group.models import Group, Role, RoleName
 from ietf.group.factories import GroupFactory, RoleFactory
 from ietf.ietfauth.htpasswd import update_htpasswd_file
+from ietf.ietfauth.utils import has_role
 from ietf.mailinglists.models import Subscribed
 from ietf.person.models import Person, Email, PersonalApiKey, PERSON_API_KEY_ENDPOINTS
 from ietf.person.factories import PersonFactory, EmailFactory
 from ietf.review.factories import ReviewRequestFactory, ReviewAssignmentFactory
-from ietf.review.models import ReviewWish, UnavailablePeriod
+from ietf.review.models import ReviewWish, UnavailablePeriod, ReviewTeamSettings
 from ietf.utils.decorators import skip_coverage
 
 import ietf.ietfauth.views
@@ -648,3 +651,51 @@ class IetfAuthTests(TestCase):
             self.assertIn(" %s times" % count, body)
             self.assertIn(date, body)
         
+
+
+@override_settings(CACHES={
+    'default': { 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'role-snapshot-tests' },
+    'ipr': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+})
+class HasRoleTests(TestCase):
+    def test_has_role(self):
+        person = PersonFactory()
+        wg = GroupFactory(type_id='wg', acronym='mars-roles')
+        RoleFactory(group=wg, name_id='chair', person=person)
+        RoleFactory(group=GroupFactory(type_id='nomcom', acronym='nomcom2018'), name_id='advisor', person=person)
+        team = GroupFactory(type_id='review')
+        RoleFactory(group=team, name_id='secr', person=person)
+
+        def check(*args, **kwargs):
+            # each check is on a new user object, as in a new request
+            return has_role(User.objects.get(pk=person.user.pk), *args, **kwargs)
+
+        self.assertTrue(check("WG Chair"))
+        self.assertTrue(check(["Secretariat", "WG Chair"]))
+        self.assertFalse(check(["Secretariat", "Area Director", "RG Chair"]))
+        self.assertTrue(check("Nomcom Advisor", year=2018))
+        self.assertFalse(check("Nomcom Advisor", year=2019))
+        self.assertFalse(check("Nomcom Chair", year=2018))
+
+        # the roles are looked up once, and then come from the cache
+        user = User.objects.get(pk=person.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(has_role(user, "WG Chair"))
+            self.assertFalse(has_role(user, "Secretariat"))
+            self.assertFalse(has_role(user, "IAB"))
+        self.assertEqual(len(queries), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(check("WG Chair"))
+        self.assertEqual(len(queries), 2) # user and person
+
+        # changes to roles and groups are picked up
+        self.assertFalse(check("Review Team Secretary"))
+        ReviewTeamSettings.objects.create(group=team)
+        self.assertTrue(check("Review Team Secretary"))
+        wg.state_id = 'conclude'
+        wg.save()
+        self.assertFalse(check("WG Chair"))
+        RoleFactory(group=Group.objects.get(acronym='secretariat'), name_id='secr', person=person)
+        self.assertTrue(check("Secretariat"))
+        Role.objects.filter(person=person, name='secr', group__acronym='secretariat').delete()
+        self.assertFalse(check("Secretariat"))
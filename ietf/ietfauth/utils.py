@@ -6,10 +6,14 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 # various authentication and authorization utilities
 
+import six
+
+from collections import namedtuple
 from functools import wraps
 
 from django.utils.http import urlquote
 from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from django.contrib.auth import REDIRECT_FIELD_NAME
@@ -19,6 +23,7 @@ import debug                            # pyflakes:ignore
 
 from ietf.group.models import Role, GroupFeatures
 from ietf.person.models import Person
+from ietf.utils.cache import get_generation, new_generation
 
 def user_is_person(user, person):
     """Test whether user is associated with person."""
@@ -30,6 +35,28 @@ def user_is_person(user, person):
 
     return person.user_id == user.id
 
+# The roles of a person, as used by has_role()
+RoleInfo = namedtuple("RoleInfo", ["name", "acronym", "type", "state", "review_team"])
+
+ROLE_SNAPSHOT_GENERATION_KEY = "ietfauth:role_snapshot_generation"
+
+def role_snapshot(person):
+    """Return all the roles of person, as a list of RoleInfo tuples.  The
+    list is kept in the cache until a Role, Group or ReviewTeamSettings
+    is changed, see invalidate_role_snapshots()."""
+    generation = get_generation(cache, ROLE_SNAPSHOT_GENERATION_KEY)
+    cache_key = "ietfauth:role_snapshot:%s:%s" % (generation, person.pk)
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        snapshot = [ tuple(r) for r in Role.objects.filter(person=person).values_list(
+            "name", "group__acronym", "group__type", "group__state", "group__reviewteamsettings") ]
+        cache.set(cache_key, snapshot, settings.ROLE_SNAPSHOT_CACHE_TIME)
+    return [ RoleInfo._make(r) for r in snapshot ]
+
+def invalidate_role_snapshots():
+    """Called whenever a Role, Group or ReviewTeamSettings is saved or deleted."""
+    new_generation(cache, ROLE_SNAPSHOT_GENERATION_KEY)
+
 def has_role(user, role_names, *args, **kwargs):
     """Determines whether user has any of the given standard roles
     given. Role names must be a list or, in case of a single value, a
@@ -40,56 +67,49 @@ def has_role(user, role_names, *args, **kwargs):
     if not user or not user.is_authenticated:
         return False
 
-    # use cache to avoid checking the same permissions again and again
-    if not hasattr(user, "roles_check_cache"):
-        user.roles_check_cache = {}
-
-    key = frozenset(role_names)
-    if key not in user.roles_check_cache:
+    # use cache to avoid loading the roles again and again
+    if not hasattr(user, "roles_snapshot"):
         try:
             person = user.person
         except Person.DoesNotExist:
             return False
-
-        role_qs = {
-            "Area Director": Q(person=person, name__in=("pre-ad", "ad"), group__type="area", group__state="active"),
-            "Secretariat": Q(person=person, name="secr", group__acronym="secretariat"),
-            "IAB" : Q(person=person, name="member", group__acronym="iab"),
-            "IANA": Q(person=person, name="auth", group__acronym="iana"),
-            "RFC Editor": Q(person=person, name="auth", group__acronym="rfceditor"),
-            "ISE" : Q(person=person, name="chair", group__acronym="ise"),
-            "IAD": Q(person=person, name="admdir", group__acronym="ietf"),
-            "IETF Chair": Q(person=person, name="chair", group__acronym="ietf"),
-            "IETF Trust Chair": Q(person=person, name="chair", group__acronym="ietf-trust"),
-            "IRTF Chair": Q(person=person, name="chair", group__acronym="irtf"),
-            "IAB Chair": Q(person=person, name="chair", group__acronym="iab"),
-            "IAB Executive Director": Q(person=person, name="execdir", group__acronym="iab"),
-            "IAB Group Chair": Q(person=person, name="chair", group__type="iab", group__state="active"),
-            "IAOC Chair": Q(person=person, name="chair", group__acronym="iaoc"),
-            "WG Chair": Q(person=person,name="chair", group__type="wg", group__state__in=["active","bof", "proposed"]),
-            "WG Secretary": Q(person=person,name="secr", group__type="wg", group__state__in=["active","bof", "proposed"]),
-            "RG Chair": Q(person=person,name="chair", group__type="rg", group__state__in=["active","proposed"]),
-            "RG Secretary": Q(person=person,name="secr", group__type="rg", group__state__in=["active","proposed"]),
-            "AG Secretary": Q(person=person,name="secr", group__type="ag", group__state__in=["active"]),
-            "Team Chair": Q(person=person,name="chair", group__type="team", group__state="active"),
-            "Nomcom Chair": Q(person=person, name="chair", group__type="nomcom", group__acronym__icontains=kwargs.get('year', '0000')),
-            "Nomcom Advisor": Q(person=person, name="advisor", group__type="nomcom", group__acronym__icontains=kwargs.get('year', '0000')),
-            "Nomcom": Q(person=person, group__type="nomcom", group__acronym__icontains=kwargs.get('year', '0000')),
-            "Liaison Manager": Q(person=person,name="liaiman",group__type="sdo",group__state="active", ),
-            "Authorized Individual": Q(person=person,name="auth",group__type="sdo",group__state="active", ),
-            "Recording Manager": Q(person=person,name="recman",group__type="ietf",group__state="active", ),
-            "Reviewer": Q(person=person, name="reviewer", group__state="active"),
-            "Review Team Secretary": Q(person=person, name="secr", group__reviewteamsettings__isnull=False,group__state="active", ),
-
-            }
-
-        filter_expr = Q()
-        for r in role_names:
-            filter_expr |= role_qs[r]
-
-        user.roles_check_cache[key] = bool(Role.objects.filter(filter_expr).exists())
-
-    return user.roles_check_cache[key]
+        user.roles_snapshot = role_snapshot(person)
+
+    year = six.text_type(kwargs.get('year', '0000')).lower()
+
+    role_tests = {
+        "Area Director": lambda r: r.name in ("pre-ad", "ad") and r.type == "area" and r.state == "active",
+        "Secretariat": lambda r: r.name == "secr" and r.acronym == "secretariat",
+        "IAB" : lambda r: r.name == "member" and r.acronym == "iab",
+        "IANA": lambda r: r.name == "auth" and r.acronym == "iana",
+        "RFC Editor": lambda r: r.name == "auth" and r.acronym == "rfceditor",
+        "ISE" : lambda r: r.name == "chair" and r.acronym == "ise",
+        "IAD": lambda r: r.name == "admdir" and r.acronym == "ietf",
+        "IETF Chair": lambda r: r.name == "chair" and r.acronym == "ietf",
+        "IETF Trust Chair": lambda r: r.name == "chair" and r.acronym == "ietf-trust",
+        "IRTF Chair": lambda r: r.name == "chair" and r.acronym == "irtf",
+        "IAB Chair": lambda r: r.name == "chair" and r.acronym == "iab",
+        "IAB Executive Director": lambda r: r.name == "execdir" and r.acronym == "iab",
+        "IAB Group Chair": lambda r: r.name == "chair" and r.type == "iab" and r.state == "active",
+        "IAOC Chair": lambda r: r.name == "chair" and r.acronym == "iaoc",
+        "WG Chair": lambda r: r.name == "chair" and r.type == "wg" and r.state in ["active","bof", "proposed"],
+        "WG Secretary": lambda r: r.name == "secr" and r.type == "wg" and r.state in ["active","bof", "proposed"],
+        "RG Chair": lambda r: r.name == "chair" and r.type == "rg" and r.state in ["active","proposed"],
+        "RG Secretary": lambda r: r.name == "secr" and r.type == "rg" and r.state in ["active","proposed"],
+        "AG Secretary": lambda r: r.name == "secr" and r.type == "ag" and r.state in ["active"],
+        "Team Chair": lambda r: r.name == "chair" and r.type == "team" and r.state == "active",
+        "Nomcom Chair": lambda r: r.name == "chair" and r.type == "nomcom" and year in r.acronym.lower(),
+        "Nomcom Advisor": lambda r: r.name == "advisor" and r.type == "nomcom" and year in r.acronym.lower(),
+        "Nomcom": lambda r: r.type == "nomcom" and year in r.acronym.lower(),
+        "Liaison Manager": lambda r: r.name == "liaiman" and r.type == "sdo" and r.state == "active",
+        "Authorized Individual": lambda r: r.name == "auth" and r.type == "sdo" and r.state == "active",
+        "Recording Manager": lambda r: r.name == "recman" and r.type == "ietf" and r.state == "active",
+        "Reviewer": lambda r: r.name == "reviewer" and r.state == "active",
+        "Review Team Secretary": lambda r: r.name == "secr" and r.review_team is not None and r.state == "active",
+        }
+
+    tests = [ role_tests[r] for r in role_names ]
+    return any(test(role) for role in user.roles_snapshot for test in tests)
 
 
 # convenient decorator
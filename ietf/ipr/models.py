@@ -8,10 +8,11 @@ import datetime
 
 from django.conf import settings
 from django.db import models
+from django.dispatch import receiver
 from django.urls import reverse
 from django.utils.encoding import python_2_unicode_compatible
 
-from ietf.doc.models import DocAlias
+from ietf.doc.models import DocAlias, RelatedDocument
 from ietf.name.models import DocRelationshipName,IprDisclosureStateName,IprLicenseTypeName,IprEventTypeName
 from ietf.person.models import Person
 from ietf.message.models import Message
@@ -224,3 +225,20 @@ class LegacyMigrationIprEvent(IprEvent):
     """A subclass of IprEvent specifically for capturing contents of legacy_url_0,
     the text of a disclosure submitted by email"""
     pass
+
+
+# --- Signal hooks for IPR models ---
+
+@receiver(models.signals.post_save, sender=IprDocRel)
+@receiver(models.signals.post_delete, sender=IprDocRel)
+@receiver(models.signals.post_save, sender=IprDisclosureBase)
+@receiver(models.signals.post_save, sender=HolderIprDisclosure)
+@receiver(models.signals.post_save, sender=ThirdPartyIprDisclosure)
+@receiver(models.signals.post_save, sender=NonDocSpecificIprDisclosure)
+@receiver(models.signals.post_save, sender=GenericIprDisclosure)
+@receiver(models.signals.post_save, sender=RelatedDocument)
+@receiver(models.signals.post_delete, sender=RelatedDocument)
+@receiver(models.signals.m2m_changed, sender=DocAlias.docs.through)
+def invalidate_ipr_by_draft_txt(sender, instance=None, **kwargs):
+    from ietf.ipr.utils import invalidate_ipr_by_draft_txt
+    invalidate_ipr_by_draft_txt()
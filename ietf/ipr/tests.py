@@ -10,6 +10,9 @@ import datetime
 from pyquery import PyQuery
 from six.moves.urllib.parse import quote
 
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse as urlreverse
 
 import debug                            # pyflakes:ignore
@@ -21,7 +24,7 @@ from ietf.ipr.mail import (process_response_email, get_reply_to, get_update_subm
     get_pseudo_submitter, get_holders, get_update_cc_addrs)
 from ietf.ipr.models import (IprDisclosureBase,GenericIprDisclosure,HolderIprDisclosure,
     ThirdPartyIprDisclosure)
-from ietf.ipr.utils import get_genitive, get_ipr_summary
+from ietf.ipr.utils import get_genitive, get_ipr_summary, iprs_from_docs, iprdocrels_by_alias, related_docs
 from ietf.mailtrigger.utils import gather_address_lists
 from ietf.message.models import Message
 from ietf.utils.mail import outbox, empty_outbox
@@ -125,6 +128,92 @@ class IprTests(TestCase):
             self.assertContains(r, alias.name)
         self.assertContains(r, str(ipr.pk))
 
+    @override_settings(CACHES={
+        'default': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+        'ipr': { 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', },
+    })
+    def test_iprs_for_drafts_precomputed(self):
+        draft = WgDraftFactory()
+        ipr = HolderIprDisclosureFactory(docs=[draft,])
+        url = urlreverse("ietf.ipr.views.by_draft_recursive_txt")
+        r = self.client.get(url)
+        self.assertContains(r, "%s\t%s" % (draft.name, ipr.pk))
+        etag = r['ETag']
+
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        # a new relation or disclosure shows up right away
+        replaced = IndividualDraftFactory()
+        draft.relateddocument_set.create(relationship_id='replaces', target=replaced.docalias.first())
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "%s\t%s" % (replaced.name, ipr.pk))
+
+        ipr2 = HolderIprDisclosureFactory(docs=[replaced,])
+        r = self.client.get(url)
+        self.assertContains(r, "%s\t%s\t%s" % (replaced.name, ipr.pk, ipr2.pk))
+        r = self.client.get(urlreverse("ietf.ipr.views.by_draft_txt"))
+        self.assertContains(r, "%s\t%s" % (replaced.name, ipr2.pk))
+
+        ipr2.set_state('removed')
+        r = self.client.get(url)
+        self.assertIn("%s\t%s" % (replaced.name, ipr.pk), r.content.decode().splitlines())
+
+    def test_related_docs_and_iprs_of_relation_chains(self):
+        # a chain of RFCs, each obsoleting the previous one
+        rfcs = [ WgRfcFactory() for i in range(10) ]
+        for older, newer in zip(rfcs, rfcs[1:]):
+            newer.relateddocument_set.create(relationship_id='obs', target=older.docalias.get(name__startswith='rfc'))
+        iprs = [ HolderIprDisclosureFactory(docs=[rfc]) for rfc in rfcs ]
+        start = rfcs[-1].docalias.get(name__startswith='rfc')
+
+        # one query per step of the chain, and a constant number for the rest
+        with self.assertNumQueries(len(rfcs) + 4):
+            docs = related_docs(start)
+        self.assertEqual(docs[0], start)
+        self.assertEqual(set(docs), set(DocAlias.objects.filter(docs__in=rfcs)))
+        for alias in docs[1:]:
+            if alias.document != rfcs[-1]:
+                self.assertEqual(alias.relation, 'Obsoleted by')
+        with self.assertNumQueries(1):
+            self.assertEqual(set(iprs_from_docs(docs)), set(ipr.iprdisclosurebase_ptr for ipr in iprs))
+
+        # a document obsoleting many others takes no more queries than one obsoleting a single one
+        others = [ WgRfcFactory() for i in range(10) ]
+        one, many = WgRfcFactory(), WgRfcFactory()
+        one.relateddocument_set.create(relationship_id='obs', target=others[0].docalias.get(name__startswith='rfc'))
+        for rfc in others:
+            many.relateddocument_set.create(relationship_id='obs', target=rfc.docalias.get(name__startswith='rfc'))
+        with CaptureQueriesContext(connection) as queries:
+            related_docs(one.docalias.get(name__startswith='rfc'))
+        with self.assertNumQueries(len(queries)):
+            docs = related_docs(many.docalias.get(name__startswith='rfc'))
+        self.assertEqual(set(docs), set(DocAlias.objects.filter(docs__in=others+[many])))
+
+    def test_iprdocrels_by_alias(self):
+        drafts = [ WgDraftFactory() for i in range(5) ]
+        DocAlias.objects.create(name="rfc4321").docs.add(drafts[0])
+        iprs = [ HolderIprDisclosureFactory(docs=drafts[:i]) for i in range(1, 5) ]
+        iprs[0].iprdocrel_set.create(document=DocAlias.objects.get(name="rfc4321"))
+        iprs[1].set_state('pending')
+        aliases = list(DocAlias.objects.filter(docs__in=drafts))
+
+        # the disclosures against all the aliases take a constant number of queries
+        with self.assertNumQueries(3):
+            docipr = iprdocrels_by_alias(aliases)
+        for alias in aliases:
+            self.assertEqual(docipr[alias.pk], list(alias.document.ipr().order_by("pk")))
+        self.assertEqual(docipr[drafts[4].docalias.first().pk], [])
+
+        r = self.client.get(urlreverse("ietf.ipr.views.search") + "?submit=group&group=%s" % drafts[0].group.pk)
+        self.assertContains(r, iprs[0].title)
+        self.assertNotContains(r, iprs[1].title)
+        self.assertContains(r, iprs[3].title)
+        r = self.client.get(urlreverse("ietf.ipr.views.search") + "?submit=doctitle&doctitle=%s" % quote(drafts[0].title))
+        self.assertContains(r, iprs[0].title)
+        self.assertNotContains(r, iprs[1].title)
+
     def test_about(self):
         r = self.client.get(urlreverse("ietf.ipr.views.about"))
         self.assertContains(r, "File a disclosure")
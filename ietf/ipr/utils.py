@@ -4,8 +4,21 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import hashlib
+import six
+
+from collections import defaultdict, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
 import debug                            # pyflakes:ignore
 
+from ietf.doc.models import DocAlias, RelatedDocument
+from ietf.doc.utils import walk_relations
+from ietf.ipr.models import IprDisclosureBase, IprDocRel
+from ietf.utils.cache import get_generation, new_generation
+
 def get_genitive(name):
     """Return the genitive form of name"""
     return name + "'" if name.endswith('s') else name + "'s"
@@ -33,34 +46,157 @@ def get_ipr_summary(disclosure):
     return summary if len(summary) <= 128 else summary[:125]+'...'
 
 
-def iprs_from_docs(aliases,**kwargs):
-    """Returns a list of IPRs related to doc aliases"""
-    iprdocrels = []
-    for alias in aliases:
-        for document in alias.docs.all():
-            if document.ipr(**kwargs):
-                iprdocrels += document.ipr(**kwargs)
-    return list(set([i.disclosure for i in iprdocrels]))
-    
-def related_docs(alias, relationship=('replaces', 'obs')):
-    """Returns list of related documents"""
+def iprs_from_docs(aliases, states=('posted','removed')):
+    """Returns a list of IPRs related to doc aliases, that is the
+    disclosures in one of the given states against any alias of the
+    documents of aliases.  Takes a single query."""
+    alias_ids = [ a.pk for a in aliases ]
+    if not alias_ids:
+        return []
+    return list(IprDisclosureBase.objects.filter(iprdocrel__document__docs__docalias__in=alias_ids, state__in=states).distinct())
 
-    results = []
-    for doc in alias.docs.all():
-        results += list(doc.docalias.all())
-    
-    rels = []
-    for doc in alias.docs.all():
-        rels += list(doc.all_relations_that_doc(relationship))
+def iprdocrels_by_alias(aliases, states=('posted','removed')):
+    """Returns a dict from the pk of each of aliases to a list of the
+    IprDocRels with a disclosure in one of the given states against any
+    alias of its document, like alias.document.ipr().  Takes a constant
+    number of queries."""
+    # the document of each alias, like DocAlias.document
+    alias_doc = {}
+    for alias_id, doc_id in (DocAlias.docs.through.objects.filter(docalias__in=[ a.pk for a in aliases ])
+                             .values_list("docalias", "document").order_by("document")):
+        alias_doc.setdefault(alias_id, doc_id)
 
-    for rel in rels:
-        rel_aliases = list(rel.target.document.docalias.all())
-        
-        for x in rel_aliases:
-            x.related = rel
-            x.relation = rel.relationship.revname
-        results += rel_aliases
+    # the documents of the aliases of those documents
+    alias_docs = defaultdict(list)
+    for doc_id, alias_id in DocAlias.docs.through.objects.filter(document__in=set(alias_doc.values())).values_list("document", "docalias"):
+        alias_docs[alias_id].append(doc_id)
 
-    return list(set(results))
+    doc_rels = defaultdict(list)
+    for rel in IprDocRel.objects.filter(document__in=list(alias_docs), disclosure__state__in=states).select_related("disclosure").order_by("pk"):
+        for doc_id in alias_docs[rel.document_id]:
+            doc_rels[doc_id].append(rel)
 
-    
+    return dict((a.pk, doc_rels.get(alias_doc.get(a.pk), [])) for a in aliases)
+
+def related_docs(aliases, relationship=('replaces', 'obs')):
+    """Returns list of related documents: the aliases of the documents of
+    aliases (a DocAlias or a collection of them), and of the documents
+    those documents are related to through relationship, directly or
+    transitively.  The latter have the relation which leads to them in
+    .related and its name in .relation.  The relation graph is walked
+    with one query per step, and the rest takes a constant number of
+    queries."""
+    if isinstance(aliases, DocAlias):
+        aliases = [ aliases ]
+    alias_docs = DocAlias.docs.through.objects.filter(docalias__in=[ a.pk for a in aliases ])
+    doc_ids = set(alias_docs.values_list("document", flat=True))
+
+    rels = walk_relations(doc_ids, relationship)
+
+    # the document of each target alias, like DocAlias.document
+    target_doc = {}
+    targets = DocAlias.docs.through.objects.filter(docalias__in=set(r.target_id for r in rels.values()))
+    for alias_id, doc_id in targets.values_list("docalias", "document").order_by("document"):
+        target_doc.setdefault(alias_id, doc_id)
+
+    doc_alias_ids = defaultdict(list)
+    for doc_id, alias_id in (DocAlias.docs.through.objects.filter(document__in=doc_ids | set(target_doc.values()))
+                             .values_list("document", "docalias").order_by("docalias")):
+        doc_alias_ids[doc_id].append(alias_id)
+    alias_objects = DocAlias.objects.in_bulk([ a for l in doc_alias_ids.values() for a in l ])
+
+    results = OrderedDict((a.pk, a) for a in aliases)
+    for doc_id in doc_ids:
+        for alias_id in doc_alias_ids[doc_id]:
+            results.setdefault(alias_id, alias_objects[alias_id])
+    for rel_id in sorted(rels):
+        rel = rels[rel_id]
+        for alias_id in doc_alias_ids[target_doc.get(rel.target_id)]:
+            if alias_id not in results:
+                alias = alias_objects[alias_id]
+                alias.related = rel
+                alias.relation = rel.relationship.revname
+                results[alias_id] = alias
+
+    return list(results.values())
+
+IPR_BY_DRAFT_GENERATION_KEY = "ipr:by_draft_generation"
+
+def ipr_by_draft_txt(recursive=False):
+    """Build the machine-readable list of posted IPR disclosures by
+    document name.  With recursive=True, each disclosure is also listed
+    under the documents which its documents obsolete or replace,
+    directly or transitively."""
+    docipr = defaultdict(list)
+
+    iprdocrels = IprDocRel.objects.filter(disclosure__state='posted')
+    if not recursive:
+        for name, disclosure_id in iprdocrels.values_list("document__name", "disclosure"):
+            docipr[name].append(disclosure_id)
+    else:
+        # load the alias and relation graph in one go, and walk it in memory
+        alias_names = {}
+        alias_docs = defaultdict(list)
+        doc_aliases = defaultdict(list)
+        for alias_id, alias_name, doc_id in DocAlias.docs.through.objects.values_list("docalias", "docalias__name", "document"):
+            alias_names[alias_id] = alias_name
+            alias_docs[alias_id].append(doc_id)
+            doc_aliases[doc_id].append(alias_id)
+        targets = defaultdict(list)
+        for source_id, target_id in RelatedDocument.objects.filter(relationship__in=('obs', 'replaces')).values_list("source", "target"):
+            targets[source_id].append(target_id)
+
+        closures = {}
+        def related_aliases(doc_id):
+            # the aliases of the document, and of the documents it
+            # obsoletes or replaces, as Document.all_related_that_doc()
+            if doc_id not in closures:
+                related = set(doc_aliases[doc_id])
+                checked = set([doc_id])
+                front = [doc_id]
+                while front:
+                    reached = []
+                    for d in front:
+                        for alias_id in targets[d]:
+                            related.add(alias_id)
+                            for other in alias_docs[alias_id]:
+                                if other not in checked:
+                                    checked.add(other)
+                                    reached.append(other)
+                    front = reached
+                closures[doc_id] = related
+            return closures[doc_id]
+
+        for alias_id, disclosure_id in iprdocrels.values_list("document", "disclosure"):
+            for doc_id in alias_docs[alias_id]:
+                for related_id in related_aliases(doc_id):
+                    docipr[alias_names[related_id]].append(disclosure_id)
+
+    lines = [ "# Machine-readable list of IPR disclosures by draft name" ]
+    for name, iprs in docipr.items():
+        if name.startswith("rfc"):
+            name = name.upper()
+        lines.append(name + "\t" + "\t".join(six.text_type(ipr_id) for ipr_id in sorted(iprs)))
+    return "\n".join(lines)
+
+def get_ipr_by_draft_txt(recursive=False):
+    """Return the content of the by-draft list and an ETag for it.  The
+    list is built once and kept in the 'ipr' cache until an IPR disclosure
+    or a document relation changes, see invalidate_ipr_by_draft_txt()."""
+    cache = caches['ipr']
+    generation = get_generation(cache, IPR_BY_DRAFT_GENERATION_KEY)
+    cache_key = "ipr:by_draft:%s:%s" % ("recursive" if recursive else "direct", generation)
+    cached = cache.get(cache_key)
+    if cached is None:
+        content = ipr_by_draft_txt(recursive)
+        cached = (content, '"%s"' % hashlib.md5(content.encode('utf-8')).hexdigest())
+        cache.set(cache_key, cached, settings.IPR_BY_DRAFT_CACHE_TIME)
+    return cached
+
+def invalidate_ipr_by_draft_txt():
+    """Called whenever an IPR disclosure, the documents it is about, a
+    document relation or the documents of a DocAlias change.  The
+    generation is kept in the same cache as the lists, so that they stay
+    consistent if either is cleared."""
+    cache = caches['ipr']
+    new_generation(cache, IPR_BY_DRAFT_GENERATION_KEY)
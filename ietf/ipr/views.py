@@ -6,17 +6,17 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 import datetime
 import itertools
-import six
 
 from django.conf import settings
 from django.contrib import messages
 from django.urls import reverse as urlreverse
-from django.db.models import Q
+from django.db.models import Prefetch, Q, prefetch_related_objects
 from django.forms.models import inlineformset_factory, model_to_dict
 from django.forms.formsets import formset_factory
 from django.http import HttpResponse, Http404, HttpResponseRedirect
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
 from django.utils.html import escape
 
 import debug                            # pyflakes:ignore
@@ -35,7 +35,7 @@ from ietf.ipr.models import (IprDisclosureStateName, IprDisclosureBase,
     NonDocSpecificIprDisclosure, IprDocRel,
     RelatedIpr,IprEvent)
 from ietf.ipr.utils import (get_genitive, get_ipr_summary,
-    iprs_from_docs, related_docs)
+    iprs_from_docs, iprdocrels_by_alias, related_docs, get_ipr_by_draft_txt)
 from ietf.mailtrigger.utils import gather_address_lists
 from ietf.message.models import Message
 from ietf.message.utils import infer_message
@@ -441,46 +441,17 @@ def history(request, id):
         'selected_tab_entry':'history'
     })
 
-def by_draft_txt(request):
-    docipr = {}
-
-    for o in IprDocRel.objects.filter(disclosure__state='posted').select_related('document'):
-        name = o.document.name
-        if name.startswith("rfc"):
-            name = name.upper()
-
-        if not name in docipr:
-            docipr[name] = []
+def by_draft_txt_response(request, recursive):
+    content, etag = get_ipr_by_draft_txt(recursive)
+    response = HttpResponse(content, content_type="text/plain; charset=%s"%settings.DEFAULT_CHARSET)
+    response['ETag'] = etag
+    return get_conditional_response(request, etag=etag, response=response)
 
-        docipr[name].append(o.disclosure_id)
-
-    lines = [ "# Machine-readable list of IPR disclosures by draft name" ]
-    for name, iprs in docipr.items():
-        lines.append(name + "\t" + "\t".join(six.text_type(ipr_id) for ipr_id in sorted(iprs)))
-
-    return HttpResponse("\n".join(lines), content_type="text/plain; charset=%s"%settings.DEFAULT_CHARSET)
+def by_draft_txt(request):
+    return by_draft_txt_response(request, recursive=False)
 
 def by_draft_recursive_txt(request):
-    docipr = {}
-
-    for o in IprDocRel.objects.filter(disclosure__state='posted').select_related('document'):
-        alias = o.document
-        name = alias.name
-        for document in alias.docs.all():
-            related = set(document.docalias.all()) | set(document.all_related_that_doc(('obs', 'replaces')))
-            for alias in related:
-                name = alias.name
-                if name.startswith("rfc"):
-                    name = name.upper()
-                if not name in docipr:
-                    docipr[name] = []
-                docipr[name].append(o.disclosure_id)
-
-    lines = [ "# Machine-readable list of IPR disclosures by draft name" ]
-    for name, iprs in docipr.items():
-        lines.append(name + "\t" + "\t".join(six.text_type(ipr_id) for ipr_id in sorted(iprs)))
-
-    return HttpResponse("\n".join(lines), content_type="text/plain; charset=%s"%settings.DEFAULT_CHARSET)
+    return by_draft_txt_response(request, recursive=True)
 
 
 def new(request, type, updates=None):
@@ -675,6 +646,7 @@ def search(request):
                     first = start[0]
                     doc = first.document
                     docs = related_docs(first)
+                    prefetch_related_objects(docs, Prefetch("iprdocrel_set", queryset=IprDocRel.objects.select_related("disclosure")))
                     iprs = iprs_from_docs(docs,states=states)
                     template = "ipr/search_doc_result.html"
                     updated_docs = related_docs(first, ('updates',))
@@ -706,13 +678,15 @@ def search(request):
             # Document list with IPRs
             elif search_type == "group":
                 docs = list(DocAlias.objects.filter(docs__group=q))
-                related = []
                 for doc in docs:
                     doc.product_of_this_wg = True
-                    related += related_docs(doc)
+                related = related_docs(docs)
                 iprs = iprs_from_docs(list(set(docs+related)),states=states)
-                docs = [ doc for doc in docs if doc.document.ipr() ]
-                docs = sorted(docs, key=lambda x: max([ipr.disclosure.time for ipr in x.document.ipr()]), reverse=True)
+                docipr = iprdocrels_by_alias(docs)
+                for doc in docs:
+                    doc.iprdocrels = docipr[doc.pk]
+                docs = [ doc for doc in docs if doc.iprdocrels ]
+                docs = sorted(docs, key=lambda x: max([ipr.disclosure.time for ipr in x.iprdocrels]), reverse=True)
                 template = "ipr/search_wg_result.html"
                 q = Group.objects.get(id=q).acronym     # make acronym for use in template
 
@@ -720,12 +694,13 @@ def search(request):
             # Document list with IPRs
             elif search_type == "doctitle":
                 docs = list(DocAlias.objects.filter(docs__title__icontains=q))
-                related = []
-                for doc in docs:
-                    related += related_docs(doc)
+                related = related_docs(docs)
                 iprs = iprs_from_docs(list(set(docs+related)),states=states)
-                docs = [ doc for doc in docs if doc.document.ipr() ]
-                docs = sorted(docs, key=lambda x: max([ipr.disclosure.time for ipr in x.document.ipr()]), reverse=True)
+                docipr = iprdocrels_by_alias(docs)
+                for doc in docs:
+                    doc.iprdocrels = docipr[doc.pk]
+                docs = [ doc for doc in docs if doc.iprdocrels ]
+                docs = sorted(docs, key=lambda x: max([ipr.disclosure.time for ipr in x.iprdocrels]), reverse=True)
                 template = "ipr/search_doctitle_result.html"
 
             # Search by title of IPR disclosure
@@ -5,15 +5,16 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import datetime
+import hashlib
 import io
 import os
 import re
 from tempfile import mkstemp
 
 from django.http import HttpRequest, Http404
-from django.db.models import Max, Q, Prefetch, F
+from django.db.models import Count, Max, Q, Prefetch, F
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import cache, caches
 from django.urls import reverse
 from django.utils.cache import get_cache_key
 from django.shortcuts import get_object_or_404
@@ -27,7 +28,7 @@ from ietf.ietfauth.utils import has_role, user_is_person
 from ietf.liaisons.utils import get_person_for_user
 from ietf.mailtrigger.utils import gather_address_lists
 from ietf.person.models  import Person
-from ietf.meeting.models import Meeting, Schedule, TimeSlot, SchedTimeSessAssignment, ImportantDate
+from ietf.meeting.models import Meeting, Schedule, TimeSlot, SchedTimeSessAssignment, ImportantDate, SessionPresentation
 from ietf.name.models import ImportantDateName
 from ietf.utils.history import find_history_active_at, find_history_replacements_active_at
 from ietf.utils.mail import send_mail
@@ -207,6 +208,79 @@ def preprocess_assignments_for_agenda(assignments_queryset, meeting):
 
     return assignments
 
+def agenda_group_parents(assignments):
+    """The parents of the groups with sessions in assignments, each with
+    the sorted list of its groups in p.group_list."""
+    # extract groups hierarchy, it's a little bit complicated because
+    # we can be dealing with historic groups
+    seen = set()
+    groups = [a.session.historic_group for a in assignments
+              if a.session
+              and a.session.historic_group
+              and a.session.historic_group.type_id in ('wg', 'rg', 'ag', 'iab')
+              and a.session.historic_group.historic_parent]
+    group_parents = []
+    for g in groups:
+        if g.historic_parent.acronym not in seen:
+            group_parents.append(g.historic_parent)
+            seen.add(g.historic_parent.acronym)
+
+    seen = set()
+    for p in group_parents:
+        p.group_list = []
+        for g in groups:
+            if g.acronym not in seen and g.historic_parent.acronym == p.acronym:
+                p.group_list.append(g)
+                seen.add(g.acronym)
+
+        p.group_list.sort(key=lambda g: g.acronym)
+
+    return group_parents
+
+def agenda_cache_version(meeting, schedule):
+    """A version tag for the agenda of schedule, which changes whenever an
+    assignment, timeslot, session, room, group or material of it is added,
+    changed or removed, or the agenda notes of the meeting are changed.
+    It takes a handful of aggregate queries, so it's cheap compared to
+    building the agenda."""
+    aggregates = [
+        schedule.assignments.aggregate(Max('modified'), Count('pk')),
+        meeting.timeslot_set.aggregate(Max('modified'), Count('pk')),
+        meeting.session_set.aggregate(Max('modified'), Count('pk')),
+        meeting.room_set.aggregate(Max('modified'), Count('pk')),
+        Group.objects.filter(session__meeting=meeting).aggregate(Max('time'), Max('parent__time')),
+        SessionPresentation.objects.filter(session__meeting=meeting).aggregate(Max('document__time'), Count('pk')),
+    ]
+    version = "%r:%s:%s" % ([ sorted(a.items()) for a in aggregates ], meeting.agenda_info_note, meeting.agenda_warning_note)
+    return hashlib.md5(version.encode('utf-8')).hexdigest()
+
+def next_session_end_time(schedule, now):
+    """The end time of the first session on schedule which hasn't ended by
+    now, or None if they all have.  The agenda shows different buttons for
+    sessions which have ended, so the cached agenda table is keyed by it."""
+    end_times = [ time + duration for time, duration in schedule.assignments.values_list("timeslot__time", "timeslot__duration") ]
+    return min([ t for t in end_times if t > now ] or [ None ])
+
+def json_agenda_version(meeting):
+    """A version tag for the JSON agenda of meeting, which besides the
+    official schedule shows the floor plans of the rooms."""
+    floorplans = meeting.room_set.aggregate(Max('floorplan__modified'))
+    version = "%s:%r" % (agenda_cache_version(meeting, meeting.agenda), sorted(floorplans.items()))
+    return hashlib.md5(version.encode('utf-8')).hexdigest()
+
+def get_agenda_data(meeting, schedule, version):
+    """The assignments of schedule prepared for the agenda, and the group
+    hierarchy of their sessions.  Cached per schedule and version, see
+    agenda_cache_version()."""
+    cache_key = "meeting:agenda:data:%s:%s" % (schedule.pk, version)
+    data = caches['agenda'].get(cache_key)
+    if data is None:
+        filtered_assignments = schedule.assignments.exclude(timeslot__type__in=['lead','offagenda'])
+        filtered_assignments = preprocess_assignments_for_agenda(filtered_assignments, meeting)
+        data = (filtered_assignments, agenda_group_parents(filtered_assignments))
+        caches['agenda'].set(cache_key, data, settings.AGENDA_CACHE_TIME)
+    return data
+
 def read_session_file(type, num, doc):
     # XXXX FIXME: the path fragment in the code below should be moved to
     # settings.py.  The *_PATH settings should be generalized to format()
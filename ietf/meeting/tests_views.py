@@ -21,12 +21,15 @@ from six.moves.urllib.parse import urlparse
 from django.urls import reverse as urlreverse
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 
 import debug           # pyflakes:ignore
 
 from ietf.doc.models import Document
 from ietf.group.models import Group, Role
-from ietf.meeting.helpers import can_approve_interim_request, can_view_interim_request
+from ietf.meeting.helpers import can_approve_interim_request, can_view_interim_request, next_session_end_time
 from ietf.meeting.helpers import send_interim_approval_request
 from ietf.meeting.helpers import send_interim_cancellation_notice
 from ietf.meeting.helpers import send_interim_minutes_reminder, populate_important_dates, update_important_dates
@@ -200,6 +203,64 @@ class MeetingTests(TestCase):
         self.assertContains(r, session.group.acronym)
         self.assertContains(r, slot.location.name)       
 
+    @override_settings(CACHES={
+        'default': { 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'agenda-test-default', },
+        'agenda': { 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'agenda-test-agenda', },
+        'ipr': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+    })
+    def test_agenda_cache(self):
+        meeting = make_meeting_test_data()
+        session = Session.objects.filter(meeting=meeting, group__acronym="mars").first()
+        self.write_materials_files(meeting, session)
+        slides = session.sessionpresentation_set.filter(document__type='slides').exclude(document__states__type__slug='slides', document__states__slug='deleted').first()
+
+        for ext in ['.html', '.txt', '.csv']:
+            url = urlreverse("ietf.meeting.views.agenda", kwargs=dict(num=meeting.number, ext=ext))
+            with CaptureQueriesContext(connection) as first:
+                r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            self.assertContains(r, session.group.acronym)
+            with CaptureQueriesContext(connection) as second:
+                r2 = self.client.get(url)
+            self.assertEqual(r2.status_code, 200)
+            self.assertLess(len(second), len(first))
+            if ext != '.html':
+                self.assertEqual(r.content, r2.content)
+
+        # removing material from a session invalidates the cached agenda
+        url = urlreverse("ietf.meeting.views.agenda", kwargs=dict(num=meeting.number, ext='.csv'))
+        self.assertContains(self.client.get(url), slides.document.uploaded_filename)
+        slides.delete()
+        self.assertNotContains(self.client.get(url), slides.document.uploaded_filename)
+
+        # as does renaming a room, and changing the agenda notes
+        room = session.official_timeslotassignment().timeslot.location
+        room.name = "Renamed Room"
+        room.save()
+        self.assertContains(self.client.get(url), "Renamed Room")
+        url = urlreverse("ietf.meeting.views.agenda", kwargs=dict(num=meeting.number, ext='.html'))
+        self.assertNotContains(self.client.get(url), "Bring an umbrella")
+        meeting.agenda_info_note = "Bring an umbrella"
+        meeting.save()
+        self.assertContains(self.client.get(url), "Bring an umbrella")
+
+    @override_settings(CACHES=dict(settings.CACHES, agenda={ 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'agenda-end-time-tests', }))
+    def test_agenda_cache_after_session_end(self):
+        meeting = MeetingFactory(type_id='ietf', date=datetime.date.today())
+        make_meeting_test_data(meeting=meeting)
+        schedule = meeting.agenda
+        end_times = sorted([ a.timeslot.end_time() for a in schedule.assignments.all() ])
+        self.assertEqual(next_session_end_time(schedule, end_times[0] - datetime.timedelta(minutes=1)), end_times[0])
+        self.assertEqual(next_session_end_time(schedule, end_times[-1]), None)
+
+        url = urlreverse("ietf.meeting.views.agenda", kwargs=dict(num=meeting.number, ext='.html'))
+        with patch('ietf.meeting.views.datetime') as mock_datetime:
+            mock_datetime.datetime.now.return_value = end_times[0] - datetime.timedelta(minutes=1)
+            self.assertContains(self.client.get(url), "Jabber room for")
+            # the cached agenda table isn't reused once all the sessions have ended
+            mock_datetime.datetime.now.return_value = end_times[-1] + datetime.timedelta(minutes=1)
+            self.assertNotContains(self.client.get(url), "Jabber room for")
+
     def test_agenda_current_audio(self):
         date = datetime.date.today()
         meeting = MeetingFactory(type_id='ietf', date=date )
@@ -1666,6 +1727,31 @@ class IphoneAppJsonTests(TestCase):
         r = self.client.get(url)
         self.assertEqual(r.status_code,200)
 
+    def test_iphone_app_json_conditional_get(self):
+        make_meeting_test_data()
+        meeting = Meeting.objects.filter(type_id='ietf').order_by('id').last()
+        url = urlreverse('ietf.meeting.views.json_agenda',kwargs={'num':meeting.number})
+        r = self.client.get(url)
+        self.assertEqual(r.status_code,200)
+        etag = r['ETag']
+        last_modified = r['Last-Modified']
+
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code,304)
+        self.assertEqual(r['ETag'], etag)
+
+        r = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(r.status_code,304)
+
+        # changing a session changes the etag
+        session = meeting.session_set.filter(group__acronym='mars').first()
+        session.name = 'Mars Session'
+        session.save()
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code,200)
+        self.assertNotEqual(r['ETag'], etag)
+        self.assertContains(r, 'Mars Session')
+
 class FinalizeProceedingsTests(TestCase):
     @patch('six.moves.urllib.request.urlopen')
     def test_finalize_proceedings(self, mock_urlopen):
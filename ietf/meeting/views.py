@@ -17,7 +17,7 @@ import tarfile
 
 
 from calendar import timegm
-from collections import OrderedDict, Counter, deque
+from collections import OrderedDict, Counter, deque, defaultdict
 from six.moves.urllib.parse import unquote
 from tempfile import mkstemp
 from wsgiref.handlers import format_date_time
@@ -29,6 +29,7 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import HttpResponse, HttpResponseRedirect, HttpResponseForbidden, Http404
 from django.conf import settings
 from django.contrib import messages
+from django.core.cache import caches
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
@@ -37,8 +38,9 @@ from django.db.models import Min, Max, Q
 from django.forms.models import modelform_factory, inlineformset_factory
 from django.template import TemplateDoesNotExist
 from django.template.loader import render_to_string
-from django.utils.functional import curry
+from django.utils.functional import curry, SimpleLazyObject
 from django.views.decorators.cache import cache_page
+from django.utils.cache import get_conditional_response
 from django.utils.text import slugify
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
 from django.views.generic import RedirectView
@@ -58,6 +60,7 @@ from ietf.meeting.helpers import get_modified_from_assignments
 from ietf.meeting.helpers import get_wg_list, find_ads_for_meeting
 from ietf.meeting.helpers import get_meeting, get_schedule, agenda_permissions, get_ietf_meeting
 from ietf.meeting.helpers import preprocess_assignments_for_agenda, read_agenda_file
+from ietf.meeting.helpers import agenda_cache_version, get_agenda_data, json_agenda_version, next_session_end_time
 from ietf.meeting.helpers import convert_draft_to_pdf, get_earliest_session_date
 from ietf.meeting.helpers import can_view_interim_request, can_approve_interim_request
 from ietf.meeting.helpers import can_edit_interim_request
@@ -484,42 +487,42 @@ def agenda(request, num=None, name=None, base=None, ext=None, owner=None, utc=""
         return render(request, "meeting/no-"+base+ext, {'meeting':meeting }, content_type=mimetype[ext])
 
     updated = meeting.updated()
-    filtered_assignments = schedule.assignments.exclude(timeslot__type__in=['lead','offagenda'])
-    filtered_assignments = preprocess_assignments_for_agenda(filtered_assignments, meeting)
-
-    if ext == ".csv":
-        return agenda_csv(schedule, filtered_assignments)
-
-    # extract groups hierarchy, it's a little bit complicated because
-    # we can be dealing with historic groups
-    seen = set()
-    groups = [a.session.historic_group for a in filtered_assignments
-              if a.session
-              and a.session.historic_group
-              and a.session.historic_group.type_id in ('wg', 'rg', 'ag', 'iab')
-              and a.session.historic_group.historic_parent]
-    group_parents = []
-    for g in groups:
-        if g.historic_parent.acronym not in seen:
-            group_parents.append(g.historic_parent)
-            seen.add(g.historic_parent.acronym)
-
-    seen = set()
-    for p in group_parents:
-        p.group_list = []
-        for g in groups:
-            if g.acronym not in seen and g.historic_parent.acronym == p.acronym:
-                p.group_list.append(g)
-                seen.add(g.acronym)
-
-        p.group_list.sort(key=lambda g: g.acronym)
+    cache_version = agenda_cache_version(meeting, schedule)
+
+    if ext in (".txt", ".csv"):
+        # these don't depend on the request, so cache the rendered content
+        cache_key = "meeting:agenda:%s:%s:%s:%s%s" % (schedule.pk, cache_version, updated.isoformat(), base, ext)
+        content = caches['agenda'].get(cache_key)
+        if content is None:
+            filtered_assignments, group_parents = get_agenda_data(meeting, schedule, cache_version)
+            if ext == ".csv":
+                response = agenda_csv(schedule, filtered_assignments)
+            else:
+                response = render(request, "meeting/"+base+ext, {
+                    "schedule": schedule,
+                    "filtered_assignments": filtered_assignments,
+                    "updated": updated,
+                    "group_parents": group_parents,
+                }, content_type=mimetype[ext])
+            content = response.content
+            caches['agenda'].set(cache_key, content, settings.AGENDA_CACHE_TIME)
+        return HttpResponse(content, content_type=mimetype[ext])
+
+    # The agenda table is cached as a template fragment keyed by
+    # cache_version, so only load the data if the template asks for it.
+    # The session buttons in it change when a session ends, so the key
+    # also includes the end time of the next session to end.
+    agenda_data = SimpleLazyObject(lambda: get_agenda_data(meeting, schedule, cache_version))
+    now = datetime.datetime.now()
 
     return render(request, "meeting/"+base+ext, {
         "schedule": schedule,
-        "filtered_assignments": filtered_assignments,
+        "filtered_assignments": SimpleLazyObject(lambda: agenda_data[0]),
         "updated": updated,
-        "group_parents": group_parents,
-        "now": datetime.datetime.now(),
+        "group_parents": SimpleLazyObject(lambda: agenda_data[1]),
+        "cache_version": "%s:%s" % (cache_version, next_session_end_time(schedule, now)),
+        "cache_time": settings.AGENDA_CACHE_TIME,
+        "now": now,
     }, content_type=mimetype[ext])
 
 def agenda_csv(schedule, filtered_assignments):
@@ -922,17 +925,30 @@ def ical_agenda(request, num=None, name=None, acronym=None, session_id=None):
         "updated": updated
     }, content_type="text/calendar")
 
-@cache_page(15 * 60)
-def json_agenda(request, num=None ):
-    meeting = get_meeting(num)
-
+def json_agenda_data(meeting):
+    """The sessions, rooms and group parents of the official agenda of
+    meeting, with the time of the latest modification among them.  The
+    related data is fetched in bulk, so the number of queries doesn't
+    grow with the size of the meeting."""
     sessions = []
     locations = set()
     parent_acronyms = set()
     assignments = meeting.agenda.assignments.exclude(session__type__in=['lead','offagenda','break','reg'])
+    assignments = assignments.select_related("timeslot__location__floorplan")
     # Update the assignments with historic information, i.e., valid at the
     # time of the meeting
     assignments = preprocess_assignments_for_agenda(assignments, meeting)
+
+    session_ids = [ asgn.session_id for asgn in assignments ]
+    presentations = defaultdict(list)
+    material_ids = defaultdict(list)
+    for pres in SessionPresentation.objects.filter(session__in=session_ids).select_related("document"):
+        material_ids[pres.session_id].append(pres.document_id)
+        if pres.document.type_id == 'slides':
+            presentations[pres.session_id].append(pres)
+    revision_times = dict(NewRevisionDocEvent.objects.filter(type='new_revision', doc__in=set(d for l in material_ids.values() for d in l))
+                          .values_list("doc").annotate(Max("time")))
+
     for asgn in assignments:
         sessdict = dict()
         sessdict['objtype'] = 'session'
@@ -945,7 +961,7 @@ def json_agenda(request, num=None ):
                     "type": asgn.session.historic_group.type_id,
                     "state": asgn.session.historic_group.state_id,
                 }
-            if asgn.session.historic_group.is_bof():
+            if asgn.session.historic_group.state_id in ["bof", "bof-conc"]:
                 sessdict['is_bof'] = True
         if asgn.session.historic_group.type_id in ['wg','rg', 'ag',] or asgn.session.historic_group.acronym in ['iesg',]:
             sessdict['group']['parent'] = asgn.session.historic_group.historic_parent.acronym
@@ -962,10 +978,10 @@ def json_agenda(request, num=None ):
         if asgn.timeslot.location:      # Some socials have an assignment but no location
             locations.add(asgn.timeslot.location)
         if asgn.session.agenda():
-            sessdict['agenda'] = asgn.session.agenda().href()
+            sessdict['agenda'] = asgn.session.agenda().href(meeting=meeting)
 
         if asgn.session.minutes():
-            sessdict['minutes'] = asgn.session.minutes().href()
+            sessdict['minutes'] = asgn.session.minutes().href(meeting=meeting)
         if asgn.session.slides():
             # Deprecated 19 May 2017, remove after ietf 100;
             sessdict['slides'] = []
@@ -973,8 +989,7 @@ def json_agenda(request, num=None ):
                 sessdict['slides'].append('/api/v1/doc/document/%s/'%slides.name)
             # New alternative
             sessdict['presentations'] = []
-            presentations = SessionPresentation.objects.filter(session=asgn.session, document__type__slug='slides')
-            for pres in presentations:
+            for pres in presentations[asgn.session_id]:
                 sessdict['presentations'].append(
                     {
                         'name':     pres.document.name,
@@ -986,9 +1001,8 @@ def json_agenda(request, num=None ):
         sessdict['session_res_uri'] = '/api/v1/meeting/session/%s/'%asgn.session.id
         sessdict['session_id'] = asgn.session.id
         modified = asgn.session.modified
-        for doc in asgn.session.materials.all():
-            rev_docevent = doc.latest_event(NewRevisionDocEvent,'new_revision')
-            modified = max(modified, (rev_docevent and rev_docevent.time) or modified)
+        for doc_id in material_ids[asgn.session_id]:
+            modified = max(modified, revision_times.get(doc_id) or modified)
         sessdict['modified'] = modified
         sessdict['status'] = asgn.session.status_id
         sessions.append(sessdict)
@@ -1026,20 +1040,44 @@ def json_agenda(request, num=None ):
     meetinfo.extend(rooms)
     meetinfo.extend(parents)
     meetinfo.sort(key=lambda x: x['modified'],reverse=True)
-    last_modified = meetinfo and meetinfo[0]['modified']
+    last_modified = meetinfo[0]['modified'] if meetinfo else None
 
     tz = pytz.timezone(settings.PRODUCTION_TIMEZONE)
 
     for obj in meetinfo:
         obj['modified'] = tz.localize(obj['modified']).astimezone(pytz.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
 
-    data = {"%s"%num: meetinfo}
-
-    response = HttpResponse(json.dumps(data, indent=2, sort_keys=True), content_type='application/json;charset=%s'%settings.DEFAULT_CHARSET)
     if last_modified:
         last_modified = tz.localize(last_modified).astimezone(pytz.utc)
-        response['Last-Modified'] = format_date_time(timegm(last_modified.timetuple()))
-    return response
+
+    return meetinfo, last_modified
+
+def json_agenda(request, num=None ):
+    meeting = get_meeting(num)
+
+    # Agenda apps poll this, so answer their conditional requests from
+    # the version tag, before building (or even fetching) the agenda
+    version = json_agenda_version(meeting)
+    etag = '"%s"' % version
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        response['ETag'] = etag
+        return response
+
+    cache_key = "meeting:json_agenda:%s:%s" % (num, version)
+    cached = caches['agenda'].get(cache_key)
+    if cached is None:
+        meetinfo, last_modified = json_agenda_data(meeting)
+        data = {"%s"%num: meetinfo}
+        cached = (json.dumps(data, indent=2, sort_keys=True), last_modified and timegm(last_modified.timetuple()))
+        caches['agenda'].set(cache_key, cached, settings.AGENDA_CACHE_TIME)
+    content, last_modified = cached
+
+    response = HttpResponse(content, content_type='application/json;charset=%s'%settings.DEFAULT_CHARSET)
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = format_date_time(last_modified)
+    return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
 
 def meeting_requests(request, num=None):
     meeting = get_meeting(num)
@@ -4,14 +4,21 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.db import connection
 from django.db.utils import OperationalError
 from django.shortcuts import render
 from django.http import HttpResponsePermanentRedirect
+from ietf.utils import perf
 from ietf.utils.log import log, exc_parts
 from ietf.utils.mail import log_smtp_exception
+import cProfile
+import os
+import random
 import re
 import smtplib
+import time
 import unicodedata
 
 
@@ -73,3 +80,45 @@ def unicode_nfkc_normalization_middleware(get_response):
         return response
     return unicode_nfkc_normalization
         
+
+def performance_instrumentation_middleware(get_response):
+    """Record the wall time, database queries and time, cache hits and
+    misses and template render time of each request, aggregated by view
+    in ietf.utils.perf.  A fraction PERF_PROFILE_SAMPLE_RATE of the
+    requests is also run under cProfile, with the profile saved in
+    PERF_PROFILE_DIR.  Only enabled if PERF_INSTRUMENTATION is set."""
+    if not settings.PERF_INSTRUMENTATION:
+        raise MiddlewareNotUsed
+    perf.install_hooks()
+
+    def performance_instrumentation(request):
+        # record the queries, with their times, also when not in DEBUG mode
+        force_debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        queries_before = len(connection.queries_log)
+        request_stats = perf.start_request()
+        profile = None
+        if settings.PERF_PROFILE_SAMPLE_RATE and random.random() < settings.PERF_PROFILE_SAMPLE_RATE:
+            profile = cProfile.Profile()
+        start = time.time()
+        try:
+            if profile:
+                response = profile.runcall(get_response, request)
+            else:
+                response = get_response(request)
+        finally:
+            wall_time = time.time() - start
+            perf.end_request()
+            connection.force_debug_cursor = force_debug_cursor
+        queries = list(connection.queries_log)[queries_before:]
+        db_time = sum(float(q['time']) for q in queries)
+        match = getattr(request, 'resolver_match', None)
+        view_name = (match and match.view_name) or "(unresolved)"
+        perf.record_request(view_name, wall_time, len(queries), db_time, request_stats)
+        if profile:
+            if not os.path.exists(settings.PERF_PROFILE_DIR):
+                os.makedirs(settings.PERF_PROFILE_DIR)
+            profile.dump_stats(os.path.join(settings.PERF_PROFILE_DIR, "%s-%s-%s.prof" % (
+                view_name.replace("/", "_"), time.strftime("%Y%m%d-%H%M%S"), os.getpid())))
+        return response
+    return performance_instrumentation
@@ -9,12 +9,16 @@ import six
 
 from pyquery import PyQuery
 from io import StringIO
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import override_settings
 from django.urls import reverse as urlreverse
 
 import debug                            # pyflakes:ignore
 
 from ietf.community.models import CommunityList
 from ietf.group.factories import RoleFactory
+from ietf.ietfauth.utils import has_role
 from ietf.nomcom.models import NomCom
 from ietf.nomcom.test_data import nomcom_test_data
 from ietf.nomcom.factories import NomComFactory, NomineeFactory, NominationFactory, FeedbackFactory, PositionFactory
@@ -239,6 +243,18 @@ class PersonUtilsTests(TestCase):
         self.assertFalse(Person.objects.filter(id=source_id))
         self.assertFalse(source_user.is_active)
 
+    @override_settings(CACHES=dict(settings.CACHES, default={ 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'merge-persons-tests', }))
+    def test_merge_persons_roles(self):
+        source = PersonFactory()
+        target = PersonFactory()
+        RoleFactory(name_id='chair', group__type_id='wg', person=source)
+        self.assertFalse(has_role(User.objects.get(pk=target.user_id), "WG Chair"))
+
+        # the roles are moved with a bulk update, the cached role
+        # snapshots are invalidated explicitly
+        merge_persons(source, target, file=StringIO())
+        self.assertTrue(has_role(User.objects.get(pk=target.user_id), "WG Chair"))
+
     def test_merge_users(self):
         person = PersonFactory()
         source = person.user
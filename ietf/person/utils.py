@@ -18,7 +18,7 @@ from django.core.exceptions import ObjectDoesNotExist
 
 import debug                            # pyflakes:ignore
 
-from ietf.person.models import Person
+from ietf.person.models import Person, Email
 from ietf.utils.mail import send_mail
 
 def merge_persons(source, target, file=sys.stdout, verbose=False):
@@ -39,6 +39,12 @@ def merge_persons(source, target, file=sys.stdout, verbose=False):
     move_related_objects(source, target, file=file, verbose=verbose)
     dedupe_aliases(target)
 
+    # the related objects are moved with bulk updates, which send no signals
+    from ietf.community.utils import invalidate_search_rule_index
+    from ietf.ietfauth.utils import invalidate_role_snapshots
+    invalidate_search_rule_index()
+    invalidate_role_snapshots()
+
     # copy other attributes
     for field in ('ascii','ascii_short', 'biography', 'photo', 'photo_thumb', 'name_from_draft', 'consent'):
         if getattr(source,field) and not getattr(target,field):
@@ -197,3 +203,27 @@ def get_active_ads():
         active_ads = list(Person.objects.filter(role__name="ad", role__group__state="active", role__group__type="area").distinct())
         cache.set(cache_key, active_ads)
     return active_ads
+
+def get_email_addresses(persons):
+    """Return what Person.email_address() returns for each of the given
+    persons (ids, or a values queryset of ids), as a dictionary by person
+    id, with a single query."""
+    primary = {}
+    active = {}
+    for person_id, address, is_primary, is_active, time in Email.objects.filter(person__in=persons).order_by("address").values_list("person", "address", "primary", "active", "time"):
+        if is_primary:
+            primary.setdefault(person_id, address)
+        elif is_active and (not person_id in active or time > active[person_id][0]):
+            active[person_id] = (time, address)
+    addresses = dict( (person_id, address) for person_id, (time, address) in active.items() )
+    addresses.update(primary)
+    return addresses
+
+def email_address_of(address, active, person_id, person_addresses):
+    """Return what Email.email_address() returns for the given email
+    values, with the addresses of the persons from get_email_addresses()."""
+    if not active:
+        if person_id:
+            return person_addresses.get(person_id, "")
+        return None
+    return address
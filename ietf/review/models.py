@@ -9,10 +9,11 @@ import datetime
 from simple_history.models import HistoricalRecords
 
 from django.db import models
+from django.dispatch import receiver
 from django.utils.encoding import python_2_unicode_compatible
 
 from ietf.doc.models import Document
-from ietf.group.models import Group
+from ietf.group.models import Group, Role, invalidate_role_snapshots
 from ietf.person.models import Person, Email
 from ietf.name.models import ReviewTypeName, ReviewRequestStateName, ReviewResultName, ReviewAssignmentStateName
 from ietf.utils.validators import validate_regular_expression_string
@@ -181,3 +182,28 @@ class ReviewTeamSettings(models.Model):
     class Meta:
         verbose_name = "Review team settings"
         verbose_name_plural = "Review team settings"
+
+
+# the review team secretary role depends on the review team settings
+models.signals.post_save.connect(invalidate_role_snapshots, sender=ReviewTeamSettings)
+models.signals.post_delete.connect(invalidate_role_snapshots, sender=ReviewTeamSettings)
+
+
+# --- Signal hooks for review models ---
+
+@receiver(models.signals.post_save, sender=ReviewRequest)
+@receiver(models.signals.post_delete, sender=ReviewRequest)
+@receiver(models.signals.post_save, sender=ReviewAssignment)
+@receiver(models.signals.post_delete, sender=ReviewAssignment)
+@receiver(models.signals.post_save, sender=ReviewerSettings)
+@receiver(models.signals.post_delete, sender=ReviewerSettings)
+@receiver(models.signals.post_save, sender=UnavailablePeriod)
+@receiver(models.signals.post_delete, sender=UnavailablePeriod)
+@receiver(models.signals.post_save, sender=NextReviewerInTeam)
+@receiver(models.signals.post_delete, sender=NextReviewerInTeam)
+@receiver(models.signals.post_save, sender=Role)
+@receiver(models.signals.post_delete, sender=Role)
+@receiver(models.signals.post_save, sender=Person)
+def invalidate_reviewer_snapshots(sender, instance=None, **kwargs):
+    from ietf.review.utils import invalidate_reviewer_snapshots
+    invalidate_reviewer_snapshots()
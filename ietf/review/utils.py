@@ -11,6 +11,8 @@ import six
 
 from collections import defaultdict, namedtuple
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Q, Max, F
 from django.template.defaultfilters import pluralize
 from django.urls import reverse as urlreverse
@@ -28,7 +30,8 @@ from ietf.person.models import Person
 from ietf.ietfauth.utils import has_role, is_authorized_in_doc_stream
 from ietf.review.models import (ReviewRequest, ReviewAssignment, ReviewRequestStateName, ReviewTypeName, 
                                 ReviewerSettings, UnavailablePeriod, ReviewWish, NextReviewerInTeam,
-                                ReviewSecretarySettings)
+                                ReviewSecretarySettings, ReviewTeamSettings)
+from ietf.utils.cache import get_generation, new_generation
 from ietf.utils.mail import send_mail
 from ietf.doc.utils import extract_complete_replaces_ancestor_mapping_for_docs
 
@@ -558,52 +561,56 @@ def close_review_request(request, review_req, close_state, close_comment=''):
             notify_reviewer=True, notify_requested_by=True)
 
 def suggested_review_requests_for_team(team):
-
-    if not team.reviewteamsettings.autosuggest:
-        return []
+    return suggested_review_requests_for_teams([team])[team.pk]
+
+def suggested_review_requests_for_teams(teams):
+    """Return dict with the suggested review requests of each of teams, by
+    team pk.  The candidate documents, their events and the existing
+    requests which block suggestions are fetched once for all teams."""
+    teams = list(teams)
+    res = { team.pk: [] for team in teams }
+
+    review_types = defaultdict(set)
+    for team_id, review_type in ReviewTeamSettings.review_types.through.objects.filter(
+            reviewteamsettings__group__in=teams,
+            reviewteamsettings__autosuggest=True,
+    ).values_list("reviewteamsettings__group", "reviewtypename"):
+        review_types[team_id].add(review_type)
+    teams = [ team for team in teams if team.pk in review_types ]
+    if not teams:
+        return res
 
     system_person = Person.objects.get(name="(System)")
 
-    seen_deadlines = {}
-
-    requests = {}
-
     now = datetime.datetime.now()
 
     reviewable_docs_qs = Document.objects.filter(type="draft").exclude(stream="ise")
 
     requested_state = ReviewRequestStateName.objects.get(slug="requested", used=True)
 
+    # candidates as (doc, time, deadline), by review type
+    candidates = {}
+
     last_call_type = ReviewTypeName.objects.get(slug="lc")
-    if last_call_type in team.reviewteamsettings.review_types.all():
+    if any(last_call_type.pk in review_types[team.pk] for team in teams):
         # in Last Call
-        last_call_docs = reviewable_docs_qs.filter(
+        last_call_docs = list(reviewable_docs_qs.filter(
             states=State.objects.get(type="draft-iesg", slug="lc", used=True)
-        )
-        last_call_expiry_events = { e.doc_id: e for e in LastCallDocEvent.objects.order_by("time", "id") }
+        ))
+        last_call_expiry_events = { e.doc_id: e for e in LastCallDocEvent.objects.filter(doc__in=last_call_docs).order_by("time", "id") }
+        candidates[last_call_type.pk] = []
         for doc in last_call_docs:
             e = last_call_expiry_events[doc.pk] if doc.pk in last_call_expiry_events else LastCallDocEvent(expires=now, time=now)
 
             deadline = e.expires.date()
 
-            if deadline > seen_deadlines.get(doc.pk, datetime.date.max) or deadline < now.date():
+            if deadline < now.date():
                 continue
 
-            requests[doc.pk] = ReviewRequest(
-                time=e.time,
-                type=last_call_type,
-                doc=doc,
-                team=team,
-                deadline=deadline,
-                requested_by=system_person,
-                state=requested_state,
-            )
-
-            seen_deadlines[doc.pk] = deadline
-
+            candidates[last_call_type.pk].append((doc, e.time, deadline))
 
     telechat_type = ReviewTypeName.objects.get(slug="telechat")
-    if telechat_type in team.reviewteamsettings.review_types.all():
+    if any(telechat_type.pk in review_types[team.pk] for team in teams):
         # on Telechat Agenda
         telechat_dates = list(TelechatDate.objects.active().order_by('date').values_list("date", flat=True)[:4])
 
@@ -623,51 +630,76 @@ def suggested_review_requests_for_team(team):
             "doc", "pk", "time", "telechat_date"
         ).order_by("doc", "-time", "-id").distinct()
 
+        latest_telechat_events = []
         for doc_pk, events in itertools.groupby(telechat_events, lambda t: t[0]):
             _, _, event_time, event_telechat_date = list(events)[0]
 
-            deadline = None
             if event_telechat_date in telechat_dates:
-                deadline = event_telechat_date - telechat_deadline_delta
-
-            if not deadline or deadline > seen_deadlines.get(doc_pk, datetime.date.max):
+                latest_telechat_events.append((doc_pk, event_time, event_telechat_date - telechat_deadline_delta))
+
+        docs = Document.objects.in_bulk([ doc_pk for doc_pk, _, _ in latest_telechat_events ])
+        candidates[telechat_type.pk] = [ (docs[doc_pk], event_time, deadline) for doc_pk, event_time, deadline in latest_telechat_events ]
+
+    # existing explicit requests for the candidates block suggestions
+    # for the same document in the same team, so find the blocked
+    # (team, document) pairs for all teams at once
+    doc_revs = { doc.pk: doc.rev for l in candidates.values() for doc, _, _ in l }
+
+    existing_requests = list(ReviewRequest.objects.filter(
+        doc__in=list(doc_revs.keys()), team__in=teams,
+    ).values_list("pk", "team", "doc", "state", "requested_rev"))
+
+    pending = set()
+    completed_revs = defaultdict(set)
+    for review_request_id, state, reviewed_rev in ReviewAssignment.objects.filter(
+            review_request__in=[ r[0] for r in existing_requests ],
+    ).values_list("review_request", "state", "reviewed_rev"):
+        if state in ("assigned", "accepted"):
+            pending.add(review_request_id)
+        elif state == "completed":
+            completed_revs[review_request_id].add(reviewed_rev)
+
+    blocked = set()
+    for pk, team_id, doc_id, state, requested_rev in existing_requests:
+        rev = doc_revs[doc_id]
+        for_this_rev = not requested_rev or requested_rev == rev
+        if (state == "no-review-document"
+            or (state == "no-review-version" and for_this_rev)
+            or (state == "assigned" and pk in pending and for_this_rev)
+            or state not in ('requested', 'assigned')
+            # at least one assignment was completed for the requested version or the current doc version if no specific version was requested:
+            or (requested_rev or rev) in completed_revs[pk]):
+            blocked.add((team_id, doc_id))
+
+    for team in teams:
+        seen_deadlines = {}
+
+        requests = {}
+
+        for review_type in (last_call_type, telechat_type):
+            if review_type.pk not in review_types[team.pk]:
                 continue
 
-            requests[doc_pk] = ReviewRequest(
-                time=event_time,
-                type=telechat_type,
-                doc_id=doc_pk,
-                team=team,
-                deadline=deadline,
-                requested_by=system_person,
-                state=requested_state,
-            )
-
-            seen_deadlines[doc_pk] = deadline
-
-    # filter those with existing explicit requests 
-    existing_requests = defaultdict(list)
-    for r in ReviewRequest.objects.filter(doc__id__in=iter(requests.keys()), team=team):
-        existing_requests[r.doc_id].append(r)
+            for doc, time, deadline in candidates[review_type.pk]:
+                if deadline > seen_deadlines.get(doc.pk, datetime.date.max):
+                    continue
 
-    def blocks(existing, request):
-        if existing.doc_id != request.doc_id:
-            return False
+                requests[doc.pk] = ReviewRequest(
+                    time=time,
+                    type=review_type,
+                    doc=doc,
+                    team=team,
+                    deadline=deadline,
+                    requested_by=system_person,
+                    state=requested_state,
+                )
 
-        no_review_document = existing.state_id == "no-review-document"
-        no_review_rev = ( existing.state_id == "no-review-version") and (not existing.requested_rev or existing.requested_rev == request.doc.rev)
-        pending = (existing.state_id == "assigned" 
-                   and existing.reviewassignment_set.filter(state_id__in=("assigned", "accepted")).exists()
-                   and (not existing.requested_rev or existing.requested_rev == request.doc.rev))
-        request_closed = existing.state_id not in ('requested','assigned')
-        # at least one assignment was completed for the requested version or the current doc version if no specific version was requested:
-        some_assignment_completed = existing.reviewassignment_set.filter(reviewed_rev=existing.requested_rev or existing.doc.rev, state_id='completed').exists()
+                seen_deadlines[doc.pk] = deadline
 
-        return any([no_review_document, no_review_rev, pending, request_closed, some_assignment_completed])
+        team_res = [ r for r in requests.values() if (team.pk, r.doc_id) not in blocked ]
+        team_res.sort(key=lambda r: (r.deadline, r.doc_id), reverse=True)
+        res[team.pk] = team_res
 
-    res = [r for r in requests.values()
-           if not any(blocks(e, r) for e in existing_requests[r.doc_id])]
-    res.sort(key=lambda r: (r.deadline, r.doc_id), reverse=True)
     return res
 
 def extract_revision_ordered_review_assignments_for_documents_and_replaced(review_assignment_queryset, names):
@@ -765,13 +797,13 @@ def extract_revision_ordered_review_requests_for_documents_and_replaced(review_r
     return res
 
 # TODO : Change this field to deal with multiple already assigned reviewers
-def setup_reviewer_field(field, review_req):
+def setup_reviewer_field(field, review_req, snapshot=None):
     field.queryset = field.queryset.filter(role__name="reviewer", role__group=review_req.team)
     one_assignment = review_req.reviewassignment_set.first()
     if one_assignment:
         field.initial = one_assignment.reviewer_id
 
-    choices = make_assignment_choices(field.queryset, review_req)
+    choices = make_assignment_choices(field.queryset, review_req, snapshot)
     if not field.required:
         choices = [("", field.empty_label)] + choices
 
@@ -786,30 +818,117 @@ def get_default_filter_re(person):
     else:
         return '^draft-(%s|%s)-.*$' % ( person.last_name().lower(), '|'.join(['ietf-%s' % g.acronym for g in groups_to_avoid]))
 
-def make_assignment_choices(email_queryset, review_req):
+class ReviewerSnapshot(object):
+    """The data on the reviewers of a team which make_assignment_choices()
+    ranks them by, apart from what depends on the document to review.
+    It's built for a given day, as the unavailable periods and the
+    assignment statistics depend on it, see reviewer_snapshot()."""
+
+    def __init__(self, team):
+        self.team_id = team.pk
+        self.date = datetime.date.today()
+
+        reviewers = list(Person.objects.filter(role__name="reviewer", role__group=team).distinct())
+
+        # settings, with the filter regexps precompiled
+        self.settings = {}
+        self.min_intervals = {}
+        for s in ReviewerSettings.objects.filter(team=team):
+            self.settings[s.person_id] = (re.compile(s.filter_re) if s.filter_re else None, s.skip_next)
+            self.min_intervals[s.person_id] = s.min_interval
+        for p in reviewers:
+            if p.pk not in self.settings:
+                self.settings[p.pk] = self.default_settings(p)
+
+        # frequency
+        self.latest_assignment_times = dict(ReviewAssignment.objects.filter(
+            review_request__team=team,
+        ).values_list("reviewer__person").annotate(Max("assigned_on")))
+
+        # rotation
+        self.rotation_index = { p.pk: i for i, p in enumerate(reviewer_rotation_list(team)) }
+
+        # unavailable periods
+        self.unavailable_periods = dict(current_unavailable_periods_for_reviewers(team))
+
+        # statistics
+        self.stats = {}
+        for person_id, assignment_data in latest_review_assignments_for_reviewers(team).items():
+            stats = []
+            currently_open = sum(1 for d in assignment_data if d.state in ["assigned", "accepted"])
+            pages = sum(rd.doc_pages for rd in assignment_data if rd.state in ["assigned", "accepted"])
+            if currently_open > 0:
+                stats.append("currently {count} open, {pages} pages".format(count=currently_open, pages=pages))
+            could_have_completed = [d for d in assignment_data if d.state in ["part-completed", "completed", "no-response"]]
+            if could_have_completed:
+                no_response     = len([d for d in assignment_data if d.state == 'no-response'])
+                if no_response:
+                    stats.append("%s no response" % no_response)
+                part_completed  = len([d for d in assignment_data if d.state == 'part-completed'])
+                if part_completed:
+                    stats.append("%s partially complete" % part_completed)
+                completed       = len([d for d in assignment_data if d.state == 'completed'])
+                if completed:
+                    stats.append("%s fully completed" % completed)
+            if stats:
+                self.stats[person_id] = ", ".join(stats)
+
+    @staticmethod
+    def default_settings(person):
+        return (re.compile(get_default_filter_re(person)), 0)
+
+    def reviewer_settings(self, person_id):
+        """Return (compiled filter regexp or None, skip next) for the reviewer."""
+        if person_id not in self.settings:
+            self.settings[person_id] = self.default_settings(person_id)
+        return self.settings[person_id]
+
+    def days_needed(self, person_id, now):
+        """Days needed until the min_interval of the reviewer is fulfilled,
+        like days_needed_to_fulfill_min_interval_for_reviewers()."""
+        latest_assignment_time = self.latest_assignment_times.get(person_id)
+        min_interval = self.min_intervals.get(person_id)
+        if latest_assignment_time is None or min_interval is None:
+            return 0
+        return max(0, min_interval - (now - latest_assignment_time).days)
+
+REVIEWER_SNAPSHOT_GENERATION_KEY = "review:reviewer_snapshot_generation"
+
+def reviewer_snapshot(team):
+    """Return the ReviewerSnapshot of team for today.  It's kept in the
+    cache until a review request or assignment, reviewer settings,
+    unavailable period, role or person is changed, see
+    invalidate_reviewer_snapshots()."""
+    generation = get_generation(cache, REVIEWER_SNAPSHOT_GENERATION_KEY)
+    cache_key = "review:reviewer_snapshot:%s:%s:%s" % (generation, team.pk, datetime.date.today().isoformat())
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        snapshot = ReviewerSnapshot(team)
+        cache.set(cache_key, snapshot, settings.REVIEWER_SNAPSHOT_CACHE_TIME)
+    return snapshot
+
+def invalidate_reviewer_snapshots():
+    """Called whenever a ReviewRequest, ReviewAssignment, ReviewerSettings,
+    UnavailablePeriod, NextReviewerInTeam, Role or Person is saved or deleted."""
+    new_generation(cache, REVIEWER_SNAPSHOT_GENERATION_KEY)
+
+def make_assignment_choices(email_queryset, review_req, snapshot=None):
+    """Return the choices for assigning review_req to one of the reviewers
+    with an email in email_queryset, ranked from most to least suitable.
+    When ranking the reviewers for several requests of the same team,
+    pass the same reviewer_snapshot() of the team in snapshot."""
     doc = review_req.doc
     team = review_req.team
 
-    possible_emails = list(email_queryset)
+    if snapshot is None or snapshot.team_id != team.pk:
+        snapshot = reviewer_snapshot(team)
+
+    possible_emails = list(email_queryset.select_related("person"))
     possible_person_ids = [e.person_id for e in possible_emails]
 
     aliases = DocAlias.objects.filter(docs=doc).values_list("name", flat=True)
 
-    # settings
-    reviewer_settings = {
-        r.person_id: r
-        for r in ReviewerSettings.objects.filter(team=team, person__in=possible_person_ids)
-    }
-
-    for p in possible_person_ids:
-        if p not in reviewer_settings:
-            reviewer_settings[p] = ReviewerSettings(team=team, filter_re = get_default_filter_re(p))
-
-    # frequency
-    days_needed_for_reviewers = days_needed_to_fulfill_min_interval_for_reviewers(team)
-
-    # rotation
-    rotation_index = { p.pk: i for i, p in enumerate(reviewer_rotation_list(team)) }
+    now = datetime.datetime.now()
 
     # previous review of document
     has_reviewed_previous = ReviewRequest.objects.filter(
@@ -838,15 +957,9 @@ def make_assignment_choices(email_queryset, review_req):
     for author in DocumentAuthor.objects.filter(document=doc, person__in=possible_person_ids).values_list("person", flat=True):
         connections[author] = "is author of document"
 
-    # unavailable periods
-    unavailable_periods = current_unavailable_periods_for_reviewers(team)
-
-    # reviewers statistics
-    assignment_data_for_reviewers = latest_review_assignments_for_reviewers(team)
-
     ranking = []
     for e in possible_emails:
-        settings = reviewer_settings.get(e.person_id)
+        filter_re, skip_next = snapshot.reviewer_settings(e.person_id)
 
         # we sort the reviewers by separate axes, listing the most
         # important things first
@@ -859,7 +972,7 @@ def make_assignment_choices(email_queryset, review_req):
                 explanations.append(explanation)
 
         # unavailable for review periods
-        periods = unavailable_periods.get(e.person_id, [])
+        periods = snapshot.unavailable_periods.get(e.person_id, [])
         unavailable_at_the_moment = periods and not (e.person_id in has_reviewed_previous and all(p.availability == "canfinish" for p in periods))
         add_boolean_score(-1, unavailable_at_the_moment)
 
@@ -877,46 +990,27 @@ def make_assignment_choices(email_queryset, review_req):
         add_boolean_score(+1, e.person_id in has_reviewed_previous, "reviewed document before")
         add_boolean_score(+1, e.person_id in wish_to_review, "wishes to review document")
         add_boolean_score(-1, e.person_id in connections, connections.get(e.person_id)) # reviewer is somehow connected: bad
-        add_boolean_score(-1, settings.filter_re and any(re.search(settings.filter_re, n) for n in aliases), "filter regexp matches")
+        add_boolean_score(-1, filter_re and any(filter_re.search(n) for n in aliases), "filter regexp matches")
 
         # minimum interval between reviews
-        days_needed = days_needed_for_reviewers.get(e.person_id, 0)
+        days_needed = snapshot.days_needed(e.person_id, now)
         scores.append(-days_needed)
         if days_needed > 0:
             explanations.append("max frequency exceeded, ready in {} {}".format(days_needed, "day" if days_needed == 1 else "days"))
 
         # skip next
-        scores.append(-settings.skip_next)
-        if settings.skip_next > 0:
-            explanations.append("skip next {}".format(settings.skip_next))
+        scores.append(-skip_next)
+        if skip_next > 0:
+            explanations.append("skip next {}".format(skip_next))
 
         # index
-        index = rotation_index.get(e.person_id, 0)
+        index = snapshot.rotation_index.get(e.person_id, 0)
         scores.append(-index)
         explanations.append("#{}".format(index + 1))
 
         # stats
-        stats = []
-        assignment_data = assignment_data_for_reviewers.get(e.person_id, [])
-
-        currently_open = sum(1 for d in assignment_data if d.state in ["assigned", "accepted"])
-        pages = sum(rd.doc_pages for rd in assignment_data if rd.state in ["assigned", "accepted"])
-        if currently_open > 0:
-            stats.append("currently {count} open, {pages} pages".format(count=currently_open, pages=pages))
-        could_have_completed = [d for d in assignment_data if d.state in ["part-completed", "completed", "no-response"]]
-        if could_have_completed:
-            no_response     = len([d for d in assignment_data if d.state == 'no-response'])
-            if no_response:
-                stats.append("%s no response" % no_response)
-            part_completed  = len([d for d in assignment_data if d.state == 'part-completed'])
-            if part_completed:
-                stats.append("%s partially complete" % part_completed)
-            completed       = len([d for d in assignment_data if d.state == 'completed'])
-            if completed:
-                stats.append("%s fully completed" % completed)
-
-        if stats:
-            explanations.append(", ".join(stats))
+        if e.person_id in snapshot.stats:
+            explanations.append(snapshot.stats[e.person_id])
 
         label = six.text_type(e.person)
         if explanations:
@@ -361,6 +361,7 @@ if DEBUG:
 
 
 MIDDLEWARE = [
+    'ietf.middleware.performance_instrumentation_middleware', # first, to see all of the request
     'django.middleware.csrf.CsrfViewMiddleware',
     'corsheaders.middleware.CorsMiddleware', # see docs on CORS_REPLACE_HTTPS_REFERER before using it
     'django.middleware.common.CommonMiddleware',
@@ -538,6 +539,7 @@ TEST_CODE_COVERAGE_EXCLUDE_FILES = [
     "idindex/generate_all_id_txt.py",
     "idindex/generate_id_abstracts_txt.py",
     "idindex/generate_id_index_txt.py",
+    "idindex/check_incremental_index.py",
     "ietf/checks.py",
     "ietf/manage.py",
     "ietf/virtualenv-manage.py",
@@ -628,6 +630,9 @@ INTERNET_DRAFT_ARCHIVE_DIR = '/a/www/www6s/draft-archive'
 # write anything to this directory -- its content is maintained by ghostlinkd:
 INTERNET_ALL_DRAFTS_ARCHIVE_DIR = '/a/www/www6s/archive/id'
 MEETING_RECORDINGS_DIR = '/a/www/audio'
+# Rendered lines of the I-D index files, kept between incremental runs of
+# the generators in ietf.idindex
+IDINDEX_CACHE_DIR = '/var/cache/datatracker/idindex'
 
 DOCUMENT_FORMAT_WHITELIST = ["txt", "ps", "pdf", "xml", "html", ]
 
@@ -698,11 +703,76 @@ CACHES = {
             'MAX_ENTRIES': 100000,      # 100,000
         },
     },
+    'drafts': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/var/cache/datatracker/drafts',
+        'OPTIONS': {
+            'MAX_ENTRIES': 200000,      # 200,000
+        },
+    },
+    'sync': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/var/cache/datatracker/sync',
+    },
+    'agenda': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/var/cache/datatracker/agenda',
+        'VERSION': __version__,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+    'ipr': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/var/cache/datatracker/ipr',
+    },
 }
 
 HTMLIZER_VERSION = 1
 HTMLIZER_URL_PREFIX = "/doc/html"
 HTMLIZER_CACHE_TIME = 60*60*24*14       # 14 days
+HTMLIZER_STALE_TIME = 60*60*24*2        # 2 days, serve stale copies while re-rendering
+HTMLIZER_LOCK_TIME = 60                 # seconds, after which a render lock is taken to be left behind
+HTMLIZER_LOCK_POLL_INTERVAL = 0.5       # seconds between checks for a document another process is rendering
+
+# Parsed draft meta-information, see ietf.utils.draft_cache
+DRAFT_CACHE_TIME = 60*60*24*60          # 60 days
+
+# Processed and rendered meeting agendas, see ietf.meeting.views.agenda.
+# The cache keys include a version of the schedule and its materials, so
+# this only limits how long superseded entries stay around.
+AGENDA_CACHE_TIME = 60*60*24            # 1 day
+
+# The in-process index over all community list search rules, see
+# ietf.community.utils.get_search_rule_index().  It's also rebuilt when
+# the rules change, this catches changes made without signals.
+SEARCH_RULE_INDEX_TIME = 60*5           # 5 minutes
+
+# Roles of a person, as used by ietf.ietfauth.utils.has_role().  Kept
+# short, as this is authorization data, and changes made without signals
+# are only picked up when the snapshot expires.
+ROLE_SNAPSHOT_CACHE_TIME = 60           # 1 minute
+
+# Transitive document relations, see ietf.doc.utils.relation_closure()
+RELATION_CLOSURE_CACHE_TIME = 60*60*24  # 1 day
+
+# Reviewer data of a review team, see ietf.review.utils.reviewer_snapshot()
+REVIEWER_SNAPSHOT_CACHE_TIME = 60*60*24 # 1 day
+
+# The IPR by-draft files, see ietf.ipr.utils.get_ipr_by_draft_txt()
+IPR_BY_DRAFT_CACHE_TIME = 60*60*24*7    # 7 days
+
+# Per-process cache of decoded document text, see ietf.utils.textfile
+DOCUMENT_TEXT_CACHE_SIZE = 32*1024*1024 # characters
+
+# Per-request performance instrumentation, see ietf.utils.perf
+PERF_INSTRUMENTATION = False
+PERF_EXPORT_INTERVAL = 5*60             # seconds between summaries in the log and metrics files
+PERF_METRICS_DIR = None                 # where to write Prometheus metrics files, if anywhere
+PERF_QUERY_BUDGET = 500                 # log requests with more queries than this
+PERF_TIME_BUDGET = 10                   # log requests which take longer than this, in seconds
+PERF_PROFILE_SAMPLE_RATE = 0            # fraction of the requests to run under cProfile
+PERF_PROFILE_DIR = '/var/tmp/datatracker-profiles'
 
 # Email settings
 IPR_EMAIL_FROM = 'ietf-ipr@ietf.org'
@@ -725,9 +795,13 @@ RFC_EDITOR_GROUP_NOTIFICATION_EMAIL = "webmaster@rfc-editor.org"
 #RFC_EDITOR_GROUP_NOTIFICATION_URL = "https://www.rfc-editor.org/notification/group.php"
 RFC_EDITOR_QUEUE_URL = "https://www.rfc-editor.org/queue2.xml"
 RFC_EDITOR_INDEX_URL = "https://www.rfc-editor.org/rfc/rfc-index.xml"
+RFC_EDITOR_FULL_SYNC_INTERVAL = 60*60*24    # process unchanged index and queue entries once a day
 RFC_EDITOR_ERRATA_URL = "https://www.rfc-editor.org/errata_search.php?rfc={rfc_number}&amp;rec_status=0"
 RFC_EDITOR_INLINE_ERRATA_URL = "https://www.rfc-editor.org/rfc/beta/errata/RFC{rfc_number}.html"
 
+# Sync jobs queued by the IANA and RFC Editor notifications, see ietf.sync.jobs
+SYNC_JOB_SPOOL_DIR = '/a/www/ietf-datatracker/sync-jobs/'
+
 # NomCom Tool settings
 ROLODEX_URL = ""
 NOMCOM_PUBLIC_KEYS_DIR = '/a/www/nomcom/public_keys/'
@@ -779,6 +853,7 @@ IDSUBMIT_CHECKER_CLASSES = (
     "ietf.submit.checkers.DraftIdnitsChecker",
     "ietf.submit.checkers.DraftYangChecker",
 )
+IDSUBMIT_CHECKER_TIMEOUT = 5*60         # seconds, for all checkers, which run in parallel
 
 
 IDSUBMIT_MANUAL_STAGING_DIR = '/tmp/'
@@ -1115,7 +1190,30 @@ if SERVER_MODE != 'production':
             'OPTIONS': {
                 'MAX_ENTRIES': 1000,
             },
-        }
+        },
+        'drafts': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/var/cache/datatracker/drafts',
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000,
+            },
+        },
+        'sync': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/var/cache/datatracker/sync',
+        },
+        'agenda': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/var/cache/datatracker/agenda',
+        },
+        'ipr': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/var/cache/datatracker/ipr',
+        },
     }
     SESSION_ENGINE = "django.contrib.sessions.backends.db"
 
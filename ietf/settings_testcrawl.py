@@ -37,6 +37,25 @@ CACHES = {
             'MAX_ENTRIES': 100000,
         },
     },
+    'drafts': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        'LOCATION': '/var/cache/datatracker/drafts',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+    'sync': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        'LOCATION': '/var/cache/datatracker/sync',
+    },
+    'agenda': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        'LOCATION': '/var/cache/datatracker/agenda',
+    },
+    'ipr': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        'LOCATION': '/var/cache/datatracker/ipr',
+    },
 }
 
 PASSWORD_HASHERS = [ 'django.contrib.auth.hashers.MD5PasswordHasher', ]
@@ -9,6 +9,7 @@ import sys
 import os
 import os.path
 import argparse
+import multiprocessing
 import six
 import time
 if six.PY3:
@@ -26,18 +27,22 @@ import django
 django.setup()
 
 from django.conf import settings
+from django.db import connections, transaction
 
 import debug                            # pyflakes:ignore
 
 from ietf.doc.models import Document
 from ietf.name.models import FormalLanguageName
-from ietf.utils.draft import Draft
+from ietf.utils.draft_cache import CachedDraft
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--document", help="specific document name")
 parser.add_argument("--words", action="store_true", help="fill in word count")
 parser.add_argument("--formlang", action="store_true", help="fill in formal languages")
 parser.add_argument("--authors", action="store_true", help="fill in author info")
+parser.add_argument("--jobs", type=int, default=1, help="number of processes to parse drafts in (default 1)")
+parser.add_argument("--batch-size", type=int, default=100, help="number of documents to update per transaction (default 100)")
+parser.add_argument("--checkpoint", help="file listing already processed documents; these are skipped, and newly processed ones are added, so an interrupted run can be resumed")
 args = parser.parse_args()
 
 formal_language_dict = { l.pk: l for l in FormalLanguageName.objects.all() }
@@ -71,9 +76,122 @@ def unicode(text):
         except UnicodeDecodeError:
             pass
 
+def parse_draft(item):
+    """Parse one draft file.  This runs in the worker processes, so it
+    must not touch the database; it returns only the values the parent
+    needs to compare against the database."""
+    pk, path = item
+    with io.open(path, 'rb') as f:
+        d = CachedDraft(unicode(f.read()), path)
+    result = { "pk": pk }
+    if args.words:
+        result["words"] = d.get_wordcount()
+    if args.formlang:
+        result["formlang"] = d.get_formal_languages()
+    if args.authors:
+        result["authors"] = d.get_author_list()
+    return result
+
+def apply_result(doc, canonical_name, result):
+    updated = False
+
+    updates = {}
+
+    if args.words:
+        words = result["words"]
+        if words != doc.words:
+            updates["words"] = words
+
+    if args.formlang:
+        langs = result["formlang"]
+
+        new_formal_languages = set(formal_language_dict[l] for l in langs)
+        old_formal_languages = set(doc.formal_languages.all())
+
+        if new_formal_languages != old_formal_languages:
+            for l in new_formal_languages - old_formal_languages:
+                doc.formal_languages.add(l)
+                updated = True
+            for l in old_formal_languages - new_formal_languages:
+                doc.formal_languages.remove(l)
+                updated = True
+
+    if args.authors:
+        old_authors = doc.documentauthor_set.all()
+        old_authors_by_name = {}
+        old_authors_by_email = {}
+        for author in old_authors:
+            for alias in author.person.alias_set.all():
+                old_authors_by_name[alias.name] = author
+            old_authors_by_name[author.person.plain_name()] = author
+
+            if author.email_id:
+                old_authors_by_email[author.email_id] = author
+
+        # the draft parser sometimes has a problem when
+        # affiliation isn't in the second line and it then thinks
+        # it's an extra author - skip those extra authors
+        seen = set()                # type: Set[Optional[str]]
+        for full, _, _, _, _, email, country, company in result["authors"]:
+            assert full is None or    isinstance(full,    six.text_type)
+            assert email is None or   isinstance(email,   six.text_type)
+            assert country is None or isinstance(country, six.text_type)
+            assert                    isinstance(company, six.text_type)
+            #full, email, country, company = [ unicode(s) for s in [full, email, country, company, ] ]
+            if email in seen:
+                continue
+            seen.add(email)
+
+            old_author = None
+            if email:
+                old_author = old_authors_by_email.get(email)
+            if not old_author:
+                old_author = old_authors_by_name.get(full)
+
+            if not old_author:
+                say("UNKNOWN AUTHOR: %s, %s, %s, %s, %s" % (doc.name, full, email, country, company))
+                continue
+
+            update_fields = []
+
+            if old_author.affiliation != company:
+                say("new affiliation: %s [ %s <%s> ] %s -> %s" % (canonical_name, full, email, old_author.affiliation, company))
+                old_author.affiliation = company
+                update_fields.append("affiliation")
+
+            if country is None:
+                country = ""
+
+            if old_author.country != country:
+                say("new country: %s [ %s <%s> ] %s -> %s" % (canonical_name , full, email, old_author.country, country))
+                old_author.country = country
+                update_fields.append("country")
+
+            if update_fields:
+                old_author.save(update_fields=update_fields)
+                updated = True
+
+    if updates:
+        Document.objects.filter(pk=doc.pk).update(**updates)
+        updated = True
+
+    if updated:
+        say("updated: %s" % canonical_name)
+
+done = set()                            # type: Set[str]
+if args.checkpoint and os.path.exists(args.checkpoint):
+    with io.open(args.checkpoint) as f:
+        done = set(l.strip() for l in f if l.strip())
+    say("Skipping %s documents listed in %s" % (len(done), args.checkpoint))
+
 start = time.time()
 say("Running query for documents to process ...")
+docs = {}
+items = []
 for doc in docs_qs.prefetch_related("docalias", "formal_languages", "documentauthor_set", "documentauthor_set__person", "documentauthor_set__person__alias_set"):
+    if doc.name in done:
+        continue
+
     canonical_name = doc.name
     for n in doc.docalias.all():
         if n.name.startswith("rfc"):
@@ -88,99 +206,58 @@ for doc in docs_qs.prefetch_related("docalias", "formal_languages", "documentaut
         say("Skipping %s, no txt file found at %s" % (doc.name, path))
         continue
 
-    with io.open(path, 'rb') as f:
-        say("\nProcessing %s" % doc.name)
-        sys.stdout.flush()
-        d = Draft(unicode(f.read()), path)
-
-        updated = False
-
-        updates = {}
-
-        if args.words:
-            words = d.get_wordcount()
-            if words != doc.words:
-                updates["words"] = words
-
-        if args.formlang:
-            langs = d.get_formal_languages()
-
-            new_formal_languages = set(formal_language_dict[l] for l in langs)
-            old_formal_languages = set(doc.formal_languages.all())
-
-            if new_formal_languages != old_formal_languages:
-                for l in new_formal_languages - old_formal_languages:
-                    doc.formal_languages.add(l)
-                    updated = True
-                for l in old_formal_languages - new_formal_languages:
-                    doc.formal_languages.remove(l)
-                    updated = True
-
-        if args.authors:
-            old_authors = doc.documentauthor_set.all()
-            old_authors_by_name = {}
-            old_authors_by_email = {}
-            for author in old_authors:
-                for alias in author.person.alias_set.all():
-                    old_authors_by_name[alias.name] = author
-                old_authors_by_name[author.person.plain_name()] = author
-
-                if author.email_id:
-                    old_authors_by_email[author.email_id] = author
-
-            # the draft parser sometimes has a problem when
-            # affiliation isn't in the second line and it then thinks
-            # it's an extra author - skip those extra authors
-            seen = set()                # type: Set[Optional[str]]
-            for full, _, _, _, _, email, country, company in d.get_author_list():
-                assert full is None or    isinstance(full,    six.text_type)
-                assert email is None or   isinstance(email,   six.text_type)
-                assert country is None or isinstance(country, six.text_type)
-                assert                    isinstance(company, six.text_type)
-                #full, email, country, company = [ unicode(s) for s in [full, email, country, company, ] ]
-                if email in seen:
-                    continue
-                seen.add(email)
-
-                old_author = None
-                if email:
-                    old_author = old_authors_by_email.get(email)
-                if not old_author:
-                    old_author = old_authors_by_name.get(full)
-
-                if not old_author:
-                    say("UNKNOWN AUTHOR: %s, %s, %s, %s, %s" % (doc.name, full, email, country, company))
-                    continue
-
-                if old_author.affiliation != company:
-                    say("new affiliation: %s [ %s <%s> ] %s -> %s" % (canonical_name, full, email, old_author.affiliation, company))
-                    old_author.affiliation = company
-                    old_author.save(update_fields=["affiliation"])
-                    updated = True
-
-                if country is None:
-                    country = ""
-
-                if old_author.country != country:
-                    say("new country: %s [ %s <%s> ] %s -> %s" % (canonical_name , full, email, old_author.country, country))
-                    old_author.country = country
-                    old_author.save(update_fields=["country"])
-                    updated = True
-                    
-
-        if updates:
-            Document.objects.filter(pk=doc.pk).update(**updates)
-            updated = True
-
-        if updated:
-            say("updated: %s" % canonical_name)
+    docs[doc.pk] = (doc, canonical_name)
+    items.append((doc.pk, path))
+
+say("Parsing %s documents using %s process(es) ..." % (len(items), args.jobs))
+
+if args.jobs > 1:
+    # the worker processes are forked from this one, and must not
+    # share its database connection
+    connections.close_all()
+    pool = multiprocessing.Pool(args.jobs)
+    results = pool.imap_unordered(parse_draft, items, chunksize=16)
+else:
+    pool = None
+    results = six.moves.map(parse_draft, items)
+
+checkpoint = io.open(args.checkpoint, 'a') if args.checkpoint else None
+count = 0
+batch = []
+def apply_batch(batch):
+    with transaction.atomic():
+        for result in batch:
+            doc, canonical_name = docs[result["pk"]]
+            say("\nProcessing %s" % doc.name)
+            apply_result(doc, canonical_name, result)
+    if checkpoint:
+        for result in batch:
+            checkpoint.write("%s\n" % docs[result["pk"]][0].name)
+        checkpoint.flush()
+
+for result in results:
+    batch.append(result)
+    count += 1
+    if len(batch) >= args.batch_size:
+        apply_batch(batch)
+        batch = []
+        say("Processed %s of %s documents, %.1f docs/sec" % (count, len(items), count / (time.time() - start)))
+if batch:
+    apply_batch(batch)
+
+if pool:
+    pool.close()
+    pool.join()
+if checkpoint:
+    checkpoint.close()
 
 stop = time.time()
 dur = stop-start
 sec = dur%60
 min = dur//60
 say("Processing time %d:%02d" % (min, sec))
+if dur:
+    say("Processed %s documents, %.1f docs/sec" % (count, count / dur))
 
 print("\n\nWrote log to %s" % os.path.abspath(logfile.name))
 logfile.close()
-
@@ -11,6 +11,7 @@ import shutil
 import six
 import sys
 import tempfile
+import time
 
 from xym import xym
 from django.conf import settings
@@ -83,7 +84,7 @@ class DraftIdnitsChecker(object):
         
 
         cmd = "%s %s %s" % (settings.IDSUBMIT_IDNITS_BINARY, self.options, path)
-        code, out, err = pipe(cmd)
+        code, out, err = pipe(cmd, timeout=settings.IDSUBMIT_CHECKER_TIMEOUT)
         out = out.decode()
         err = err.decode()
         if code != 0 or out == "":
@@ -125,9 +126,17 @@ class DraftYangChecker(object):
     name = "yang validation"
     symbol = '<span class="large">\u262f</span>'
 
+    def __init__(self):
+        # Look up the tool versions here rather than in the check, which
+        # apply_checkers() runs in a thread of its own
+        self.cmd_versions = dict(VersionInfo.objects.values_list("command", "version"))
+
     def check_file_txt(self, path):
         name = os.path.basename(path)
         workdir = tempfile.mkdtemp()
+        # the tools are run once per model, keep them within the time
+        # apply_checkers() gives the whole check
+        deadline = time.time() + settings.IDSUBMIT_CHECKER_TIMEOUT
         model_name_re = r'^[A-Za-z_][A-Za-z0-9_.-]*(@\d\d\d\d-\d\d-\d\d)?\.yang$'
         errors = 0
         warnings = 0
@@ -180,7 +189,7 @@ class DraftYangChecker(object):
         model_list = list(set(model_list))
 
         command = "xym"
-        cmd_version = VersionInfo.objects.get(command=command).version
+        cmd_version = self.cmd_versions[command]
         message = "%s:\n%s\n\n" % (cmd_version, out.replace('\n\n','\n').strip() if code == 0 else err)
 
         results.append({
@@ -211,9 +220,9 @@ class DraftYangChecker(object):
                 # pyang
                 cmd_template = settings.SUBMIT_PYANG_COMMAND
                 command = [ w for w in cmd_template.split() if not '=' in w ][0]
-                cmd_version = VersionInfo.objects.get(command=command).version
+                cmd_version = self.cmd_versions[command]
                 cmd = cmd_template.format(libs=modpath, model=path)
-                code, out, err = pipe(cmd)
+                code, out, err = pipe(cmd, timeout=max(1, deadline - time.time()))
                 out = out.decode()
                 err = err.decode()
                 if code > 0 or len(err.strip()) > 0 :
@@ -243,10 +252,10 @@ class DraftYangChecker(object):
                 if settings.SUBMIT_YANGLINT_COMMAND:
                     cmd_template = settings.SUBMIT_YANGLINT_COMMAND
                     command = [ w for w in cmd_template.split() if not '=' in w ][0]
-                    cmd_version = VersionInfo.objects.get(command=command).version
+                    cmd_version = self.cmd_versions[command]
                     cmd = cmd_template.format(model=path, rfclib=settings.SUBMIT_YANG_RFC_MODEL_DIR, tmplib=workdir,
                         draftlib=settings.SUBMIT_YANG_DRAFT_MODEL_DIR, ianalib=settings.SUBMIT_YANG_IANA_MODEL_DIR, )
-                    code, out, err = pipe(cmd)
+                    code, out, err = pipe(cmd, timeout=max(1, deadline - time.time()))
                     out = out.decode()
                     err = err.decode()
                     if code > 0 or len(err.strip()) > 0:
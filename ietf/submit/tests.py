@@ -12,18 +12,20 @@ import re
 import shutil
 import six
 import sys
+import time
 
 
 from io import StringIO
 from pyquery import PyQuery
 
 from django.conf import settings
+from django.test import override_settings
 from django.urls import reverse as urlreverse
 from django.utils.encoding import force_str, force_text
 
 import debug                            # pyflakes:ignore
 
-from ietf.submit.utils import expirable_submissions, expire_submission
+from ietf.submit.utils import expirable_submissions, expire_submission, apply_checkers
 from ietf.doc.factories import DocumentFactory, WgDraftFactory, IndividualDraftFactory
 from ietf.doc.models import Document, DocAlias, DocEvent, State, BallotPositionDocEvent, DocumentAuthor
 from ietf.doc.utils import create_ballot_if_not_open
@@ -1796,3 +1798,38 @@ class RefsTests(TestCase):
         self.assertEqual(refs['rfc8126'], 'info')
         self.assertEqual(refs['rfc8175'], 'info')
         
+
+
+class QuickChecker(object):
+    name = "quick check"
+    symbol = ""
+
+    def check_file_txt(self, path):
+        return True, "Quick check passed", 0, 0, {}
+
+class SlowChecker(QuickChecker):
+    name = "slow check"
+
+    def check_file_txt(self, path):
+        time.sleep(2)
+        return True, "Slow check passed", 0, 0, {}
+
+class CheckerTests(TestCase):
+
+    @override_settings(IDSUBMIT_CHECKER_TIMEOUT=0.5, IDSUBMIT_CHECKER_CLASSES=(
+        "ietf.submit.tests.SlowChecker",
+        "ietf.submit.tests.QuickChecker",
+    ))
+    def test_apply_checkers(self):
+        submission = Submission.objects.create(name="draft-ietf-mars-testing-tests", rev="00", state_id="uploaded")
+        apply_checkers(submission, {'txt': '/dev/null'})
+        checks = dict( (c.checker, c) for c in submission.checks.all() )
+        self.assertEqual(set(checks), set(["slow check", "quick check"]))
+        self.assertTrue(checks["quick check"].passed)
+        self.assertIs(checks["slow check"].passed, False)
+        self.assertIn("did not finish in time", checks["slow check"].message)
+
+        # which is shown as a failed check on the status page
+        r = self.client.get(urlreverse('ietf.submit.views.submission_status', kwargs=dict(submission_id=submission.pk, access_token=submission.access_token())))
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "did not finish in time")
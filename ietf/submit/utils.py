@@ -6,10 +6,14 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 import datetime
 import io
+import multiprocessing
 import os
 import re
 import six                              # pyflakes:ignore
+import time
 import xml2rfc
+
+from multiprocessing.pool import ThreadPool
 if six.PY3:
     from typing import Callable, Optional # pyflakes:ignore
 
@@ -791,14 +795,7 @@ def fill_in_submission(form, submission, authors, abstract, file_size):
 
 def apply_checkers(submission, file_name):
     # run submission checkers
-    def apply_check(submission, checker, method, fn):
-        func = getattr(checker, method)
-        passed, message, errors, warnings, info = func(fn)
-        check = SubmissionCheck(submission=submission, checker=checker.name, passed=passed,
-                                message=message, errors=errors, warnings=warnings, items=info,
-                                symbol=checker.symbol)
-        check.save()
-
+    checks = []
     for checker_path in settings.IDSUBMIT_CHECKER_CLASSES:
         checker_class = import_string(checker_path)
         checker = checker_class()
@@ -806,8 +803,32 @@ def apply_checkers(submission, file_name):
         for method in ("check_fragment_xml", "check_file_xml", "check_fragment_txt", "check_file_txt", ):
             ext = method[-3:]
             if hasattr(checker, method) and ext in file_name:
-                apply_check(submission, checker, method, file_name[ext])
+                checks.append((checker, method, file_name[ext]))
                 break
+    if not checks:
+        return
+
+    # The checkers spend most of their time waiting for external tools,
+    # so run them side by side, and save the results in checker order
+    # once they are in.  The check methods run in the pool's threads, so
+    # they mustn't touch the database; anything they need from it is
+    # looked up when the checker is instantiated.  A check which doesn't
+    # finish in time counts as failed; the checkers give the tools they
+    # run the same timeout, so that they are stopped as well.
+    pool = ThreadPool(len(checks))
+    results = [ (checker, pool.apply_async(getattr(checker, method), (fn, ))) for checker, method, fn in checks ]
+    pool.close()
+    deadline = time.time() + settings.IDSUBMIT_CHECKER_TIMEOUT
+    for checker, result in results:
+        try:
+            passed, message, errors, warnings, info = result.get(max(0, deadline - time.time()))
+        except multiprocessing.TimeoutError:
+            log.log("Submission checker %s timed out for %s" % (checker.name, submission.name))
+            passed, message, errors, warnings, info = (False, "The %s check did not finish in time" % checker.name, None, None, {})
+        check = SubmissionCheck(submission=submission, checker=checker.name, passed=passed,
+                                message=message, errors=errors, warnings=warnings, items=info,
+                                symbol=checker.symbol)
+        check.save()
 
 def send_confirmation_emails(request, submission, requires_group_approval, requires_prev_authors_approval):
     docevent_from_submission(request, submission, desc="Uploaded new revision")
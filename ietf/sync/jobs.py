@@ -0,0 +1,108 @@
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import datetime
+import fcntl
+import io
+import os
+
+from django.conf import settings
+from django.db import close_old_connections
+
+import debug                            # pyflakes:ignore
+
+from ietf.sync import iana, rfceditor
+from ietf.utils.log import log
+
+def sync_iana_protocols():
+    # the same as ietf/bin/iana-protocols-updates
+    rfc_must_published_later_than = datetime.datetime(2012, 11, 26, 0, 0, 0)
+    text = iana.fetch_protocol_page(settings.IANA_SYNC_PROTOCOLS_URL)
+    rfc_numbers = iana.parse_protocol_page(text)
+    for i in range(0, len(rfc_numbers), 100):
+        for d in iana.update_rfc_log_from_protocol_page(rfc_numbers[i:i+100], rfc_must_published_later_than):
+            log("Added history entry for %s" % d.display_name())
+
+def sync_iana_changes():
+    # the default period of ietf/bin/iana-changes-updates, a little less
+    # than the 23 hours the IANA server accepts, to compensate for clock skew
+    start = datetime.datetime.now() - datetime.timedelta(hours=23) + datetime.timedelta(seconds=5)
+    end = start + datetime.timedelta(hours=23)
+    text = iana.fetch_changes_json(settings.IANA_SYNC_CHANGES_URL, start, end)
+    added_events, warnings = iana.update_history_with_changes(iana.parse_changes_json(text))
+    for e in added_events:
+        log("Added event for %s %s: %s (parsed json: %s)" % (e.doc_id, e.time, e.desc, e.json))
+    for w in warnings:
+        log("WARNING: %s" % w)
+
+def sync_rfc_editor_queue():
+    if not rfceditor.sync_queue():
+        raise RuntimeError("RFC Editor queue sync failed")
+
+def sync_rfc_editor_index():
+    if rfceditor.sync_index() is None:
+        raise RuntimeError("RFC index sync failed")
+
+# Sync functions, by the notification which triggers them
+SYNC_JOBS = {
+    "protocols": sync_iana_protocols,
+    "changes": sync_iana_changes,
+    "queue": sync_rfc_editor_queue,
+    "index": sync_rfc_editor_index,
+}
+
+# A pending job is an empty file in SYNC_JOB_SPOOL_DIR, named after the
+# notification, so a notification which arrives while the same job is
+# already pending is coalesced with it.  While a job runs, the worker
+# holds a lock on <name>.lock, so the same sync never runs twice at once;
+# a notification which arrives during the run queues the job again.
+
+def spool_path(name):
+    if not os.path.exists(settings.SYNC_JOB_SPOOL_DIR):
+        os.makedirs(settings.SYNC_JOB_SPOOL_DIR)
+    return os.path.join(settings.SYNC_JOB_SPOOL_DIR, name)
+
+def queue_sync_job(notification):
+    """Queue the sync for notification for the run_sync_jobs
+    worker.  Returns False if the job was already pending."""
+    assert notification in SYNC_JOBS
+    path = spool_path(notification)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except OSError:
+        return False
+    os.close(fd)
+    return True
+
+def pending_sync_jobs():
+    return [ n for n in sorted(SYNC_JOBS) if os.path.exists(spool_path(n)) ]
+
+def run_sync(notification):
+    """Run the sync for notification in this process, rather than paying
+    for a new Python process and Django setup for each run."""
+    try:
+        SYNC_JOBS[notification]()
+    finally:
+        close_old_connections()
+
+def run_sync_job(notification):
+    """Run the job for notification if it's pending and not already
+    running.  Returns True if it was run."""
+    with io.open(spool_path(notification + ".lock"), "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            return False                # it's running in another worker
+        try:
+            try:
+                os.unlink(spool_path(notification))
+            except OSError:
+                return False            # not pending (anymore)
+            log("Running %s sync job" % notification)
+            run_sync(notification)
+            return True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,47 @@
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import time
+import traceback
+
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand
+
+import debug                            # pyflakes:ignore
+
+from ietf.sync.jobs import pending_sync_jobs, run_sync_job
+from ietf.utils.log import log
+
+
+class Command(BaseCommand):
+    """
+    Run the sync jobs queued by the IANA and RFC Editor notifications.
+
+    Runs until stopped, checking for new jobs every few seconds, or, with
+    --once, runs the pending jobs and exits, e.g. for running from cron.
+    """
+
+    help = dedent(__doc__).strip()
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', default=False,
+            help='Run the pending jobs and exit.')
+        parser.add_argument('--interval', type=int, default=5,
+            help='Seconds between checks for new jobs (default 5).')
+
+    def handle(self, *args, **options):
+        while True:
+            for notification in pending_sync_jobs():
+                try:
+                    if run_sync_job(notification) and int(options['verbosity']) > 1:
+                        self.stdout.write("Ran %s sync job" % notification)
+                except Exception:
+                    # log, and keep the worker going for the other jobs
+                    log("Exception in %s sync job: %s" % (notification, traceback.format_exc()))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -6,15 +6,20 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 import base64
 import datetime
+import hashlib
+import io
 import re
 import socket
 import six
+import time
 
 from six.moves.urllib.request import Request, urlopen
 from six.moves.urllib.parse import urlencode
 from xml.dom import pulldom, Node
 
 from django.conf import settings
+from django.core.cache import caches
+from django.utils.encoding import force_bytes
 
 import debug                            # pyflakes:ignore
 
@@ -330,29 +335,73 @@ def parse_index(response):
     return data
 
 
+def get_sync_state(name):
+    """Return the document hash, the skip date and the per-entry
+    fingerprints recorded by set_sync_state() after the last successful
+    sync of name ("index" or "queue")."""
+    return caches['sync'].get("rfceditor:%s" % name) or (None, None, {})
+
+def set_sync_state(name, document_hash, skip_older_than_date, fingerprints):
+    caches['sync'].set("rfceditor:%s" % name, (document_hash, skip_older_than_date, fingerprints), None)
+
+def full_sync_due(name):
+    """Return whether it's time for a full sync of name, which ignores the
+    document hash and fingerprints from earlier syncs.  Entries with an
+    unchanged fingerprint are otherwise skipped for good, so this makes
+    sure that changes which failed to apply, or changes to the database
+    made behind the back of the sync, get picked up within
+    RFC_EDITOR_FULL_SYNC_INTERVAL seconds."""
+    last = caches['sync'].get("rfceditor:%s:full" % name)
+    return not last or time.time() - last >= settings.RFC_EDITOR_FULL_SYNC_INTERVAL
+
+def set_full_sync_done(name):
+    caches['sync'].set("rfceditor:%s:full" % name, time.time(), None)
+
+def document_hash(raw):
+    return hashlib.sha256(raw).hexdigest()
+
+def changed_index_entries(data, fingerprints, skip_older_than_date=None):
+    """Given parsed data from the RFC Editor index and the fingerprints of
+    the entries from the last sync, return the entries which have changed
+    since then, and the updated fingerprints.  Entries older than
+    skip_older_than_date are left out, and keep their old fingerprint."""
+    changed = []
+    fingerprints = dict(fingerprints)
+    for entry in data:
+        rfc_number, rfc_published_date = entry[0], entry[3]
+        if skip_older_than_date and rfc_published_date < skip_older_than_date:
+            continue
+        fingerprint = hashlib.sha256(force_bytes(repr(entry))).hexdigest()
+        if fingerprints.get(rfc_number) != fingerprint:
+            changed.append(entry)
+            fingerprints[rfc_number] = fingerprint
+    return changed, fingerprints
+
 def update_docs_from_rfc_index(data, skip_older_than_date=None):
     """Given parsed data from the RFC Editor index, update the documents
     in the database. Yields a list of change descriptions for each
     document, if any."""
 
+    std_levels = dict( (n.slug, n) for n in StdLevelName.objects.all() )
     std_level_mapping = {
-        "Standard": StdLevelName.objects.get(slug="std"),
-        "Internet Standard": StdLevelName.objects.get(slug="std"),
-        "Draft Standard": StdLevelName.objects.get(slug="ds"),
-        "Proposed Standard": StdLevelName.objects.get(slug="ps"),
-        "Informational": StdLevelName.objects.get(slug="inf"),
-        "Experimental": StdLevelName.objects.get(slug="exp"),
-        "Best Current Practice": StdLevelName.objects.get(slug="bcp"),
-        "Historic": StdLevelName.objects.get(slug="hist"),
-        "Unknown": StdLevelName.objects.get(slug="unkn"),
+        "Standard": std_levels["std"],
+        "Internet Standard": std_levels["std"],
+        "Draft Standard": std_levels["ds"],
+        "Proposed Standard": std_levels["ps"],
+        "Informational": std_levels["inf"],
+        "Experimental": std_levels["exp"],
+        "Best Current Practice": std_levels["bcp"],
+        "Historic": std_levels["hist"],
+        "Unknown": std_levels["unkn"],
         }
 
+    streams = dict( (n.slug, n) for n in StreamName.objects.all() )
     stream_mapping = {
-        "IETF": StreamName.objects.get(slug="ietf"),
-        "INDEPENDENT": StreamName.objects.get(slug="ise"),
-        "IRTF": StreamName.objects.get(slug="irtf"),
-        "IAB": StreamName.objects.get(slug="iab"),
-        "Legacy": StreamName.objects.get(slug="legacy"),
+        "IETF": streams["ietf"],
+        "INDEPENDENT": streams["ise"],
+        "IRTF": streams["irtf"],
+        "IAB": streams["iab"],
+        "Legacy": streams["legacy"],
     }
 
     tag_has_errata = DocTagName.objects.get(slug='errata')
@@ -361,11 +410,53 @@ def update_docs_from_rfc_index(data, skip_older_than_date=None):
 
     system = Person.objects.get(name="(System)")
 
-    for rfc_number, title, authors, rfc_published_date, current_status, updates, updated_by, obsoletes, obsoleted_by, also, draft, has_errata, stream, wg, file_formats, pages, abstract in data:
-
-        if skip_older_than_date and rfc_published_date < skip_older_than_date:
-            # speed up the process by skipping old entries
-            continue
+    entries = [ entry for entry in data if not (skip_older_than_date and entry[3] < skip_older_than_date) ]
+
+    # Look up everything the entries are compared with in bulk up front,
+    # so that the (usual) entries without changes don't cost any queries
+
+    def in_chunks(l, size=500):
+        for i in range(0, len(l), size):
+            yield l[i:i+size]
+
+    rfc_names = set("rfc%s" % entry[0] for entry in entries)
+    other_names = set()
+    for entry in entries:
+        updates, obsoletes, also = entry[5], entry[7], entry[9]
+        other_names.update(x.lower() for x in updates + obsoletes if x[:3] not in ("NIC", "IEN", "STD", "RTR"))
+        other_names.update(a.lower() for a in also or [])
+
+    aliases = {}                        # alias name -> DocAlias
+    for names in in_chunks(list(rfc_names | other_names)):
+        for a in DocAlias.objects.filter(name__in=names):
+            aliases[a.name] = a
+
+    alias_docs = {}                     # rfc alias name -> Document
+    for names in in_chunks(list(rfc_names)):
+        for ad in DocAlias.docs.through.objects.filter(docalias__name__in=names).select_related("docalias", "document").order_by("document_id"):
+            alias_docs.setdefault(ad.docalias.name, ad.document)
+
+    preloaded = set()
+    published = set()                   # ids of docs with a published_rfc event
+    has_errata_tag = set()              # ids of docs with the errata tag
+    relations = set()                   # (source id, target id, relationship slug)
+
+    def preload(docs):
+        docs = dict((d.pk, d) for d in docs if d.pk not in preloaded)
+        for d in docs.values():
+            d.state_cache = {}
+            d._cached_state_slug = {}
+        for ids in in_chunks(list(docs)):
+            for ds in Document.states.through.objects.filter(document__in=ids).select_related("state"):
+                docs[ds.document_id].state_cache[ds.state.type_id] = ds.state
+            published.update(DocEvent.objects.filter(doc__in=ids, type="published_rfc").values_list("doc_id", flat=True))
+            has_errata_tag.update(Document.tags.through.objects.filter(document__in=ids, doctagname=tag_has_errata).values_list("document_id", flat=True))
+            relations.update(RelatedDocument.objects.filter(source__in=ids, relationship__in=[relationship_obsoletes, relationship_updates]).values_list("source_id", "target_id", "relationship_id"))
+        preloaded.update(docs)
+
+    preload(alias_docs.values())
+
+    for rfc_number, title, authors, rfc_published_date, current_status, updates, updated_by, obsoletes, obsoleted_by, also, draft, has_errata, stream, wg, file_formats, pages, abstract in entries:
 
         # we assume two things can happen: we get a new RFC, or an
         # attribute has been updated at the RFC Editor (RFC Editor
@@ -377,9 +468,8 @@ def update_docs_from_rfc_index(data, skip_older_than_date=None):
         # make sure we got the document and alias
         doc = None
         name = "rfc%s" % rfc_number
-        a = DocAlias.objects.filter(name=name)
-        if a:
-            doc = a[0].document
+        if name in alias_docs:
+            doc = alias_docs[name]
         else:
             if draft:
                 try:
@@ -394,7 +484,10 @@ def update_docs_from_rfc_index(data, skip_older_than_date=None):
             # add alias
             alias, __ = DocAlias.objects.get_or_create(name=name)
             alias.docs.add(doc)
+            aliases[name] = alias
+            alias_docs[name] = doc
             changes.append("created alias %s" % prettify_std_name(name))
+            preload([doc])
 
         # check attributes
         if title != doc.title:
@@ -409,7 +502,7 @@ def update_docs_from_rfc_index(data, skip_older_than_date=None):
             doc.pages = int(pages)
             changes.append("changed pages to %s" % doc.pages)
 
-        if std_level_mapping[current_status] != doc.std_level:
+        if std_level_mapping[current_status].pk != doc.std_level_id:
             doc.std_level = std_level_mapping[current_status]
             changes.append("changed standardization level to %s" % doc.std_level)
 
@@ -418,18 +511,18 @@ def update_docs_from_rfc_index(data, skip_older_than_date=None):
             move_draft_files_to_archive(doc, doc.rev)
             changes.append("changed state to %s" % doc.get_state())
 
-        if doc.stream != stream_mapping[stream]:
+        if doc.stream_id != stream_mapping[stream].pk:
             doc.stream = stream_mapping[stream]
             changes.append("changed stream to %s" % doc.stream)
 
-        if not doc.group: # if we have no group assigned, check if RFC Editor has a suggestion
+        if not doc.group_id: # if we have no group assigned, check if RFC Editor has a suggestion
             if wg:
                 doc.group = Group.objects.get(acronym=wg)
                 changes.append("set group to %s" % doc.group)
             else:
                 doc.group = Group.objects.get(type="individ") # fallback for newly created doc
 
-        if not doc.latest_event(type="published_rfc"):
+        if doc.pk not in published:
             e = DocEvent(doc=doc, rev=doc.rev, type="published_rfc")
             # unfortunately, rfc_published_date doesn't include the correct day
             # at the moment because the data only has month/year, so
@@ -447,6 +540,7 @@ def update_docs_from_rfc_index(data, skip_older_than_date=None):
             e.desc = "RFC published"
             e.save()
             events.append(e)
+            published.add(doc.pk)
 
             changes.append("added RFC published event at %s" % e.time.strftime("%Y-%m-%d"))
             rfc_published = True
@@ -468,37 +562,37 @@ def update_docs_from_rfc_index(data, skip_older_than_date=None):
                     # sensibly; otherwise we'll have to ignore them
                     l = DocAlias.objects.filter(name__startswith="rfc", docs__docalias__name=x.lower())
                 else:
-                    l = DocAlias.objects.filter(name=x.lower())
+                    l = [ aliases[x.lower()] ] if x.lower() in aliases else []
 
                 for a in l:
                     if a not in res:
                         res.append(a)
             return res
 
-        for x in parse_relation_list(obsoletes):
-            if not RelatedDocument.objects.filter(source=doc, target=x, relationship=relationship_obsoletes):
-                r = RelatedDocument.objects.create(source=doc, target=x, relationship=relationship_obsoletes)
-                changes.append("created %s relation between %s and %s" % (r.relationship.name.lower(), prettify_std_name(r.source.name), prettify_std_name(r.target.name)))
-
-        for x in parse_relation_list(updates):
-            if not RelatedDocument.objects.filter(source=doc, target=x, relationship=relationship_updates):
-                r = RelatedDocument.objects.create(source=doc, target=x, relationship=relationship_updates)
-                changes.append("created %s relation between %s and %s" % (r.relationship.name.lower(), prettify_std_name(r.source.name), prettify_std_name(r.target.name)))
+        for relationship, l in ((relationship_obsoletes, obsoletes), (relationship_updates, updates)):
+            for x in parse_relation_list(l):
+                if not (doc.pk, x.pk, relationship.pk) in relations:
+                    r = RelatedDocument.objects.create(source=doc, target=x, relationship=relationship)
+                    relations.add((doc.pk, x.pk, relationship.pk))
+                    changes.append("created %s relation between %s and %s" % (r.relationship.name.lower(), prettify_std_name(r.source.name), prettify_std_name(r.target.name)))
 
         if also:
             for a in also:
                 a = a.lower()
-                if not DocAlias.objects.filter(name=a):
-                    DocAlias.objects.create(name=a).docs.add(doc)
+                if not a in aliases:
+                    aliases[a] = DocAlias.objects.create(name=a)
+                    aliases[a].docs.add(doc)
                     changes.append("created alias %s" % prettify_std_name(a))
 
         if has_errata:
-            if not doc.tags.filter(pk=tag_has_errata.pk):
+            if not doc.pk in has_errata_tag:
                 doc.tags.add(tag_has_errata)
+                has_errata_tag.add(doc.pk)
                 changes.append("added Errata tag")
         else:
-            if doc.tags.filter(pk=tag_has_errata.pk):
+            if doc.pk in has_errata_tag:
                 doc.tags.remove(tag_has_errata)
+                has_errata_tag.discard(doc.pk)
                 changes.append("removed Errata tag")
 
         if changes:
@@ -516,6 +610,96 @@ def update_docs_from_rfc_index(data, skip_older_than_date=None):
             yield changes, doc, rfc_published
 
 
+def sync_queue(force=False):
+    """Update the drafts in the RFC Editor queue, unless the queue hasn't
+    changed since the last sync and no full sync is due.  Returns False if
+    the queue had too few entries to be trusted."""
+    log("Updating RFC Editor queue states from %s" % settings.RFC_EDITOR_QUEUE_URL)
+
+    start = time.time()
+    raw = fetch_queue_xml(settings.RFC_EDITOR_QUEUE_URL).read()
+
+    queue_hash = document_hash(raw)
+    last_hash, __, __ = get_sync_state("queue")
+    full_sync = force or full_sync_due("queue")
+    if queue_hash == last_hash and not full_sync:
+        log("RFC Editor queue unchanged since the last sync")
+        return True
+
+    drafts, warnings = parse_queue(io.BytesIO(raw))
+    for w in warnings:
+        log("Warning: %s" % w)
+
+    if len(drafts) < MIN_QUEUE_RESULTS:
+        log("Not enough results, only %s" % len(drafts))
+        return False
+
+    changed, warnings = update_drafts_from_queue(drafts)
+    for w in warnings:
+        log("Warning: %s" % w)
+
+    for c in changed:
+        log("Updated %s" % c)
+
+    set_sync_state("queue", queue_hash, None, {})
+    if full_sync:
+        set_full_sync_done("queue")
+
+    log("Parsed %s RFC Editor queue entries, updated %s documents in %.1fs" % (len(drafts), len(changed), time.time() - start))
+    return True
+
+def sync_index(skip_older_than_date=None, force=False):
+    """Update the documents from the entries in the RFC Editor index which
+    have changed since the last sync, or from all of them if a full sync
+    is due.  RFCs published before skip_older_than_date (default one year
+    ago) are skipped.  Returns the newly published RFCs, or None if the
+    index had too few entries to be trusted."""
+    if not skip_older_than_date:
+        skip_older_than_date = datetime.date.today() - datetime.timedelta(days=365)
+
+    log("Updating document metadata from RFC index from %s" % settings.RFC_EDITOR_INDEX_URL)
+
+    start = time.time()
+    raw = fetch_index_xml(settings.RFC_EDITOR_INDEX_URL).read()
+
+    # skip the whole thing if the index hasn't changed since a sync which
+    # covered at least the same range of RFCs
+    index_hash = document_hash(raw)
+    last_hash, last_skip_date, fingerprints = get_sync_state("index")
+    full_sync = force or full_sync_due("index")
+    if full_sync:
+        fingerprints = {}
+    elif index_hash == last_hash and last_skip_date and last_skip_date <= skip_older_than_date:
+        log("RFC index unchanged since the last sync")
+        return []
+
+    data = parse_index(io.BytesIO(raw))
+
+    if len(data) < MIN_INDEX_RESULTS:
+        log("Not enough results, only %s" % len(data))
+        return None
+
+    entries, fingerprints = changed_index_entries(data, fingerprints, skip_older_than_date=skip_older_than_date)
+
+    new_rfcs = []
+    applied = 0
+    for changes, doc, rfc_published in update_docs_from_rfc_index(entries, skip_older_than_date=skip_older_than_date):
+        applied += 1
+        if rfc_published:
+            new_rfcs.append(doc)
+
+        for c in changes:
+            log("%s: %s" % (doc.name, c))
+
+    set_sync_state("index", index_hash, skip_older_than_date, fingerprints)
+    if full_sync:
+        set_full_sync_done("index")
+
+    log("Parsed %s RFC index entries, skipped %s old or unchanged ones, applied changes to %s documents in %.1fs"
+        % (len(data), len(data) - len(entries), applied, time.time() - start))
+    return new_rfcs
+
+
 def post_approved_draft(url, name):
     """Post an approved draft to the RFC Editor so they can retrieve
     the data from the Datatracker and start processing it. Returns
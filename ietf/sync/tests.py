@@ -11,7 +11,12 @@ import datetime
 import quopri
 import shutil
 
+from mock import Mock, patch
+
 from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse as urlreverse
 
 import debug                            # pyflakes:ignore
@@ -21,7 +26,7 @@ from ietf.doc.models import Document, DocAlias, DocEvent, DeletedEvent, DocTagNa
 from ietf.doc.utils import add_state_change_event
 from ietf.group.factories import GroupFactory
 from ietf.person.models import Person
-from ietf.sync import iana, rfceditor
+from ietf.sync import iana, rfceditor, jobs
 from ietf.utils.mail import outbox, empty_outbox
 from ietf.utils.test_utils import login_testing_unauthorized
 from ietf.utils.test_utils import TestCase
@@ -217,8 +222,26 @@ ICANN
         self.assertEqual(r.status_code, 200)
         self.assertContains(r, "new changes at")
 
-        # we don't actually try posting as that would trigger a real run
-        
+        # posting only queues the sync job
+        spool_dir = self.tempdir('sync-jobs')
+        with self.settings(SYNC_JOB_SPOOL_DIR=spool_dir):
+            r = self.client.post(url)
+            self.assertEqual(r.status_code, 202)
+            self.assertEqual(jobs.pending_sync_jobs(), ["changes"])
+
+            # a second notification is coalesced with the pending job
+            r = self.client.post(url)
+            self.assertEqual(r.status_code, 202)
+            self.assertEqual(jobs.pending_sync_jobs(), ["changes"])
+
+            # which the worker runs once
+            sync_changes = Mock()
+            with patch.dict(jobs.SYNC_JOBS, { "changes": sync_changes }):
+                call_command('run_sync_jobs', once=True)
+            sync_changes.assert_called_once_with()
+            self.assertEqual(jobs.pending_sync_jobs(), [])
+        shutil.rmtree(spool_dir)
+
 
 class RFCSyncTests(TestCase):
     def setUp(self):
@@ -363,11 +386,60 @@ class RFCSyncTests(TestCase):
         self.assertTrue(not os.path.exists(os.path.join(self.id_dir, draft_filename)))
         self.assertTrue(os.path.exists(os.path.join(self.archive_dir, draft_filename)))
 
-        # make sure we can apply it again with no changes
-        changed = list(rfceditor.update_docs_from_rfc_index(data, today - datetime.timedelta(days=30)))
+        # make sure we can apply it again with no changes, and that
+        # unchanged entries don't cost any queries of their own
+        with CaptureQueriesContext(connection) as queries:
+            changed = list(rfceditor.update_docs_from_rfc_index(data, today - datetime.timedelta(days=30)))
         self.assertEqual(len(changed), 0)
+        self.assertLessEqual(len(queries), 12)
 
 
+    @override_settings(CACHES={
+        'default': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+        'sync': { 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', },
+        'ipr': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+    })
+    def test_changed_index_entries(self):
+        today = datetime.date.today()
+        entry = (1234, "A Testing RFC", ["A. Irector"], today, "Proposed Standard", [], [], [], [], [],
+                 "draft-ietf-mars-test", False, "IETF", "mars", ["ASCII"], "42", "Some text.")
+        old_entry = (123, "An Old RFC", ["A. Irector"], today - datetime.timedelta(days=400), "Informational", [], [], [], [], [],
+                     "draft-ietf-mars-old", False, "IETF", "mars", ["ASCII"], "7", "Old text.")
+        data = [ entry, old_entry ]
+
+        self.assertEqual(rfceditor.get_sync_state("index"), (None, None, {}))
+
+        skip_date = today - datetime.timedelta(days=365)
+        entries, fingerprints = rfceditor.changed_index_entries(data, {}, skip_date)
+        self.assertEqual(entries, [ entry ])
+        self.assertEqual(set(fingerprints), set([ 1234 ]))
+        rfceditor.set_sync_state("index", "somehash", skip_date, fingerprints)
+
+        # nothing has changed
+        __, __, fingerprints = rfceditor.get_sync_state("index")
+        entries, fingerprints = rfceditor.changed_index_entries(data, fingerprints, skip_date)
+        self.assertEqual(entries, [])
+
+        # a changed entry, and one which wasn't looked at before
+        changed_entry = entry[:1] + ("A Tested RFC", ) + entry[2:]
+        entries, fingerprints = rfceditor.changed_index_entries([ changed_entry, old_entry ], fingerprints)
+        self.assertEqual(entries, [ changed_entry, old_entry ])
+        self.assertEqual(set(fingerprints), set([ 1234, 123 ]))
+
+    @override_settings(CACHES={
+        'default': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+        'sync': { 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', },
+        'ipr': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+    })
+    def test_full_sync_due(self):
+        self.assertTrue(rfceditor.full_sync_due("index"))
+        rfceditor.set_full_sync_done("index")
+        self.assertFalse(rfceditor.full_sync_due("index"))
+        self.assertTrue(rfceditor.full_sync_due("queue"))
+
+        with override_settings(RFC_EDITOR_FULL_SYNC_INTERVAL=0):
+            self.assertTrue(rfceditor.full_sync_due("index"))
+
     def test_rfc_queue(self):
         draft = WgDraftFactory(states=[('draft-iesg','ann')])
 
@@ -1,6 +1,4 @@
 import datetime
-import subprocess
-import os
 import json
 
 from django.http import HttpResponse, HttpResponseForbidden, HttpResponseRedirect, Http404
@@ -13,11 +11,10 @@ from django.views.decorators.csrf import csrf_exempt
 from ietf.doc.models import DeletedEvent, StateDocEvent, DocEvent
 from ietf.ietfauth.utils import role_required, has_role
 from ietf.sync.discrepancies import find_discrepancies
+from ietf.sync.jobs import queue_sync_job
 from ietf.utils.serialize import object_as_shallow_dict
 from ietf.utils.log import log
 
-SYNC_BIN_PATH = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../bin"))
-
 #@role_required('Secretariat', 'IANA', 'RFC Editor')
 def discrepancies(request):
     sections = find_discrepancies()
@@ -72,30 +69,13 @@ def notify(request, org, notification):
         raise Http404
 
     if request.method == "POST":
-        def runscript(name):
-            cmd = ["python", os.path.join(SYNC_BIN_PATH, name)]
-            cmdstring = " ".join(cmd)
-            p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            out, err = p.communicate()
-            if p.returncode:
-                log("Subprocess error %s when running '%s': %s %s" % (p.returncode, cmd, err, out))
-                raise subprocess.CalledProcessError(p.returncode, cmdstring, "\n".join([err, out]))
-
-        log("Running sync script from notify view POST")
-
-        if notification == "protocols":
-            runscript("iana-protocols-updates")
-
-        if notification == "changes":
-            runscript("iana-changes-updates")
-
-        if notification == "queue":
-            runscript("rfc-editor-queue-updates")
-
-        if notification == "index":
-            runscript("rfc-editor-index-updates")
+        # the sync itself is run by the run_sync_jobs worker
+        if queue_sync_job(notification):
+            log("Queued %s sync job from notify view POST" % notification)
+        else:
+            log("%s sync job from notify view POST already pending" % notification)
 
-        return HttpResponse("OK", content_type="text/plain; charset=%s"%settings.DEFAULT_CHARSET)
+        return HttpResponse("OK", status=202, content_type="text/plain; charset=%s"%settings.DEFAULT_CHARSET)
 
     return render(request, 'sync/notify.html',
                   dict(org=known_orgs[org],
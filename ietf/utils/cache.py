@@ -0,0 +1,32 @@
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import uuid
+
+import debug                            # pyflakes:ignore
+
+# Cached data derived from database tables is keyed by a generation,
+# which is replaced whenever the tables change, so that all of it is
+# invalidated at once without having to find the entries.  Generations
+# are random tokens rather than counters: with a counter, concurrent
+# increments on a file based cache can be lost, and a counter which is
+# culled from the cache starts over, and brings back entries cached
+# under the old numbers.  A token is never reused.
+
+def get_generation(cache, key):
+    """Return the current generation stored in cache under key, starting
+    a new one if there is none."""
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not cache.add(key, generation, None):
+            generation = cache.get(key) or generation
+    return generation
+
+def new_generation(cache, key):
+    """Start a new generation under key, called when the data which the
+    cached entries of the old generation were derived from changes."""
+    cache.set(key, uuid.uuid4().hex, None)
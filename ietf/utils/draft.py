@@ -92,6 +92,58 @@ month_names = [ 'january', 'february', 'march', 'april', 'may', 'june', 'july',
 month_names_abbrev3 = [ n[:3] for n in month_names ]
 month_names_abbrev4 = [ n[:4] for n in month_names ]
 
+# Page header and footer patterns used by Draft._stripheaders(), compiled
+# once here as they are tried against every line of every draft
+page_footer_re = re.compile(r"\[?page [0-9ivx]+\]?[ \t\f]*$", re.I)
+page_header_re = re.compile(
+    r"(?:^ *Internet.Draft.+  .+[12][0-9][0-9][0-9] *$)"
+    r"|(?:^ *Draft.+[12][0-9][0-9][0-9] *$)"
+    r"|(?:^RFC[ -]?[0-9]+.*(  +)[12][0-9][0-9][0-9]$)", re.I)
+draftname_footer_re = re.compile(r"^draft-[-a-z0-9_.]+.*[0-9][0-9][0-9][0-9]$", re.I)
+date_header_re = re.compile(r".{58,}(Jan|Feb|Mar|March|Apr|April|May|Jun|June|Jul|July|Aug|Sep|Oct|Nov|Dec) (19[89][0-9]|20[0-9][0-9]) *$", re.I)
+draftname_header_re = re.compile(r"^ *draft-[-a-z0-9_.]+ *$", re.I)
+
+# Author and company line patterns used by Draft.extract_authors()
+author_aux = {
+    "honor" : r"(?:[A-Z]\.|Dr\.?|Dr\.-Ing\.|Prof(?:\.?|essor)|Sir|Lady|Dame|Sri)",
+    "prefix": r"([Dd]e|Hadi|van|van de|van der|Ver|von|[Ee]l)",
+    "suffix": r"(jr.?|Jr.?|II|2nd|III|3rd|IV|4th)",
+    "first" : r"([A-Z][-A-Za-z'`~]*)(( ?\([A-Z][-A-Za-z'`~]*\))?(\.?[- ]{1,2}[A-Za-z'`~]+)*)",
+    "last"  : r"([-A-Za-z'`~]{2,})",
+    "months": r"(January|February|March|April|May|June|July|August|September|October|November|December)",
+    "mabbr" : r"(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\.?",
+    }
+authcompanyformats = [
+    re.compile(r" {6}(?P<author>(%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?), (?P<company>[^.]+\.?)$" % author_aux),
+    re.compile(r" {6}(?P<author>(%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?) *\((?P<company>[^.]+\.?)\)$" % author_aux),
+]
+authformats = [
+    re.compile(r" {6}((%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?)(, ([^.]+\.?|\([^.]+\.?|\)))?,?$" % author_aux),
+    re.compile(r" {6}(((%(prefix)s )?%(last)s)( %(suffix)s)?, %(first)s)?$" % author_aux),
+    re.compile(r" {6}(%(last)s)$" % author_aux),
+]
+multiauthformats = [
+    (
+        re.compile(r" {6}(%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)(, ?%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)+$" % author_aux),
+        re.compile(r"(%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)" % author_aux)
+    ),
+]
+editorformats = [
+    re.compile(r"(?:, | )([Ee]d\.?|\([Ee]d\.?\)|[Ee]ditor)$"),
+]
+companyformats = [
+    re.compile(r" {6}(([A-Za-z'][-A-Za-z0-9.& ']+)(,? ?(Inc|Ltd|AB|S\.A)\.?))$"),
+    re.compile(r" {6}(([A-Za-z'][-A-Za-z0-9.& ']+)(/([A-Za-z'][-A-Za-z0-9.& ']+))+)$"),
+    re.compile(r" {6}([a-z0-9.-]+)$"),
+    re.compile(r" {6}(([A-Za-z'][-A-Za-z0-9.&']+)( [A-Za-z'][-A-Za-z0-9.&']+)*)$"),
+    re.compile(r" {6}(([A-Za-z'][-A-Za-z0-9.']+)( & [A-Za-z'][-A-Za-z0-9.']+)*)$"),
+    re.compile(r" {6}\((.+)\)$"),
+    re.compile(r" {6}(\w+\s?\(.+\))$"),
+]
+
+dateformat = re.compile(r"(((%(months)s|%(mabbr)s) \d+, |\d+ (%(months)s|%(mabbr)s),? |\d+/\d+/)\d\d\d\d|\d\d\d\d-\d\d-\d\d)$" % author_aux)
+address_section = re.compile(r"^ *([0-9]+\.)? *(Author|Editor)('s|s'|s|\(s\)) (Address|Addresses|Information)")
+
 # ----------------------------------------------------------------------
 # Functions
 # ----------------------------------------------------------------------
@@ -250,36 +302,31 @@ class Draft():
         for line in self.rawlines:
             linecount += 1
             line = line.rstrip()
-            if re.search(r"\[?page [0-9ivx]+\]?[ \t\f]*$", line, re.I):
-                pages, page, newpage = endpage(pages, page, newpage, line)
-                continue
-            if re.search(r"\f", line, re.I):
-                pages, page, newpage = begpage(pages, page, newpage)
-                continue
-            if re.search(r"^ *Internet.Draft.+  .+[12][0-9][0-9][0-9] *$", line, re.I):
-                pages, page, newpage = begpage(pages, page, newpage, line)
-                continue
-    #        if re.search("^ *Internet.Draft  +", line, re.I):
-    #            newpage = True
-    #            continue
-            if re.search(r"^ *Draft.+[12][0-9][0-9][0-9] *$", line, re.I):
-                pages, page, newpage = begpage(pages, page, newpage, line)
-                continue
-            if re.search(r"^RFC[ -]?[0-9]+.*(  +)[12][0-9][0-9][0-9]$", line, re.I):
-                pages, page, newpage = begpage(pages, page, newpage, line)
-                continue
-            if re.search(r"^draft-[-a-z0-9_.]+.*[0-9][0-9][0-9][0-9]$", line, re.I):
-                pages, page, newpage = endpage(pages, page, newpage, line)
-                continue
-            if linecount > 15 and re.search(r".{58,}(Jan|Feb|Mar|March|Apr|April|May|Jun|June|Jul|July|Aug|Sep|Oct|Nov|Dec) (19[89][0-9]|20[0-9][0-9]) *$", line, re.I):
-                pages, page, newpage = begpage(pages, page, newpage, line)
-                continue
-            if newpage and re.search(r"^ *draft-[-a-z0-9_.]+ *$", line, re.I):
-                pages, page, newpage = begpage(pages, page, newpage, line)
-                continue
-            if re.search(r"^[^ \t]+", line):
-                sentence = True
-            if re.search(r"[^ \t]", line):
+            # Page header and footer lines.  As the line has been
+            # rstripped above, it's either empty or ends in a
+            # non-blank character, which lets us use plain string
+            # tests instead of regexes for the remaining checks.
+            if line:
+                if page_footer_re.search(line):
+                    pages, page, newpage = endpage(pages, page, newpage, line)
+                    continue
+                if "\f" in line:
+                    pages, page, newpage = begpage(pages, page, newpage)
+                    continue
+                if page_header_re.search(line):
+                    pages, page, newpage = begpage(pages, page, newpage, line)
+                    continue
+                if draftname_footer_re.search(line):
+                    pages, page, newpage = endpage(pages, page, newpage, line)
+                    continue
+                if linecount > 15 and date_header_re.search(line):
+                    pages, page, newpage = begpage(pages, page, newpage, line)
+                    continue
+                if newpage and draftname_header_re.search(line):
+                    pages, page, newpage = begpage(pages, page, newpage, line)
+                    continue
+                if line[0] not in " \t":
+                    sentence = True
                 if newpage:
                     # 36 is a somewhat arbitrary count for a 'short' line
                     shortthis = len(line.strip()) < 36 # 36 is a somewhat arbitrary count for a 'short' line
@@ -292,9 +339,9 @@ class Draft():
                 sentence = False
                 newpage = False
                 shortprev = len(line.strip()) < 36 # 36 is a somewhat arbitrary count for a 'short' line
-            if re.search("[.:]$", line):
+            if line.endswith((".", ":")):
                 sentence = True
-            if re.search("^[ \t]*$", line):
+            if not line:
                 blankcount += 1
                 page += [ line ]
                 continue
@@ -515,47 +562,6 @@ class Draft():
         """Extract author information from draft text.
 
         """
-        aux = {
-            "honor" : r"(?:[A-Z]\.|Dr\.?|Dr\.-Ing\.|Prof(?:\.?|essor)|Sir|Lady|Dame|Sri)",
-            "prefix": r"([Dd]e|Hadi|van|van de|van der|Ver|von|[Ee]l)",
-            "suffix": r"(jr.?|Jr.?|II|2nd|III|3rd|IV|4th)",
-            "first" : r"([A-Z][-A-Za-z'`~]*)(( ?\([A-Z][-A-Za-z'`~]*\))?(\.?[- ]{1,2}[A-Za-z'`~]+)*)",
-            "last"  : r"([-A-Za-z'`~]{2,})",
-            "months": r"(January|February|March|April|May|June|July|August|September|October|November|December)",
-            "mabbr" : r"(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\.?",
-            }
-        authcompanyformats = [
-            r" {6}(?P<author>(%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?), (?P<company>[^.]+\.?)$" % aux,
-            r" {6}(?P<author>(%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?) *\((?P<company>[^.]+\.?)\)$" % aux,
-        ]
-        authformats = [
-            r" {6}((%(first)s[ \.]{1,3})+((%(prefix)s )?%(last)s)( %(suffix)s)?)(, ([^.]+\.?|\([^.]+\.?|\)))?,?$" % aux,
-            r" {6}(((%(prefix)s )?%(last)s)( %(suffix)s)?, %(first)s)?$" % aux,
-            r" {6}(%(last)s)$" % aux,
-        ]
-        multiauthformats = [
-            (
-                r" {6}(%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)(, ?%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)+$" % aux,
-                r"(%(first)s[ \.]{1,3}((%(prefix)s )?%(last)s)( %(suffix)s)?)" % aux
-            ),
-        ]
-        editorformats = [
-            r"(?:, | )([Ee]d\.?|\([Ee]d\.?\)|[Ee]ditor)$",
-        ]
-        companyformats = [
-            r" {6}(([A-Za-z'][-A-Za-z0-9.& ']+)(,? ?(Inc|Ltd|AB|S\.A)\.?))$",
-            r" {6}(([A-Za-z'][-A-Za-z0-9.& ']+)(/([A-Za-z'][-A-Za-z0-9.& ']+))+)$",
-            r" {6}([a-z0-9.-]+)$",
-            r" {6}(([A-Za-z'][-A-Za-z0-9.&']+)( [A-Za-z'][-A-Za-z0-9.&']+)*)$",
-            r" {6}(([A-Za-z'][-A-Za-z0-9.']+)( & [A-Za-z'][-A-Za-z0-9.']+)*)$",
-            r" {6}\((.+)\)$",
-            r" {6}(\w+\s?\(.+\))$",
-        ]
-
-        dateformat = r"(((%(months)s|%(mabbr)s) \d+, |\d+ (%(months)s|%(mabbr)s),? |\d+/\d+/)\d\d\d\d|\d\d\d\d-\d\d-\d\d)$" % aux
-
-        address_section = r"^ *([0-9]+\.)? *(Author|Editor)('s|s'|s|\(s\)) (Address|Addresses|Information)"
-
         ignore = [
             "Standards Track", "Current Practice", "Internet Draft", "Working Group",
             "Expiration Date", 
@@ -614,18 +620,18 @@ class Draft():
                 if (leading_space > 5 and abs(leading_space - trailing_space) < 5):
                     _debug("Breaking for centered line")
                     break
-                if re.search(dateformat, line):
+                if dateformat.search(line):
                     if authors:
                         _debug("Breaking for dateformat after author name")
                 for editorformat in editorformats:
-                    if re.search(editorformat, line):
-                        line = re.sub(editorformat, "", line)
+                    if editorformat.search(line):
+                        line = editorformat.sub("", line)
                         break
                 for lineformat, authformat in multiauthformats:
-                    match = re.search(lineformat, line)
+                    match = lineformat.search(line)
                     if match:
-                        _debug("a. Multiauth format: '%s'" % lineformat)
-                        author_list = re.findall(authformat, line)
+                        _debug("a. Multiauth format: '%s'" % lineformat.pattern)
+                        author_list = authformat.findall(line)
                         authors += [ a[0] for a in author_list ]
                         companies += [ None for a in author_list ]
                         author_on_line = True
@@ -636,9 +642,9 @@ class Draft():
                         break
                 if not author_on_line:
                     for lineformat in authcompanyformats:
-                        match = re.search(lineformat, line)
+                        match = lineformat.search(line)
                         if match:
-                            _debug("b. Line format: '%s'" % lineformat)
+                            _debug("b. Line format: '%s'" % lineformat.pattern)
                             maybe_company = match.group("company").strip(" ,.")
                             # is the putative company name just a partial name, i.e., a part
                             # that commonly occurs after a comma as part of a company name,
@@ -657,9 +663,9 @@ class Draft():
                                 break
                 if not author_on_line:
                     for authformat in authformats:
-                        match = re.search(authformat, line)
+                        match = authformat.search(line)
                         if match:
-                            _debug("c. Auth format: '%s'" % authformat)
+                            _debug("c. Auth format: '%s'" % authformat.pattern)
                             author = match.group(1)
                             authors += [ author ]
                             companies += [ None ]
@@ -670,9 +676,9 @@ class Draft():
                             break
                 if not author_on_line:
                     for authformat in companyformats:
-                        match = re.search(authformat, line)
+                        match = authformat.search(line)
                         if match:
-                            _debug("d. Company format: '%s'" % authformat)
+                            _debug("d. Company format: '%s'" % authformat.pattern)
                             company = match.group(1)
                             authors += [ "" ]
                             companies += [ company ]
@@ -717,7 +723,7 @@ class Draft():
         address_section_pos = last_line//2
         for i in range(last_line//2,last_line):
             line = self.lines[i]
-            if re.search(address_section, line):
+            if address_section.search(line):
                 address_section_pos = i
                 break
 
@@ -733,7 +739,7 @@ class Draft():
                 company_or_author = None
             if author in [ None, '', ]:
                 continue
-            suffix_match = re.search(" %(suffix)s$" % aux, author)
+            suffix_match = re.search(" %(suffix)s$" % author_aux, author)
             if suffix_match:
                 suffix = suffix_match.group(1)
                 author = author[:-len(suffix)].strip()
@@ -759,7 +765,7 @@ class Draft():
                         first = first.replace(".", ". ").strip()
             first = first.strip()
             last = last.strip()
-            prefix_match = re.search(" %(prefix)s$" % aux, first)
+            prefix_match = re.search(" %(prefix)s$" % author_aux, first)
             if prefix_match:
                 prefix = prefix_match.group(1)
                 first = first[:-len(prefix)].strip()
@@ -772,8 +778,17 @@ class Draft():
                     _debug("Author: "+author)
 
                     # Pattern for full author information search, based on first page author name:
-                    authpat = make_authpat(aux['honor'], left, right, aux['suffix'])
+                    authpat = make_authpat(author_aux['honor'], left, right, author_aux['suffix'])
                     _debug("Authpat: " + authpat)
+                    try:
+                        # Compiled once per name, as it's tried against
+                        # every line between here and the address section
+                        authre = re.compile(authpat)
+                        authcolre = re.compile(authpat+r"(  and  |, |$)")
+                    except AssertionError:
+                        sys.stderr.write("filename: "+self.filename+"\n")
+                        sys.stderr.write("authpat: "+authpat+"\n")
+                        raise
                     start = 0
                     col = None
                     # Find start of author info for this author (if any).
@@ -784,7 +799,7 @@ class Draft():
                         forms = [ line ] + [ line.replace(short, longform[short]) for short in longform if short in line ]
                         for form in forms:
                             try:
-                                if re.search(authpat, form.strip()) and not j in found_pos:
+                                if authre.search(form.strip()) and not j in found_pos:
                                     _debug( "Match")
 
                                     start = j
@@ -796,7 +811,7 @@ class Draft():
                                     # Find which column:
                                     # _debug( "Col range:" + str(range(len(columns))))
 
-                                    cols = [ c for c in range(len(columns)) if re.search(authpat+r"(  and  |, |$)", columns[c].strip()) ]
+                                    cols = [ c for c in range(len(columns)) if authcolre.search(columns[c].strip()) ]
                                     if cols:
                                         col = cols[0]
                                         if not (start, col) in found_pos:
@@ -812,7 +827,7 @@ class Draft():
                                                 end = beg + len("".join(columns[col:col+2]))
                                                 _debug( "End2:  %d '%s'" % (end, "".join(columns[col:col+2])))
                                             _debug( "Cut:   '%s'" % form[beg:end])
-                                            author_match = re.search(authpat, columns[col].strip()).group(1)
+                                            author_match = authre.search(columns[col].strip()).group(1)
                                             _debug( "AuthMatch: '%s'" % (author_match,))
                                             if re.search(r'\(.*\)$', author_match.strip()):
                                                 author_match = author_match.rsplit('(',1)[0].strip()
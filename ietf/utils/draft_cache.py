@@ -0,0 +1,90 @@
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+import debug                            # pyflakes:ignore
+
+from ietf.utils import draft
+
+
+class CachedDraft(object):
+    """Drop-in replacement for ietf.utils.draft.Draft which keeps the
+    results of the expensive parsing methods in the 'drafts' cache.
+
+    Entries are keyed by a hash of the draft text and the parser
+    version, so the same text is only parsed once, no matter how many
+    times or from where it is looked at.  The results of the methods in
+    name_dependent_methods also depend on the draft name, which may come
+    from the source, so they are kept under a key which includes the
+    source as well.  The underlying Draft object is only constructed
+    when a value is missing from the cache, and each value is only
+    computed when it is asked for."""
+
+    cached_methods = (
+        "get_abstract",
+        "get_author_list",
+        "get_authors",
+        "get_authors_with_firm",
+        "get_creation_date",
+        "get_formal_languages",
+        "get_pagecount",
+        "get_refs",
+        "get_status",
+        "get_title",
+        "get_wordcount",
+    )
+
+    # get_refs() leaves out references to the draft itself
+    name_dependent_methods = (
+        "get_refs",
+    )
+
+    def __init__(self, text, source, name_from_source=False):
+        self.rawtext = text
+        self.source = source
+        self.name_from_source = name_from_source
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        self.cache_key = "draft:%s:%s" % (draft.version, digest)
+        source_digest = hashlib.sha256(("%s:%s" % (source, name_from_source)).encode('utf-8')).hexdigest()
+        self.name_cache_key = "draft:%s:%s:%s" % (draft.version, digest, source_digest)
+        self._draft = None
+        self._meta = {}
+
+    @property
+    def draft(self):
+        if self._draft is None:
+            self._draft = draft.Draft(self.rawtext, self.source, self.name_from_source)
+        return self._draft
+
+    def _get_cached(self, method):
+        cache = caches['drafts']
+        key = self.name_cache_key if method in self.name_dependent_methods else self.cache_key
+        if key not in self._meta:
+            try:
+                self._meta[key] = cache.get(key) or {}
+            except EOFError:
+                self._meta[key] = {}
+        meta = self._meta[key]
+        if method not in meta:
+            meta[method] = getattr(self.draft, method)()
+            cache.set(key, meta, settings.DRAFT_CACHE_TIME)
+        return meta[method]
+
+    def __getattr__(self, name):
+        # our own attributes are only missing when __init__ hasn't run,
+        # for instance while unpickling, and looking them up on self.draft
+        # would recurse forever
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self.cached_methods:
+            return lambda: self._get_cached(name)
+        # anything else, such as .filename or .errors, comes straight
+        # from the parsed draft
+        return getattr(self.draft, name)
@@ -10,11 +10,14 @@ from django.core.management.base import BaseCommand
 import debug                            # pyflakes:ignore
 
 from ietf.community.models import SearchRule
-from ietf.community.utils import reset_name_contains_index_for_rule
+from ietf.community.utils import rebuild_name_contains_indexes
 
 class Command(BaseCommand):
     help = ("""
         Update the index tables for stored regex-based document search rules.
+
+        All the rules are evaluated against all document aliases in a single
+        pass, and the time this took is reported at the end.
         """)
 
     def add_arguments(self, parser):
@@ -23,11 +26,10 @@ class Command(BaseCommand):
          
 
     def handle(self, *args, **options):
-        for rule in SearchRule.objects.filter(rule_type='name_contains'):
-            count1 = rule.name_contains_index.count()
-            if not options['dry_run']:
-                reset_name_contains_index_for_rule(rule)
-            count2 = rule.name_contains_index.count()
+        rules = SearchRule.objects.filter(rule_type='name_contains').select_related('group', 'person', 'community_list__group', 'community_list__user')
+        metrics = rebuild_name_contains_indexes(rules, dry_run=options['dry_run'])
+        for rule in rules:
+            count1, count2 = metrics['sizes'][rule.pk]
             if int(options['verbosity']) > 1:
                 group = rule.group or rule.community_list.group
                 person  = rule.person
@@ -38,4 +40,7 @@ class Command(BaseCommand):
                         pass
                 name = ((group and group.acronym) or (person and person.email_address())) or '?'
                 self.stdout.write("%-24s %-24s  %3d -->%3d\n" % (name[:24], rule.text[:24], count1, count2 ))
+        if int(options['verbosity']) > 0:
+            self.stdout.write("Evaluated %(rules)d rules against %(aliases)d aliases in %(match_time).2f s, "
+                "%(added)d index entries added, %(removed)d removed, %(total_time).2f s in total\n" % metrics)
             
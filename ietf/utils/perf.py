@@ -0,0 +1,270 @@
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+"""
+Per-request performance instrumentation, see
+ietf.middleware.performance_instrumentation_middleware.
+
+The measurements of each request (wall time, number and time of database
+queries, cache hits and misses, template render time) are aggregated per
+view in this process, and periodically logged as a summary and written
+in the Prometheus text exposition format to PERF_METRICS_DIR, where for
+instance the node_exporter textfile collector can pick them up.
+"""
+
+import bisect
+import errno
+import io
+import os
+import re
+import threading
+import time
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+import debug                            # pyflakes:ignore
+
+from ietf.utils.log import log
+
+
+TIME_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+class Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def prometheus_lines(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf", ), self.counts):
+            cumulative += count
+            lines.append('%s_bucket{%s,le="%s"} %s' % (name, labels, bound, cumulative))
+        lines.append('%s_sum{%s} %s' % (name, labels, self.sum))
+        lines.append('%s_count{%s} %s' % (name, labels, cumulative))
+        return lines
+
+class ViewStats(object):
+    def __init__(self):
+        self.wall_time = Histogram(TIME_BUCKETS)
+        self.db_time = Histogram(TIME_BUCKETS)
+        self.db_queries = Histogram(COUNT_BUCKETS)
+        self.template_time = Histogram(TIME_BUCKETS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.over_budget = 0
+
+class RequestStats(object):
+    "The measurements of the current request"
+    def __init__(self):
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+_stats = defaultdict(ViewStats)
+_stats_lock = threading.Lock()
+_last_export = time.time()
+
+# the RequestStats of the request being handled by this thread, if any
+_local = threading.local()
+
+def current_request_stats():
+    return getattr(_local, "stats", None)
+
+def start_request():
+    _local.stats = RequestStats()
+    return _local.stats
+
+def end_request():
+    _local.stats = None
+
+def record_request(view_name, wall_time, db_queries, db_time, request_stats):
+    """Add the measurements of a request to the aggregated statistics,
+    and log the requests which go over the query or time budget."""
+    over_budget = ((settings.PERF_QUERY_BUDGET and db_queries > settings.PERF_QUERY_BUDGET)
+                   or (settings.PERF_TIME_BUDGET and wall_time > settings.PERF_TIME_BUDGET))
+    with _stats_lock:
+        s = _stats[view_name]
+        s.wall_time.observe(wall_time)
+        s.db_time.observe(db_time)
+        s.db_queries.observe(db_queries)
+        s.template_time.observe(request_stats.template_time)
+        s.cache_hits += request_stats.cache_hits
+        s.cache_misses += request_stats.cache_misses
+        if over_budget:
+            s.over_budget += 1
+    if over_budget:
+        log("Over budget: %s took %.3f s with %s queries (%.3f s in the database, %.3f s rendering templates)" % (
+            view_name, wall_time, db_queries, db_time, request_stats.template_time))
+    maybe_export()
+
+def maybe_export():
+    global _last_export
+    now = time.time()
+    if now - _last_export < settings.PERF_EXPORT_INTERVAL:
+        return
+    with _stats_lock:
+        if now - _last_export < settings.PERF_EXPORT_INTERVAL:
+            return
+        _last_export = now
+        summary = summary_lines()
+        metrics = prometheus_text()
+    for line in summary:
+        log(line)
+    if settings.PERF_METRICS_DIR:
+        write_metrics_file(metrics)
+
+def summary_lines():
+    lines = []
+    for view_name, s in sorted(_stats.items(), key=lambda i: -i[1].wall_time.sum):
+        count = sum(s.wall_time.counts)
+        if not count:
+            continue
+        lines.append("Performance: %s: %s requests, avg %.3f s, avg %.1f queries (%.3f s), avg %.3f s templates, cache %s hits/%s misses, %s over budget" % (
+            view_name, count, s.wall_time.sum / count, float(s.db_queries.sum) / count, s.db_time.sum / count,
+            s.template_time.sum / count, s.cache_hits, s.cache_misses, s.over_budget))
+    return lines
+
+def prometheus_text():
+    "The aggregated statistics in the Prometheus text exposition format"
+    lines = []
+    metrics = [
+        ("datatracker_request_seconds", "histogram", "Request wall time", lambda s: s.wall_time),
+        ("datatracker_request_db_seconds", "histogram", "Time spent in database queries per request", lambda s: s.db_time),
+        ("datatracker_request_db_queries", "histogram", "Database queries per request", lambda s: s.db_queries),
+        ("datatracker_request_template_seconds", "histogram", "Template render time per request", lambda s: s.template_time),
+        ("datatracker_cache_hits_total", "counter", "Cache hits", lambda s: s.cache_hits),
+        ("datatracker_cache_misses_total", "counter", "Cache misses", lambda s: s.cache_misses),
+        ("datatracker_requests_over_budget_total", "counter", "Requests over the query or time budget", lambda s: s.over_budget),
+    ]
+    pid = os.getpid()
+    for name, kind, help, get in metrics:
+        lines.append("# HELP %s %s" % (name, help))
+        lines.append("# TYPE %s %s" % (name, kind))
+        for view_name, s in sorted(_stats.items()):
+            labels = 'view="%s",pid="%s"' % (view_name.replace('\\', '\\\\').replace('"', '\\"'), pid)
+            value = get(s)
+            if kind == "histogram":
+                lines.extend(value.prometheus_lines(name, labels))
+            else:
+                lines.append("%s{%s} %s" % (name, labels, value))
+    return "\n".join(lines) + "\n"
+
+metrics_file_re = re.compile(r"^datatracker_(?P<pid>\d+)\.prom$")
+
+def pid_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno != errno.ESRCH
+    return True
+
+def write_metrics_file(text):
+    if not os.path.exists(settings.PERF_METRICS_DIR):
+        os.makedirs(settings.PERF_METRICS_DIR)
+    path = os.path.join(settings.PERF_METRICS_DIR, "datatracker_%s.prom" % os.getpid())
+    # write and rename, so a collector never sees a partial file
+    with io.open(path + ".tmp", "w") as file:
+        file.write(text)
+    os.rename(path + ".tmp", path)
+    remove_stale_metrics_files()
+
+def remove_stale_metrics_files():
+    "Remove the metrics files of worker processes which have gone away"
+    for name in os.listdir(settings.PERF_METRICS_DIR):
+        m = metrics_file_re.match(name)
+        if m and not pid_exists(int(m.group("pid"))):
+            try:
+                os.unlink(os.path.join(settings.PERF_METRICS_DIR, name))
+            except OSError:
+                pass                    # removed by another worker
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+# --- Hooks for the measurements which Django has no signals for ---
+
+# (class, name, original) of the methods replaced by install_hooks(), the
+# original is None if the class inherited the method
+_originals = []
+
+def replace_method(cls, name, method):
+    _originals.append((cls, name, cls.__dict__.get(name)))
+    setattr(cls, name, method)
+
+def install_hooks():
+    """Wrap the template render and cache get methods, so that they add to
+    the measurements of the current request.  Outside of an instrumented
+    request, the wrappers only cost a thread-local lookup."""
+    if _originals:
+        return
+
+    from django.template.base import Template
+    original_render = Template.render
+    def render(self, context):
+        stats = current_request_stats()
+        if stats is None:
+            return original_render(self, context)
+        # only the outermost template is timed, the included ones are part of it
+        stats.template_depth += 1
+        start = time.time()
+        try:
+            return original_render(self, context)
+        finally:
+            stats.template_depth -= 1
+            if stats.template_depth == 0:
+                stats.template_time += time.time() - start
+    replace_method(Template, "render", render)
+
+    for backend in set(c['BACKEND'] for c in settings.CACHES.values()):
+        wrap_cache_backend(import_string(backend))
+
+_missing = object()
+
+def wrap_cache_backend(cls):
+    original_get = cls.get
+    def get(self, key, default=None, version=None):
+        value = original_get(self, key, _missing, version=version)
+        stats = current_request_stats()
+        if stats is not None:
+            if value is _missing:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is _missing else value
+    replace_method(cls, "get", get)
+
+    original_get_many = cls.get_many
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = original_get_many(self, keys, version=version)
+        stats = current_request_stats()
+        if stats is not None:
+            stats.cache_hits += len(values)
+            stats.cache_misses += len(keys) - len(values)
+        return values
+    replace_method(cls, "get_many", get_many)
+
+def uninstall_hooks():
+    "Restore the methods replaced by install_hooks()"
+    while _originals:
+        cls, name, original = _originals.pop()
+        if original is None:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, original)
@@ -6,7 +6,15 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 # Simplified interface to os.popen3()
 
-def pipe(cmd, str=None):
+import os
+import signal
+import threading
+
+def pipe(cmd, str=None, timeout=None):
+    """Run cmd in a shell, optionally feeding it str, and return the exit
+    code, standard output and standard error.  If a timeout in seconds is
+    given, the command and anything it has started are killed if it runs
+    for longer than that, and the standard error says so."""
     from subprocess import Popen, PIPE
     bufsize = 4096
     MAX = 65536*16
@@ -14,23 +22,47 @@ def pipe(cmd, str=None):
     if str and len(str) > 4096:                 # XXX: Hardcoded Linux 2.4, 2.6 pipe buffer size
         bufsize = len(str)
 
-    pipe = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, bufsize=bufsize, shell=True)
-    if not str is None:
-        pipe.stdin.write(str)
-        pipe.stdin.close()
-
-    out = b""
-    err = b""
-    while True:
-        str = pipe.stdout.read()
-        if str:
-            out += str
-        code = pipe.poll()
-        if code != None:
-            err = pipe.stderr.read()
-            break
-        if len(out) >= MAX:
-            err = "Output exceeds %s bytes and has been truncated" % MAX
-            break
+    # with a timeout, run the command in its own process group, so that
+    # the tools started by the shell can be killed along with it
+    pipe = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, bufsize=bufsize, shell=True,
+                 preexec_fn=os.setsid if timeout else None)
+
+    timed_out = []
+    timer = None
+    if timeout:
+        def kill():
+            timed_out.append(True)
+            try:
+                os.killpg(pipe.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        timer = threading.Timer(timeout, kill)
+        timer.daemon = True
+        timer.start()
+
+    try:
+        if not str is None:
+            pipe.stdin.write(str)
+            pipe.stdin.close()
+
+        out = b""
+        err = b""
+        while True:
+            str = pipe.stdout.read()
+            if str:
+                out += str
+            code = pipe.poll()
+            if code != None:
+                err = pipe.stderr.read()
+                break
+            if len(out) >= MAX:
+                err = "Output exceeds %s bytes and has been truncated" % MAX
+                break
+    finally:
+        if timer:
+            timer.cancel()
+
+    if timed_out:
+        err += ("Timed out after %s seconds and was killed\n" % timeout).encode('utf-8')
 
     return (code, out, err)
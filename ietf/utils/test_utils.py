@@ -56,6 +56,7 @@ from django.utils.text import slugify
 import debug                            # pyflakes:ignore
 
 from ietf.utils.mail import get_payload
+from ietf.utils.textfile import clear_text_cache
 
 real_database_name = settings.DATABASES["default"]["NAME"]
 
@@ -109,6 +110,15 @@ class TestCase(django.test.TestCase):
 
     parser = html5lib.HTMLParser(strict=True)
 
+    def _pre_setup(self):
+        super(TestCase, self)._pre_setup()
+        # tests write files with the same names over and over, don't let
+        # them see the text another test left in the cache
+        clear_text_cache()
+        # nor the search rules of another test, which have been rolled back
+        from ietf.community.utils import clear_search_rule_index
+        clear_search_rule_index()
+
     def assertValidHTML(self, data):
         try:
             self.parser.parse(data)
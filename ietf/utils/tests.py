@@ -4,10 +4,14 @@
 
 from __future__ import absolute_import, print_function, unicode_literals
 
+import copy
 import io
 import os.path
+import pickle
 import shutil
 import six
+import subprocess
+import time
 import types
 if six.PY3:
     from typing import Dict, List       # pyflakes:ignore
@@ -25,11 +29,14 @@ from tempfile import mkdtemp
 from django.apps import apps
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
 from django.core.management import call_command
 from django.template import Context
 from django.template import Template    # pyflakes:ignore
 from django.template.defaulttags import URLNode
 from django.template.loader import get_template
+from django.test import override_settings
 from django.templatetags.static import StaticNode
 from django.urls import reverse as urlreverse
 from django.utils.encoding import force_text
@@ -41,11 +48,15 @@ from ietf.group.models import Group
 from ietf.person.name import name_parts, unidecode_name
 from ietf.submit.tests import submission_file
 from ietf.utils.bower_storage import BowerStorageFinder
+from ietf.utils.cache import get_generation, new_generation
 from ietf.utils.draft import Draft, getmeta
+from ietf.utils import perf
+from ietf.utils.draft_cache import CachedDraft
 from ietf.utils.log import unreachable, assertion
 from ietf.utils.mail import send_mail_preformatted, send_mail_text, send_mail_mime, outbox, get_payload
 from ietf.utils.test_runner import get_template_paths, set_coverage_checking
 from ietf.utils.test_utils import TestCase
+from ietf.utils.textfile import read_text, clear_text_cache
 
 skip_wiki_glue_testing = False
 skip_message = ""
@@ -439,6 +450,136 @@ class DraftTests(TestCase):
         self.assertEqual(getmeta(filename)['docdeststatus'],'Informational')
         shutil.rmtree(tempdir)
 
+    @override_settings(CACHES={
+        'default': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+        'drafts': { 'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', },
+        'ipr': { 'BACKEND': 'django.core.cache.backends.dummy.DummyCache', },
+    })
+    def test_cached_draft(self):
+        cached = CachedDraft(self.draft.rawtext, self.draft.source)
+        self.assertEqual(cached.get_authors(), self.draft.get_authors())
+        self.assertEqual(cached.get_refs(), self.draft.get_refs())
+        self.assertEqual(cached.filename, self.draft.filename)
+
+        # a second instance with the same text is served from the cache,
+        # without parsing the text again
+        cached = CachedDraft(self.draft.rawtext, self.draft.source)
+        self.assertEqual(cached.get_authors(), self.draft.get_authors())
+        self.assertEqual(cached.get_refs(), self.draft.get_refs())
+        self.assertIsNone(cached._draft)
+
+        # but not for fields which haven't been asked for before
+        self.assertEqual(cached.get_status(), self.draft.get_status())
+        self.assertIsNotNone(cached._draft)
+
+        # the references depend on the draft name, which may come from
+        # the source, so they are only shared with the same source
+        other = Draft(self.draft.rawtext, 'some-other-source.txt', name_from_source=True)
+        cached = CachedDraft(self.draft.rawtext, 'some-other-source.txt', name_from_source=True)
+        self.assertEqual(cached.get_authors(), self.draft.get_authors())
+        self.assertIsNone(cached._draft)
+        self.assertEqual(cached.get_refs(), other.get_refs())
+        self.assertIsNotNone(cached._draft)
+
+        # copying and pickling doesn't look up private attributes on the draft
+        self.assertEqual(copy.copy(cached).get_authors(), self.draft.get_authors())
+        self.assertEqual(pickle.loads(pickle.dumps(cached)).get_refs(), other.get_refs())
+
+
+class PipeTests(TestCase):
+
+    def test_pipe_timeout(self):
+        start = time.time()
+        code, out, err = pipe("echo started; sleep 10; echo done", timeout=0.5)
+        self.assertLess(time.time() - start, 5)
+        self.assertNotEqual(code, 0)
+        self.assertEqual(out, b"started\n")
+        self.assertIn(b"Timed out after 0.5 seconds", err)
+
+        self.assertEqual(pipe("echo done", timeout=5), (0, b"done\n", b""))
+
+
+class TextFileTests(TestCase):
+
+    def test_read_text(self):
+        tempdir = mkdtemp()
+        filename = os.path.join(tempdir, 'test.txt')
+        with io.open(filename, 'wb') as file:
+            file.write('Fran\u00e7ais\n'.encode('utf-8'))
+        text = read_text(filename)
+        self.assertEqual(text, 'Fran\u00e7ais\n')
+        # the second read is served from the cache
+        self.assertIs(read_text(filename), text)
+        # until the cache is cleared
+        clear_text_cache()
+        self.assertIsNot(read_text(filename), text)
+        self.assertEqual(read_text(filename), text)
+        # but a changed file is read again
+        with io.open(filename, 'wb') as file:
+            file.write('Fran\u00e7ais et Latin-1\n'.encode('latin-1'))
+        self.assertEqual(read_text(filename), 'Fran\u00e7ais et Latin-1\n')
+        os.unlink(filename)
+        self.assertIsNone(read_text(filename))
+        shutil.rmtree(tempdir)
+
+
+class CacheGenerationTests(TestCase):
+    def test_generation(self):
+        cache = LocMemCache('generation-tests', {})
+        first = get_generation(cache, 'generation')
+        self.assertEqual(get_generation(cache, 'generation'), first)
+        new_generation(cache, 'generation')
+        second = get_generation(cache, 'generation')
+        self.assertNotEqual(second, first)
+
+        # a generation which is lost isn't reused
+        cache.delete('generation')
+        self.assertNotIn(get_generation(cache, 'generation'), [ first, second ])
+
+
+class PerformanceInstrumentationTests(TestCase):
+
+    def test_instrumentation(self):
+        tempdir = mkdtemp()
+        perf.reset_stats()
+        self.addCleanup(perf.uninstall_hooks)
+        original_render = Template.render
+        original_get = DummyCache.get
+        original_get_many = DummyCache.get_many
+
+        # the metrics file of a worker process which has gone away
+        os.makedirs(os.path.join(tempdir, 'metrics'))
+        process = subprocess.Popen(["true"])
+        process.wait()
+        stale_path = os.path.join(tempdir, 'metrics', 'datatracker_%s.prom' % process.pid)
+        io.open(stale_path, "w").close()
+
+        with override_settings(PERF_INSTRUMENTATION=True, PERF_EXPORT_INTERVAL=0, PERF_QUERY_BUDGET=1,
+                               PERF_METRICS_DIR=os.path.join(tempdir, 'metrics'),
+                               PERF_PROFILE_SAMPLE_RATE=1, PERF_PROFILE_DIR=os.path.join(tempdir, 'profiles')):
+            r = self.client.get(urlreverse('ietf.group.views.active_groups'))
+            self.assertEqual(r.status_code, 200)
+
+        metrics = io.open(os.path.join(tempdir, 'metrics', 'datatracker_%s.prom' % os.getpid())).read()
+        self.assertIn('datatracker_request_seconds_count{view="ietf.group.views.active_groups",pid="%s"} 1' % os.getpid(), metrics)
+        self.assertIn('datatracker_requests_over_budget_total{view="ietf.group.views.active_groups",pid="%s"} 1' % os.getpid(), metrics)
+        stats = perf._stats['ietf.group.views.active_groups']
+        self.assertGreater(stats.db_queries.sum, 1)
+        self.assertGreater(stats.template_time.sum, 0)
+        profiles = os.listdir(os.path.join(tempdir, 'profiles'))
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].startswith('ietf.group.views.active_groups-'))
+        self.assertFalse(os.path.exists(stale_path))
+        shutil.rmtree(tempdir)
+        perf.reset_stats()
+
+        self.assertNotEqual(Template.render, original_render)
+        self.assertNotEqual(DummyCache.get, original_get)
+        perf.uninstall_hooks()
+        self.assertEqual(Template.render, original_render)
+        self.assertEqual(DummyCache.get, original_get)
+        self.assertEqual(DummyCache.get_many, original_get_many)
+
 
 class NameTests(TestCase):
 
@@ -0,0 +1,76 @@
+# Copyright The IETF Trust 2019, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+from __future__ import absolute_import, print_function, unicode_literals
+
+import io
+import os
+import threading
+
+from collections import OrderedDict
+
+from django.conf import settings
+
+import debug                            # pyflakes:ignore
+
+
+# Decoded file text, by path, in least recently used order.  Each entry
+# also holds the file's stat signature, so that a changed file is read
+# again instead of being served from the cache.
+_text_cache = OrderedDict()
+_text_cache_size = 0
+_text_cache_lock = threading.Lock()
+
+def decode_text(raw):
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        return raw.decode('latin-1')
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+def read_text(path):
+    """Return the decoded text of the file at path, or None if it can't be
+    read.  The text is kept in a bounded in-process cache, so that reading
+    the same file several times (within a request or across requests) only
+    costs a stat() after the first time."""
+    global _text_cache_size
+    signature = _signature(path)
+    if signature is None:
+        return None
+    with _text_cache_lock:
+        entry = _text_cache.pop(path, None)
+        if entry:
+            if entry[0] == signature:
+                _text_cache[path] = entry
+                return entry[1]
+            _text_cache_size -= len(entry[1])
+    try:
+        with io.open(path, 'rb') as file:
+            raw = file.read()
+    except IOError:
+        return None
+    text = decode_text(raw)
+    if len(text) <= settings.DOCUMENT_TEXT_CACHE_SIZE // 4:
+        with _text_cache_lock:
+            old = _text_cache.pop(path, None)
+            if old:
+                _text_cache_size -= len(old[1])
+            _text_cache[path] = (signature, text)
+            _text_cache_size += len(text)
+            while _text_cache_size > settings.DOCUMENT_TEXT_CACHE_SIZE:
+                __, (__, evicted) = _text_cache.popitem(last=False)
+                _text_cache_size -= len(evicted)
+    return text
+
+def clear_text_cache():
+    global _text_cache_size
+    with _text_cache_lock:
+        _text_cache.clear()
+        _text_cache_size = 0